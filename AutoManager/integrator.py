@@ -25,6 +25,8 @@ from AutoManager.validator import validate_python_file
 from AutoManager.telegram_notifier import send_telegram_message
 from AutoManager import settings_manager as mgr_set
 from TradingBot import settings
+from TradingBot.utils.control_channel import ControlClient, ControlError, control_address, control_token_path
+from TradingBot.utils.runtime_config import RuntimeConfig
 from AutoManager.utils.sandbox_runner import run_sandbox_test
 from AutoManager.utils.snapshot_logger import save_metric_snapshot
 from AutoManager.lock_manager import is_param_locked
@@ -98,6 +100,32 @@ def replace_setting(file_path: str, param: str, new_val) -> tuple[bool,int|None,
         print(f"[Integrator] Errore in replace_setting: {e}")
         return False, None, None
 
+# ------------------------------------------------------------
+def apply_runtime_setting(param: str, new_val) -> tuple[bool, object, str | None]:
+    """
+    Parametro a caldo (settings.RUNTIME_CONFIG_KEYS): va al bot in esecuzione
+    tramite il canale di controllo, o nel sidecar se il bot è fermo.
+    settings.py non viene toccato. Ritorna (success, destinazione, old_value).
+    """
+    client = ControlClient(control_address(settings), timeout=settings.CONTROL_TIMEOUT,
+                           token_path=control_token_path(settings))
+    try:
+        old = client.call("config")["values"].get(param)
+        client.call("update", changes={param: new_val}, source="automanager")
+        return True, "control", repr(old)
+    except ControlError as e:
+        if client.available():
+            print(f"[Integrator] Valore rifiutato dal bot: {e}")
+            return False, None, None
+    try:
+        config = RuntimeConfig(settings).load()
+        old = config.get(param)
+        config.update({param: new_val}, source="automanager")
+        return True, config.path, repr(old)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[Integrator] Errore in apply_runtime_setting: {e}")
+        return False, None, None
+
 # ------------------------------------------------------------
 def apply_code_patch(sug: dict, current_equity: float = None) -> tuple[bool, object, str, str, str]:
     """
@@ -293,13 +321,22 @@ def process_suggestions(current_equity: float = None):
             target_rel = sug.get("target_file", "settings.py")
             target_py  = absolute_bot_file(target_rel)
 
-            ok, ln, old = replace_setting(target_py, param, new_val)
-            if ok:
-                save_log(json_name, target_py, ln, "param", old, f"{param} = {new_val}",
-                         reason, "param_update", param, engine_used)
-                success = True
+            if target_rel == "settings.py" and param in settings.RUNTIME_CONFIG_KEYS:
+                ok, dest, old = apply_runtime_setting(param, new_val)
+                if ok:
+                    save_log(json_name, dest, param, "runtime_config", old, f"{param} = {new_val}",
+                             reason, "param_update", param, engine_used)
+                    success = True
+                else:
+                    log_error(param, "Aggiornamento runtime config fallito")
             else:
-                log_error(param, "Param non trovato o errore aggiornamento settings.py")
+                ok, ln, old = replace_setting(target_py, param, new_val)
+                if ok:
+                    save_log(json_name, target_py, ln, "param", old, f"{param} = {new_val}",
+                             reason, "param_update", param, engine_used)
+                    success = True
+                else:
+                    log_error(param, "Param non trovato o errore aggiornamento settings.py")
 
         # ——— CODE PATCH ———
         elif sug.get("file") and sug.get("modification"):
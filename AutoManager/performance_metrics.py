@@ -4,8 +4,10 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 import datetime
 from collections import deque
 from AutoManager import settings_manager
-# Stato accumulato
-bot_stats_window = deque()
+# Stato accumulato (solo le ultime rilevazioni: il drawdown usa picco e massimo correnti)
+bot_stats_window = deque(maxlen=1000)
+_equity_peak = None
+_max_drawdown = 0.0
 
 def calculate_max_drawdown(equity_curve):
     max_drawdown = 0
@@ -31,7 +33,13 @@ def update_bot_stats(trades: list[dict], current_equity: float) -> dict:
     winrate = wins / total if total else 1.0
     avg_ev = sum(profits) / total if total else 0.0
 
-    max_dd = calculate_max_drawdown([s["equity"] for s in bot_stats_window] + [current_equity])
+    # O(1) per tick: picco e drawdown massimo aggiornati in modo incrementale
+    global _equity_peak, _max_drawdown
+    if _equity_peak is None or current_equity > _equity_peak:
+        _equity_peak = current_equity
+    if _equity_peak:
+        _max_drawdown = max(_max_drawdown, (_equity_peak - current_equity) / _equity_peak)
+    max_dd = _max_drawdown
     daily_profit = avg_ev * total  # in assenza di decadimento temporale, ev * numero trade
 
     bot_stats_window.append({
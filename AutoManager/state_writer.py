@@ -4,8 +4,10 @@ import os
 import json
 import random
 from datetime import datetime
+from TradingBot import settings
+from TradingBot.utils.control_channel import ControlClient, ControlError, control_address, control_token_path
 
-STATE_PATH = "C:\Users\Administrator\Desktop\TradingBot/state.json"
+STATE_PATH = r"C:\Users\Administrator\Desktop\TradingBot/state.json"
 
 def mock_bot_performance():
     """Simula l'output del bot con metriche reali."""
@@ -16,13 +18,32 @@ def mock_bot_performance():
         "last_update": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     }
 
+def live_bot_performance():
+    """Metriche reali dal bot in esecuzione (canale di controllo); None se il bot non risponde."""
+    client = ControlClient(control_address(settings), timeout=settings.CONTROL_TIMEOUT,
+                           token_path=control_token_path(settings))
+    try:
+        status = client.call("status")
+        perf = client.call("performance")
+        dd = client.call("drawdown")
+    except ControlError as e:
+        print(f"[StateWriter] Bot non raggiungibile: {e}")
+        return None
+    day = perf.get("24h", {})
+    return {
+        "daily_profit": round(status["daily_pnl"] / status["equity"], 3) if status["equity"] else 0.0,
+        "signal_precision": round(day.get("win_rate", 0) / 100, 2),
+        "drawdown": round(dd["max_drawdown"], 2),
+        "last_update": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+
 def write_state(metrics):
     os.makedirs(os.path.dirname(STATE_PATH), exist_ok=True)
     with open(STATE_PATH, "w", encoding="utf-8") as f:
         json.dump(metrics, f, indent=2)
 
 def update_state():
-    metrics = mock_bot_performance()
+    metrics = live_bot_performance() or mock_bot_performance()
     write_state(metrics)
     print(f"[StateWriter] Stato aggiornato: {metrics}")
 
@@ -1,24 +1,15 @@
 # telegram_notifier.py
-import requests
 from AutoManager import settings_manager as mgr_set
+from TradingBot.utils.notifier import TelegramNotifier
+
+# coda + thread di invio: le notifiche non bloccano i cicli di patch/supervisione
+_notifier = TelegramNotifier(mgr_set.TELEGRAM_BOT_TOKEN, mgr_set.TELEGRAM_CHAT_ID, parse_mode="Markdown")
 
 
 def send_telegram_message(message: str) -> bool:
     """
-    Invia una notifica Telegram usando le impostazioni in settings_manager.
-    Restituisce True se la richiesta HTTP ha successo, False altrimenti.
+    Accoda una notifica Telegram usando le impostazioni in settings_manager.
+    Restituisce True se il messaggio è stato accodato, False se la coda è piena;
+    l'invio HTTP (con timeout e retry) avviene nel thread del notifier.
     """
-    url = f"https://api.telegram.org/bot{mgr_set.TELEGRAM_BOT_TOKEN}/sendMessage"
-    payload = {
-        "chat_id": mgr_set.TELEGRAM_CHAT_ID,
-        "text": message,
-        "parse_mode": "Markdown"
-    }
-    try:
-        resp = requests.post(url, data=payload)
-        if not resp.ok:
-            print(f"[TelegramNotifier] Errore invio Telegram: {resp.status_code} {resp.text}")
-        return resp.ok
-    except Exception as e:
-        print(f"[TelegramNotifier] Eccezione invio Telegram: {e}")
-        return False
\ No newline at end of file
+    return _notifier.send(message)
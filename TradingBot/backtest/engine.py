@@ -0,0 +1,288 @@
+# backtest/engine.py
+
+"""
+Event-driven backtester that replays the live decision loop over history.
+
+Indicators, market phases, classical signals and the signal fusion are
+computed once per symbol as whole-array NumPy passes (same rules as
+StrategyManager.calculate_signals / fuse_probabilities, in their *_array
+versions). The only per-bar Python work left is walking open positions
+through execution.position_rules, the same trailing / partial-TP /
+break-even code used by ForexTradingBot.manage_open_positions.
+
+Simplifications w.r.t. the live bot:
+  - one position per symbol at a time, filled at the close of the signal bar
+  - SL/TP are checked on bar high/low, SL first when both are touched
+  - position size is computed on the starting balance (symbols are independent)
+
+Runtime-tunable parameters (risk, timeframe, trailing / partial-TP /
+break-even switches and tables) come from one runtime-config snapshot,
+taken when the Backtester is built, so a run matches the live bot.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+import settings
+from data_sources.fake_mt5_reader import FakeMT5Reader, TIMEFRAME_LABELS
+from execution.position_rules import initial_sl_tp, position_size, manage_position
+from logic.fusion_engine import fuse_probabilities_array
+from logic.market_phase_manager import MarketPhaseManager, PHASES
+from logic.strategy_manager import StrategyManager
+from utils.logger import get_logger
+from utils.runtime_config import get_runtime_config
+from utils.vector_indicators import indicator_columns
+
+WARMUP_BARS = 200  # serve MA_200 prima di decidere
+
+log = get_logger("Backtest")
+
+
+class Backtester:
+    def __init__(self, symbols=None, data_dir=None, timeframe_label=None,
+                 balance=None, risk_percent=None, multiplier=None, weights=None,
+                 start=None, end=None, spread_points=None, min_confidence=0.0,
+                 predictions=None, reader=None, config=None):
+        # snapshot della configurazione a caldo: stessi valori del bot per tutta la run
+        self.config = config or get_runtime_config(settings).current
+        self.symbols = symbols or settings.SYMBOLS
+        self.timeframe_label = timeframe_label or self.config.EXECUTION_TF_LABEL
+        self.balance = balance if balance is not None else settings.DEFAULT_BALANCE
+        self.risk_percent = risk_percent if risk_percent is not None else self.config.RISK_PERCENT
+        self.multiplier = multiplier if multiplier is not None else self.config.MANUAL_POSITION_MULTIPLIER
+        self.start = start
+        self.end = end
+        self.min_confidence = min_confidence
+        # {symbol: {"lstm": array, "cnn": array, "sentiment": array}} allineati alle barre
+        self.predictions = predictions or {}
+
+        self.reader = reader or FakeMT5Reader(
+            data_dir=data_dir or settings.REPLAY_DATA_DIR,
+            balance=self.balance,
+            spread_points=spread_points if spread_points is not None else settings.REPLAY_SPREAD_POINTS,
+        )
+        self.strategy_manager = StrategyManager(weights or settings.DEFAULT_INDICATOR_WEIGHTS)
+        self.market_phase_manager = MarketPhaseManager()
+
+        labels = {label: code for code, label in TIMEFRAME_LABELS.items()}
+        labels.update({label: code for code, label in settings.MULTI_TIMEFRAME_LIST})
+        self.timeframe = labels[self.timeframe_label]
+
+    # ------------------------------------------------------------------
+    def prepare(self, symbol):
+        """Loads the bars and computes every per-bar decision input in one pass."""
+        rates = self.reader.copy_rates_range(
+            symbol, self.timeframe,
+            self.start if self.start is not None else 0,
+            self.end if self.end is not None else 2**62,
+        )
+        if rates is None or len(rates) <= WARMUP_BARS:
+            return None
+
+        cols = indicator_columns(rates)
+        cols['close'] = rates['close']
+
+        phases = self.market_phase_manager.detect_phases(
+            rates['close'], cols['MA_50'], cols['MA_200'], cols['ATR']
+        )
+        signals = self.strategy_manager.calculate_signals_array(cols, phases)
+
+        preds = self.predictions.get(symbol, {})
+        direction, confidence, _ = fuse_probabilities_array(
+            signals,
+            lstm_pred=preds.get("lstm"),
+            cnn_pred=preds.get("cnn"),
+            sentiment=preds.get("sentiment"),
+            symbol_weights=self.strategy_manager.get_weights(symbol),
+        )
+
+        tradable = (
+            (np.arange(len(rates)) >= WARMUP_BARS)
+            & ~np.isnan(cols['ATR'])
+            & (confidence >= self.min_confidence)
+            & (direction != 0)
+        )
+        return {
+            "rates": rates,
+            "atr": cols['ATR'],
+            "phases": phases,
+            "direction": direction,
+            "confidence": confidence,
+            "candidates": np.flatnonzero(tradable),
+        }
+
+    # ------------------------------------------------------------------
+    def run_symbol(self, symbol):
+        data = self.prepare(symbol)
+        if data is None:
+            log.warning(f"{symbol}: dati insufficienti, salto.")
+            return []
+
+        info = self.reader.symbol_info(symbol)
+        candidates = data["candidates"]
+        direction = data["direction"]
+        phases = data["phases"]
+
+        trades = []
+        last_direction = None
+        last_entry = None
+        bar = 0
+        while True:
+            k = np.searchsorted(candidates, bar)
+            if k >= len(candidates):
+                break
+            i = int(candidates[k])
+            phase = PHASES[phases[i]]
+
+            # Stesso cooldown di allowed_to_flip_direction, in candele
+            if last_direction is not None and direction[i] != last_direction:
+                needed = settings.PHASE_BASED_FLIP_COOLDOWN_CANDLES.get(phase, 3)
+                if i - last_entry < needed:
+                    bar = i + 1
+                    continue
+
+            trade, exit_bar = self._simulate(symbol, data, info, i)
+            trades.append(trade)
+            last_direction = direction[i]
+            last_entry = i
+            bar = exit_bar + 1
+
+        return trades
+
+    def _simulate(self, symbol, data, info, i):
+        rates = data["rates"]
+        high, low, close = rates['high'], rates['low'], rates['close']
+        spread = self.reader.spread_points * info.point
+        contract = info.trade_contract_size
+
+        side = 'long' if data["direction"][i] == 1 else 'short'
+        is_long = side == 'long'
+        sign = 1 if is_long else -1
+        phase = PHASES[data["phases"][i]]
+        confidence = float(data["confidence"][i])
+        atr = float(data["atr"][i])
+
+        entry = close[i] + spread if is_long else close[i]
+        sl, tp, rr_ratio = initial_sl_tp(side, entry, atr, confidence)
+        lots = position_size(self.balance, info.point, info.volume_min, info.volume_max,
+                             entry, sl, self.risk_percent, confidence, self.multiplier)
+
+        remaining = lots
+        realized = 0.0
+        partial_done = False
+        current_sl = sl
+        exit_price, reason, j = None, "eod", len(rates) - 1
+
+        for j in range(i + 1, len(rates)):
+            # SL / TP toccati nella barra (lato bid per long, ask per short)
+            bar_low = low[j] if is_long else low[j] + spread
+            bar_high = high[j] if is_long else high[j] + spread
+            if (is_long and bar_low <= current_sl) or (not is_long and bar_high >= current_sl):
+                exit_price, reason = current_sl, "sl"
+                break
+            if (is_long and bar_high >= tp) or (not is_long and bar_low <= tp):
+                exit_price, reason = tp, "tp"
+                break
+
+            price = close[j] if is_long else close[j] + spread
+            new_sl, partial_lots = manage_position(
+                side, phase, confidence, atr, entry, price, current_sl, lots,
+                partial_done=partial_done,
+                trailing=self.config.ENABLE_TRAILING_STOPS,
+                partial_tp=self.config.ENABLE_PARTIAL_TP,
+                break_even=self.config.ENABLE_BREAK_EVEN,
+                cfg=self.config,
+            )
+            if new_sl is not None:
+                current_sl = new_sl
+            if partial_lots:
+                partial_lots = min(partial_lots, remaining)
+                if partial_lots >= settings.MIN_LOT_SIZE:
+                    realized += (price - entry) * sign * partial_lots * contract
+                    remaining = round(remaining - partial_lots, 2)
+                partial_done = True
+
+        if exit_price is None:
+            exit_price = close[j] if is_long else close[j] + spread
+        realized += (exit_price - entry) * sign * remaining * contract
+
+        trade = {
+            "symbol": symbol,
+            "direction": side,
+            "phase": phase,
+            "confidence": round(confidence, 4),
+            "entry_time": int(rates['time'][i]),
+            "exit_time": int(rates['time'][j]),
+            "entry": entry,
+            "exit": exit_price,
+            "sl": sl,
+            "tp": tp,
+            "rr_ratio": rr_ratio,
+            "size": lots,
+            "partial": partial_done,
+            "reason": reason,
+            "bars": j - i,
+            "profit": round(realized, 2),
+            "pl_pct": round(realized / (entry * lots) * 100, 4) if lots else 0.0,
+        }
+        return trade, j
+
+    # ------------------------------------------------------------------
+    def run(self):
+        t0 = time.perf_counter()
+        all_trades = []
+        for symbol in self.symbols:
+            all_trades.extend(self.run_symbol(symbol))
+        elapsed = time.perf_counter() - t0
+
+        trades = pd.DataFrame(all_trades)
+        if not trades.empty:
+            trades["entry_time"] = pd.to_datetime(trades["entry_time"], unit="s")
+            trades["exit_time"] = pd.to_datetime(trades["exit_time"], unit="s")
+            trades = trades.sort_values("exit_time").reset_index(drop=True)
+
+        return {
+            "trades": trades,
+            "summary": summarize(trades, self.balance),
+            "per_symbol": {
+                sym: summarize(grp, self.balance) for sym, grp in trades.groupby("symbol")
+            } if not trades.empty else {},
+            "elapsed": round(elapsed, 3),
+        }
+
+
+def summarize(trades, balance):
+    if trades is None or len(trades) == 0:
+        return {"trades": 0, "win_rate": 0, "avg_profit": 0, "total_pnl": 0, "max_drawdown": 0}
+
+    profit = trades["profit"].to_numpy()
+    equity = balance + np.cumsum(profit)
+    peak = np.maximum.accumulate(np.concatenate([[balance], equity]))[1:]
+    drawdown = ((peak - equity) / peak).max()
+
+    return {
+        "trades": len(trades),
+        "win_rate": round(float((profit > 0).mean()) * 100, 2),
+        "avg_profit": round(float(profit.mean()), 2),
+        "total_pnl": round(float(profit.sum()), 2),
+        "max_drawdown": round(float(drawdown) * 100, 2),
+    }
+
+
+def main():
+    backtester = Backtester()
+    result = backtester.run()
+    s = result["summary"]
+    log.info(f"📊 Backtest {backtester.timeframe_label} — {len(result['per_symbol'])} simboli in {result['elapsed']}s",
+             extra={"fields": {"summary": s}})
+    log.info(f"Trades: {s['trades']}, Win Rate: {s['win_rate']}%, Avg Profit: {s['avg_profit']}, "
+             f"Total PnL: {s['total_pnl']}, Max DD: {s['max_drawdown']}%")
+    for sym, st in result["per_symbol"].items():
+        log.info(f"{sym:7} trades={st['trades']:4}  win={st['win_rate']:6}%  pnl={st['total_pnl']}",
+                 extra={"fields": {"symbol": sym, **st}})
+
+
+if __name__ == "__main__":
+    main()
@@ -2,40 +2,52 @@ from __future__ import annotations
 
 # — libreria standard — -------------------------------------------------
 import time
-import sys
 import os
 from pathlib import Path
 from datetime import datetime
 import json
 import csv
+import logging
 import threading
-from os.path import exists
+from concurrent.futures import ThreadPoolExecutor
 
 # — librerie di terze parti — ------------------------------------------
-import MetaTrader5 as mt5
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
 
 # — pacchetti interni — -------------------------------------------------
-from TradingSystem.AutoManager.supervisor import (
-    evaluate_patch_result_and_decide,
-)
-from TradingSystem.AutoManager.lock_manager import is_locked
-
-from . import settings
-from .utils.messaging import send_message
-from .logic.strategy_manager import StrategyManager
-from .execution.trade_manager import TradeManager
-from .logic.market_phase_manager import MarketPhaseManager
-from .logic.meta_indicator_learning import MetaIndicatorLearning
-from .logic.meta_strategy_tuner import MetaStrategyTuner
-from .logic.fusion_engine import fuse_probabilities
-from .models.lstm_model import LSTMModel
-from .models.cnn_model import CNNModel
-from .models.modello_sett import SentimentModel
-from .utils.plotter import plot_candlestick
-from .utils.sentiment_fetcher import fetch_sentiment_for
-from .utils.training_data_builder import build_from_symbol
+# Solo moduli leggeri: TensorFlow, torch/transformers, pandas_ta, matplotlib e
+# il supervisor di AutoManager si importano al primo uso (vedi utils/import_profile.py).
+# Import assoluti come nel resto del bot: si avvia con `python bot.py` dalla cartella
+# TradingBot, e un solo nome per modulo vuol dire un solo settings e un solo singleton
+# (broker, cache, registry, logger, notifier).
+import settings
+from data_sources.broker import mt5, serves_forming_bar
+from data_sources.bar_cache import bar_cache
+from data_sources.market_snapshot import MarketSnapshot
+from execution.order_gateway import succeeded
+from execution.position_rules import initial_sl_tp, manage_positions
+from execution.trade_manager import TradeManager
+from logic.fusion_engine import fuse_probabilities
+from logic.market_phase_manager import MarketPhaseManager
+from logic.meta_indicator_learning import MetaIndicatorLearning
+from logic.meta_strategy_tuner import MetaStrategyTuner
+from logic.strategy_manager import StrategyManager
+from models.inference_service import InferenceService
+from models.model_registry import get_model_registry
+from models.retrain_scheduler import RetrainScheduler
+from utils.control_channel import ControlServer, control_address, control_token_path
+from utils.indicator_analysis import encode_indicators, get_combo_store
+from utils.latency_metrics import get_metrics, format_summary
+from utils.logger import get_logger
+from utils.messaging import get_notifier, send_message
+from utils.news_service import NewsSentimentService
+from utils.performance_stats import PerformanceStats
+from utils.runtime_optimizer import load_active_symbols
+from utils.runtime_config import get_runtime_config
+from utils.streaming_indicators import StreamingIndicatorEngine
+from utils.trade_tracker import log_closed_trade, log_open_trade
+from utils.training_data_builder import build_from_symbol, live_feature_window
 
 # (se ti serve ancora la costante ROOT per leggere file di supporto,
 #  puoi lasciarla, ma NON toccare sys.path)
@@ -47,6 +59,11 @@ class ForexTradingBot:
         if not mt5.initialize():
             raise ConnectionError("Failed to initialize MT5 connection")
         
+        # log_event accoda i record per il thread di scrittura (utils/logger.py)
+        self.log = get_logger("Bot")
+        # notifiche Telegram in coda, inviate da un thread (utils/notifier.py)
+        self.notifier = get_notifier()
+
         self.last_symbol_refresh = 0
 
         self.consecutive_failures = 0
@@ -55,36 +72,52 @@ class ForexTradingBot:
         self.daily_pnl = 0.0
         self.daily_start_equity = self.get_balance()
         self.daily_loss_triggered = False
-        self.last_reset_date = TradingSystem.TradingBot.datetime.now().date()
+        self.last_reset_date = datetime.now().date()
 
 
         account_info = mt5.account_info()
-        self.balance = account_info.balance if account_info else .settings.DEFAULT_BALANCE
+        self.balance = account_info.balance if account_info else settings.DEFAULT_BALANCE
 
-        self.positions = list(mt5.positions_get() or [])
-        self.trade_manager.revalidate_stop_targets(self.positions)
-        self.trade_log = [{"ticket": pos.ticket, "symbol": pos.symbol} for pos in self.positions]
 
-        self.enable_trailing_stops = .settings.ENABLE_TRAILING_STOPS
-        self.enable_partial_tp      = .settings.ENABLE_PARTIAL_TP
-        self.enable_break_even      = .settings.ENABLE_BREAK_EVEN
+        # Parametri modificabili a caldo (utils/runtime_config.py): il ciclo legge
+        # uno snapshot immutabile, le modifiche arrivano dal canale di controllo o dal sidecar
+        self.config = get_runtime_config(settings)
+        cfg = self.config.current
+        self._mirror_settings(cfg, cfg.values)
 
         loaded_weights = self.load_indicator_weights()
         if loaded_weights:
             self.strategy_manager = StrategyManager(loaded_weights)
         else:
-            self.strategy_manager = StrategyManager(.settings.DEFAULT_INDICATOR_WEIGHTS)
+            self.strategy_manager = StrategyManager(settings.DEFAULT_INDICATOR_WEIGHTS)
+
+        self.trade_manager         = TradeManager(manual_multiplier or cfg.MANUAL_POSITION_MULTIPLIER)
 
-        self.trade_manager         = TradeManager(manual_multiplier or .settings.MANUAL_POSITION_MULTIPLIER)
+        open_positions = list(mt5.positions_get() or [])
+        self.trade_manager.revalidate_stop_targets(open_positions)
+        # stessa forma dei trade aperti da _place_order, così la gestione posizioni non distingue
+        self.positions = [self._trade_from_position(pos) for pos in open_positions]
+        self.trade_log = [{"ticket": pos.ticket, "symbol": pos.symbol} for pos in open_positions]
         self.market_phase_manager  = MarketPhaseManager()
+        # Stato incrementale degli indicatori per (simbolo, timeframe)
+        self.indicators = StreamingIndicatorEngine()
+
+        # Pipeline: fetch/feature in parallelo, ordini su un solo thread
+        self.pipeline_pool = ThreadPoolExecutor(
+            max_workers=settings.PIPELINE_WORKERS, thread_name_prefix="symbol"
+        )
+        self.order_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="orders")
+        self.stage_timings = {}
         self.meta_indicator_learning = MetaIndicatorLearning()
         self.meta_strategy_tuner     = MetaStrategyTuner()
 
         self.close_all_flag   = False
+        self.pause_trading    = False   # niente nuovi ingressi, le posizioni aperte restano gestite
+        self.last_cycle_at    = None
         self.listener_thread  = None
 
-        self.symbols = .settings.SYMBOLS
-        self.flip_cooldown_secs = flip_cooldown_secs or .settings.FLIP_COOLDOWN_SECONDS
+        self.symbols = settings.SYMBOLS
+        self.flip_cooldown_secs = flip_cooldown_secs or cfg.FLIP_COOLDOWN_SECONDS
 
         self.last_flip_bar  = {}
         self.last_direction = {}
@@ -92,63 +125,183 @@ class ForexTradingBot:
         self.crash_once = True  # <-- crash flag
 
         # AI models
-        self.lstm_models = {
-            symbol: LSTMModel(.settings.LSTM_MODEL_PATH.format(symbol))
-            for symbol in self.symbols
+        # LSTM/CNN: caricati su richiesta (LRU) e valutati in batch su tutti i simboli
+        # Versioni dei modelli per (simbolo, tipo): indice in memoria, nessun polling su disco
+        self.registry = get_model_registry()
+        self.inference = InferenceService(registry=self.registry)
+        # Retraining in processi separati: coalescenza per simbolo, nuova versione
+        # caricata e scaldata prima di diventare attiva
+        self.retrainer = RetrainScheduler(on_done=self._on_models_retrained,
+                                          warm=self.inference.warm, registry=self.registry)
+        self._bootstrapping = set()  # simboli nuovi con il primo training già in coda
+
+        # Statistiche 24h/7d/30d e drawdown aggiornate trade per trade (stato su disco)
+        self.performance = PerformanceStats().load()
+
+        # Statistiche delle combinazioni di indicatori per simbolo
+        self.combo_stats = get_combo_store()
+
+        # Notizie: ingestione RSS in background, il loop legge solo il punteggio pronto
+        self.news = NewsSentimentService()
+        if settings.NEWS_SERVICE_ENABLED:
+            self.news.start()
+
+        self.config.subscribe(self._on_config_changed)
+
+        # Istogrammi di latenza (broker, stage, inferenza, ordini) e riepilogo periodico nel log
+        self.metrics = get_metrics()
+        self.last_metrics_summary = time.time()
+
+        # Canale di controllo locale: Telegram/watchdog/AutoManager parlano con questo processo
+        self.control = ControlServer(control_address(settings), control_token_path(settings))
+        self._register_control_handlers()
+
+    # ------------------------------------------------------------------
+    # Canale di controllo (utils/control_channel.py)
+    # ------------------------------------------------------------------
+    def _register_control_handlers(self):
+        handlers = {
+            "status": self._control_status,
+            "performance": self.performance.summary,
+            "drawdown": self.performance.drawdown,
+            "positions": self._control_positions,
+            "pause": lambda: self._control_flag("pause_trading", True),
+            "resume": lambda: self._control_flag("pause_trading", False),
+            "shutdown": lambda: self._control_flag("close_all_flag", True),
+            "set": lambda key, value, source="control": self._control_update({key: value}, source),
+            "update": self._control_update,
+            "set_trailing": self._control_set_trailing,
+            "config": lambda: {"version": self.config.current.version, "values": self.config.current.as_dict()},
+            "sentiment": lambda symbol: self.news.score(symbol) if settings.NEWS_SERVICE_ENABLED else None,
+            "combos": lambda symbol, min_trades=3: {
+                "|".join(c): v for c, v in self.combo_stats.top(symbol, min_trades).items()},
+            "weights": lambda symbol: self.strategy_manager.indicators_by_symbol.get(symbol, {}),
+            "retrain": self._control_retrain,
+            "models": lambda symbol: {k: self.registry.versions(symbol, k) for k in ("lstm", "cnn")},
+            "current_models": lambda symbol: {k: self.registry.current(symbol, k) for k in ("lstm", "cnn")},
+            "rollback": self._control_rollback,
+            "refresh_models": self._control_refresh_models,
+            "metrics": lambda by_symbol=False: self.metrics.summary(by_symbol),
         }
-
-        self.cnn_models = {
-            symbol: CNNModel(.settings.CNN_MODEL_PATH.format(symbol))
-            for symbol in self.symbols
+        for name, func in handlers.items():
+            self.control.register(name, func)
+
+    def _control_status(self):
+        return {
+            "paused": self.pause_trading,
+            "stopping": self.close_all_flag,
+            "equity": self.last_known_equity,
+            "daily_pnl": self.daily_pnl,
+            "daily_loss_triggered": self.daily_loss_triggered,
+            "open_positions": len(self.positions),
+            "symbols": list(self.symbols),
+            "last_cycle_at": self.last_cycle_at,
+            "stage_timings": self.stage_timings,
+            "config_version": self.config.current.version,
+            "settings": self.config.current.as_dict(),
         }
 
-        self.sentiment_models = {
-            symbol: SentimentModel(.settings.SENTIMENT_MODEL_NAME)
-            for symbol in self.symbols
+    def _control_positions(self):
+        return [{k: p.get(k) for k in ("ticket", "symbol", "direction", "size", "entry", "sl", "phase")}
+                for p in list(self.positions)]
+
+    @staticmethod
+    def _trade_from_position(pos):
+        """
+        Trade dict for a position found open at startup. Phase, indicators and
+        confidence of the original decision are unknown; the ATR is taken back
+        from the initial stop (2×ATR, see initial_sl_tp), NaN without a stop,
+        in which case the position-management rules leave it alone.
+        """
+        atr = abs(pos.price_open - pos.sl) / 2 if pos.sl else float("nan")
+        return {
+            'ticket': pos.ticket,
+            'symbol': pos.symbol,
+            'direction': 'long' if pos.type == mt5.POSITION_TYPE_BUY else 'short',
+            'size': pos.volume,
+            'entry': pos.price_open,
+            'sl': pos.sl,
+            'tp': pos.tp,
+            'time': datetime.fromtimestamp(pos.time),
+            'opened_at': pos.time,
+            'confidence': 0.5,
+            'phase': None,
+            'atr': atr,
+            'used_indicators': [],
+            'restored': True,
         }
 
+    def _control_flag(self, name, value):
+        setattr(self, name, value)
+        self.log_event(f"[Control] {name} = {value}")
+        return value
+
+    def _control_update(self, changes, source="control"):
+        snapshot = self.config.update(changes, source=source)
+        return {"version": snapshot.version, "values": {k: snapshot.values[k] for k in changes}}
+
+    def _control_set_trailing(self, phase, value):
+        if phase not in self.config.current.TRAILING_CONFIG:
+            raise KeyError(f"fase sconosciuta: {phase}")
+        return self._control_update({"TRAILING_CONFIG": {phase: {"base_stop_factor": float(value)}}})
+
+    def _mirror_settings(self, snapshot, keys):
+        """Copies `keys` onto the settings module for the code that still reads settings.X."""
+        values = snapshot.as_dict()
+        for key in keys:
+            setattr(settings, key, values[key])
+
+    def _on_config_changed(self, snapshot, changed):
+        self._mirror_settings(snapshot, changed)
+        if "FLIP_COOLDOWN_SECONDS" in changed:
+            self.flip_cooldown_secs = snapshot.FLIP_COOLDOWN_SECONDS
+        if "MANUAL_POSITION_MULTIPLIER" in changed:
+            self.trade_manager.set_manual_multiplier(snapshot.MANUAL_POSITION_MULTIPLIER)
+        self.log_event(f"[Config] v{snapshot.version}: {', '.join(sorted(changed))}")
+
+    def _control_retrain(self, symbol, rebuild=False):
+        if not rebuild:
+            self.retrain_models(symbol, force=True)
+            return True
+
+        def rebuild_task():
+            # il download può durare minuti: fuori dal thread della richiesta
+            try:
+                build_from_symbol(symbol)
+                self.retrain_models(symbol, force=True)
+            except Exception as e:
+                self.log_event(f"❌ Rebuild failed for {symbol}: {e}")
+
+        threading.Thread(target=rebuild_task, daemon=True).start()
+        return True
+
+    def _control_refresh_models(self):
+        self.inference.invalidate()
+        return True
+
+    def _control_rollback(self, symbol, kind, version):
+        self.registry.activate(symbol, kind, int(version))
+        return self.registry.current(symbol, kind)
+
     def load_indicator_weights(self):
-        if TradingSystem.TradingBot.os.path.exists(.settings.INDICATOR_WEIGHTS_FILE):
-            with open(.settings.INDICATOR_WEIGHTS_FILE, "r") as f:
-                return TradingSystem.TradingBot.json.load(f)
+        if os.path.exists(settings.INDICATOR_WEIGHTS_FILE):
+            with open(settings.INDICATOR_WEIGHTS_FILE, "r") as f:
+                return json.load(f)
         return None
 
     def save_indicator_weights(self):
-        with open(.settings.INDICATOR_WEIGHTS_FILE, "w") as f:
-            TradingSystem.TradingBot.json.dump(self.strategy_manager.indicators_by_symbol, f, indent=2)
+        with open(settings.INDICATOR_WEIGHTS_FILE, "w") as f:
+            json.dump(self.strategy_manager.indicators_by_symbol, f, indent=2)
 
     def get_performance_stats(self):
-        path = .settings.TRADE_LOG_CSV
-        if not TradingSystem.TradingBot.os.path.exists(path):
-            print("No trade logs found.")
+        summary = self.performance.summary()
+        if not any(s["trades"] for s in summary.values()):
+            self.log_event("No trade logs found.")
             return None
 
-        df = pd.read_csv(path, parse_dates=["timestamp"])
-        now = TradingSystem.TradingBot.datetime.now()
-
-        def summarize(df_slice):
-            wins = df_slice[df_slice["profit"] > 0]
-            losses = df_slice[df_slice["profit"] <= 0]
-            return {
-                "trades": len(df_slice),
-                "win_rate": round(len(wins) / len(df_slice) * 100, 2) if len(df_slice) > 0 else 0,
-                "avg_profit": round(df_slice["profit"].mean(), 2) if not df_slice.empty else 0,
-                "total_pnl": round(df_slice["profit"].sum(), 2)
-            }
-
-        stats_24h = summarize(df[df["timestamp"] > now - timedelta(days=1)])
-        stats_7d  = summarize(df[df["timestamp"] > now - timedelta(days=7)])
-        stats_30d = summarize(df[df["timestamp"] > now - timedelta(days=30)])
-
-        summary = {
-            "24h": stats_24h,
-            "7d": stats_7d,
-            "30d": stats_30d
-        }
-
-        print("\n📊 Performance Summary:")
-        for period, s in summary.items():
-            print(f"{period} :: Trades: {s['trades']}, Win Rate: {s['win_rate']}%, Avg Profit: {s['avg_profit']}, Total PnL: {s['total_pnl']}")
+        lines = [f"{period} :: Trades: {s['trades']}, Win Rate: {s['win_rate']}%, Avg Profit: {s['avg_profit']}, Total PnL: {s['total_pnl']}"
+                 for period, s in summary.items()]
+        self.log_event("📊 Performance Summary:\n" + "\n".join(lines), performance=summary)
 
         return summary
 
@@ -160,17 +313,14 @@ class ForexTradingBot:
         tick = mt5.symbol_info_tick(symbol)
         if not tick or tick.last == 0:
             return True  # No price data at all
-        last_tick_time = TradingSystem.TradingBot.datetime.fromtimestamp(tick.TradingSystem.TradingBot.time)
-        now = TradingSystem.TradingBot.datetime.now()
+        last_tick_time = datetime.fromtimestamp(tick.time)
+        now = datetime.now()
         diff = (now - last_tick_time).total_seconds()
         return diff > 300  # If no update in last 5 minutes, likely closed
 
-    def log_event(self, message):
-        timestamp = TradingSystem.TradingBot.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_message = f"[{timestamp}] {message}"
-        with open(.settings.LOG_FILE, "a", encoding="utf-8") as log_file:
-            log_file.write(log_message + "\n")
-        print(log_message)
+    def log_event(self, message, level=logging.INFO, **fields):
+        """Queued for the log writer thread: never waits on the disk or the console."""
+        self.log.log(level, message, extra={"fields": fields} if fields else None)
 
     def _input_listener(self):
         while True:
@@ -194,7 +344,7 @@ class ForexTradingBot:
                 if len(parts) == 3:
                     symbol = parts[1].upper()
                     path = parts[2]
-                    from .utils.upload_retrainer import retrain_from_csv
+                    from utils.upload_retrainer import retrain_from_csv
   
                     success = retrain_from_csv(symbol, path)
                     if success:
@@ -202,39 +352,52 @@ class ForexTradingBot:
                     else:
                         self.log_event(f"❌ Failed to retrain {symbol} from {path}")
                 else:
-                    print("Usage: retrain SYMBOL /path/to/your.TradingSystem.TradingBot.csv")
+                    self.log_event("Usage: retrain SYMBOL /path/to/your.csv")
 
     def close_positions_outside_top20(self):
-        open_symbols = get_all_open_symbols()
-        active_symbols = load_active_symbols()
+        active_symbols = set(load_active_symbols())
+        if not active_symbols:
+            return   # lista non ancora generata: non si chiude nulla
 
-        for symbol in open_symbols:
-            if symbol not in active_symbols:
-                print(f"[BOT] ❌ {symbol} fuori dalla top 20. Chiusura.")
-                close_trade(symbol)
-                send_message(f"🚫 Posizione chiusa su {symbol} — fuori dalla top 20.")
+        closed = set()
+        for pos in MarketSnapshot.take().positions.values():
+            if pos.symbol in active_symbols:
+                continue
+            self.log_event(f"❌ {pos.symbol} fuori dalla top 20. Chiusura.", symbol=pos.symbol, ticket=pos.ticket)
+            if self.trade_manager.close_trade(pos.ticket):
+                closed.add(pos.symbol)
+        for symbol in sorted(closed):
+            send_message(f"🚫 Posizione chiusa su {symbol} — fuori dalla top 20.")
 
     def log_trade_result(self, trade, profit, pl_pct):
-        log_path = .settings.TRADE_LOG_CSV
-        file_exists = TradingSystem.TradingBot.os.path.isfile(log_path)
+        log_path = settings.TRADE_LOG_CSV
+        file_exists = os.path.isfile(log_path)
 
         with open(log_path, "a", newline="") as csvfile:
-            fieldnames = ["timestamp", "symbol", "direction", "confidence", "entry", "size", "profit", "pl_pct"]
-            writer = TradingSystem.TradingBot.csv.DictWriter(csvfile, fieldnames=fieldnames)
+            fieldnames = ["timestamp", "symbol", "direction", "confidence", "entry", "size", "profit", "pl_pct",
+                          "used_indicators"]
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
 
             if not file_exists:
                 writer.writeheader()
 
             writer.writerow({
-                "timestamp": TradingSystem.TradingBot.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 "symbol": trade["symbol"],
                 "direction": trade["direction"],
                 "confidence": trade["confidence"],
                 "entry": trade["entry"],
                 "size": trade["size"],
                 "profit": profit,
-                "pl_pct": round(pl_pct, 2)
+                "pl_pct": round(pl_pct, 2),
+                "used_indicators": encode_indicators(trade.get("used_indicators", [])),
             })
+        try:
+            log_closed_trade(trade, pl_pct)   # journal SQLite letto anche dall'AutoManager
+        except Exception as e:
+            self.log_event(f"⚠️ Trade {trade.get('ticket')} non scritto nel journal: {e}", logging.WARNING)
+        self.performance.record_trade(profit)
+        self.combo_stats.record(trade["symbol"], trade.get("used_indicators", []), profit)
 
     def close_all_positions(self):
         open_positions = mt5.positions_get()
@@ -246,31 +409,32 @@ class ForexTradingBot:
         self.log_event("All positions closed.")
 
     def fetch_data_mt(self, symbol, timeframe, bars):
-        rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, bars)
-        if rates is None or (hasattr(rates, '__len__') and len(rates) == 0):
-                print(f"[ERROR] No data received for {symbol} @ timeframe {timeframe}")
+        rates = bar_cache.get(symbol, timeframe, bars)
+        if rates is None or len(rates) == 0:
+                self.log_event(f"No data received for {symbol} @ timeframe {timeframe}", logging.ERROR,
+                               symbol=symbol)
                 return None
         df = pd.DataFrame(rates)
-        df['TradingSystem.TradingBot.time'] = pd.to_datetime(df['TradingSystem.TradingBot.time'], unit='s')
+        df['time'] = pd.to_datetime(df['time'], unit='s')
         return df    
 
-    def fetch_multiple_timeframes(self, symbol):
+    def fetch_multiple_timeframes(self, symbol, tf_label=None):
         """
-        If MULTI_TIMEFRAME_ENABLED is True, fetch data for all timeframes in .settings.MULTI_TIMEFRAME_LIST.
+        If MULTI_TIMEFRAME_ENABLED is True, fetch data for all timeframes in settings.MULTI_TIMEFRAME_LIST.
         Returns a dict with keys being the timeframe labels and values the corresponding DataFrames.
         Otherwise, returns a dict with just the default M5 data.
         """
-        tf_label = .settings.EXECUTION_TF_LABEL
-        tf_constant = next((code for code, label in .settings.MULTI_TIMEFRAME_LIST if label == tf_label), mt5.TIMEFRAME_M5)
-        df_single = self.fetch_data_mt(symbol, tf_constant, .settings.BAR_COUNT)
+        tf_label = tf_label or self.config.current.EXECUTION_TF_LABEL
+        tf_constant = next((code for code, label in settings.MULTI_TIMEFRAME_LIST if label == tf_label), mt5.TIMEFRAME_M5)
+        df_single = self.fetch_data_mt(symbol, tf_constant, settings.BAR_COUNT)
         return {tf_label: df_single}
 
         timeframe_data = {}
         count = 0
-        for (tf_constant, label) in .settings.MULTI_TIMEFRAME_LIST:
-            if count >= .settings.MAX_TIMEFRAMES:
+        for (tf_constant, label) in settings.MULTI_TIMEFRAME_LIST:
+            if count >= settings.MAX_TIMEFRAMES:
                 break
-            df_tf = self.fetch_data_mt(symbol, tf_constant, .settings.BAR_COUNT)
+            df_tf = self.fetch_data_mt(symbol, tf_constant, settings.BAR_COUNT)
             timeframe_data[label] = df_tf
             count += 1
         return timeframe_data
@@ -286,9 +450,9 @@ class ForexTradingBot:
         if last_bar is None:
             return True
 
-        mask = df['TradingSystem.TradingBot.time'] > last_bar
+        mask = df['time'] > last_bar
         passed_candles = mask.sum()
-        needed_candles = .settings.PHASE_BASED_FLIP_COOLDOWN_CANDLES.get(market_phase, 3)
+        needed_candles = settings.PHASE_BASED_FLIP_COOLDOWN_CANDLES.get(market_phase, 3)
         if passed_candles < needed_candles:
             self.log_event(f"Flip cooldown not met for {symbol}. Passed={passed_candles}, needed={needed_candles}.")
             return False
@@ -296,10 +460,14 @@ class ForexTradingBot:
 
     def run(self):
         self.log_event("Bot started.")
-        self.listener_thread = TradingSystem.TradingBot.threading.Thread(target=self._input_listener, daemon=True)
+        self.listener_thread = threading.Thread(target=self._input_listener, daemon=True)
         self.listener_thread.start()
+        try:
+            self.control.start()
+        except OSError as e:
+            self.log_event(f"⚠️ Control channel unavailable: {e}")
 
-        now = TradingSystem.TradingBot.time.TradingSystem.TradingBot.time()
+        now = time.time()
         if now - self.last_symbol_refresh >= 3600:  # ogni ora
             self.strategy_manager.refresh_active_symbols()
             self.close_positions_outside_top20()
@@ -307,346 +475,409 @@ class ForexTradingBot:
             
         try:
             while not self.close_all_flag:
+                try:
+                    self.config.reload_if_changed()   # sidecar riscritto da un altro processo
+                except (OSError, ValueError) as e:
+                    self.log_event(f"⚠️ Runtime config not reloaded: {e}")
                 if self.crash_once:
                     self.crash_once = False
                     raise ValueError("🔥 Simulated crash for GPT test")
                 
-                self.check_closed_positions()
-                self.manage_open_positions()
-                symbol_sentiment_scores = {}
+                # un solo positions_get e un tick per simbolo per tutta la gestione posizioni
+                with self.metrics.timer("stage.positions"):
+                    snapshot = MarketSnapshot.take()
+                    self.check_closed_positions(snapshot)
+                    self.manage_open_positions(snapshot)
                 
                 if self.daily_loss_triggered:
                     self.log_event("⛔ Daily loss limit active. Skipping trade attempts.")
-                    TradingSystem.TradingBot.time.sleep(1)
+                    time.sleep(1)
                     continue
 
 
-                for symbol in self.symbols:
-                    # Step 1: Auto-generate model if missing
-                    lstm_path = f"models/{symbol}_lstm_model.h5"
-                    cnn_path = f"models/{symbol}_cnn_model.h5"
-
-                    if not exists(lstm_path) or not exists(cnn_path):
-                        self.log_event(f"🛠️ Bootstrapping new symbol: {symbol}")
-
-                            # Build and enrich data if needed
-                        try:
-                            build_from_symbol(symbol, timeframes=[.settings.EXECUTION_TF_LABEL, .settings.EXECUTION_TF_LABEL, .settings.EXECUTION_TF_LABEL])
-                        except Exception as e:
-                            self.log_event(f"❌ Failed to build data for {symbol}: {e}")
-                            continue
-
-                        try:
-                            self.lstm_model.retrain(symbol)
-                            self.cnn_model.retrain(symbol)
-                        except Exception as e:
-                            self.log_event(f"❌ Failed to train model for {symbol}: {e}")
-                            continue
+                if self.pause_trading:
+                    self.log_event("⏸️ Trading paused: skipping new entries.")
+                else:
+                    self.run_pipeline_cycle()
+                    self.notifier.flush_digest(f"📊 *Segnali* {datetime.now():%H:%M}")
+                self.last_cycle_at = time.time()
 
+                self.save_indicator_weights()
+                self.log_event("Cycle complete, waiting for next iteration.")
+                if time.time() - self.last_metrics_summary >= settings.METRICS_SUMMARY_SECONDS:
+                    self.log_event("[Metrics]\n" + "\n".join(format_summary(self.metrics.summary(), top=15)))
+                    self.last_metrics_summary = time.time()
 
-                    if self.is_market_closed(symbol):
-                        self.log_event(f"⏸️ Market appears closed for {symbol}. Skipping.")
-                        continue
-                    tf_data = self.fetch_multiple_timeframes(symbol)
-                    exec_label = .settings.EXECUTION_TF_LABEL
-                    df = tf_data.get(exec_label, pd.DataFrame())
+                if self.consecutive_failures >= settings.MAX_CONSECUTIVE_FAILURES:
+                    self.log_event("🚨 Max consecutive trade failures reached!")
+                    send_message("🚨 Max consecutive trade failures reached!", key="failures")
+        
+                current_equity = self.get_balance()
+                if current_equity < settings.EQUITY_ALERT_THRESHOLD and self.last_known_equity >= settings.EQUITY_ALERT_THRESHOLD:
+                    self.log_event(f"🚨 Equity dropped below threshold! Current: ${current_equity:.2f}")
+                    # 🔔 TODO: Add Telegram alert here
+                    send_message(f"🚨 Equity dropped below threshold! Current: ${current_equity:.2f}")
 
-                    if df is None or df.empty:
-                        print(f"[WARN] No usable {.settings.EXECUTION_TF_LABEL} data for {symbol}, skipping.")
+                self.last_known_equity = current_equity
+                self.performance.update_equity(current_equity)
+                time.sleep(settings.LOOP_INTERVAL_SECONDS)
 
-                        continue   
-                    # For classical indicators, we use M5 data
-                    if df.empty:
-                        continue
-                    sentiment = symbol_sentiment_scores.get(symbol, 0.0)
+        finally:
+            self.control.stop()
+            self.trade_manager.gateway.stop()
+            self.pipeline_pool.shutdown(wait=True)
+            self.order_executor.shutdown(wait=True)
+            self.news.stop()
+            self.retrainer.stop()
+            self.notifier.stop()
+            self.performance.save()
+            mt5.shutdown()
+            self.save_indicator_weights()
+            self.log_event("Bot shutdown.")
 
-                    short_ma = df['MA_50'].iloc[-1] if 'MA_50' in df.columns else ta.sma(df['close'], length=50).iloc[-1]
-                    long_ma  = df['MA_200'].iloc[-1] if 'MA_200' in df.columns else ta.sma(df['close'], length=200).iloc[-1]
-                    atr      = df['ATR'].iloc[-1] if 'ATR' in df.columns else ta.atr(df['high'], df['low'], df['close'], length=14).iloc[-1]
+    # ------------------------------------------------------------------
+    # Pipeline per simbolo: fetch/feature in parallelo → inferenza → ordini
+    # ------------------------------------------------------------------
+    def run_pipeline_cycle(self):
+        """
+        One trading cycle over self.symbols in three stages:
+          1. fetch + features, one task per symbol on self.pipeline_pool
+          2. model inference over every symbol that produced features
+          3. decisions, with orders serialized on the single-thread order executor
+        Per-stage wall times (ms) are kept in self.stage_timings.
+        """
+        t0 = time.perf_counter()
+        cfg = self.config.current   # stessi parametri per tutto il ciclo
 
-                    market_phase = self.market_phase_manager.detect_phase_for_symbol(
-                        symbol, df['close'], short_ma, long_ma, atr
-                    )
+        def prepare(symbol):
+            with self.metrics.timer("features", symbol):
+                return self._prepare_symbol(symbol, cfg)
 
-                    signals = self.strategy_manager.calculate_signals(df, market_phase)
+        def place(ctx):
+            with self.metrics.timer("order.place", ctx["symbol"]):
+                return self._place_order(ctx)
 
-                    # Multi-timeframe predictions for AI models:
-                    if .settings.MULTI_TIMEFRAME_ENABLED:
-                        df_m5  = tf_data.get(.settings.EXECUTION_TF_LABEL, pd.DataFrame())
-                        df_m15 = tf_data.get(.settings.EXECUTION_TF_LABEL, pd.DataFrame())
-                        df_h1  = tf_data.get(.settings.EXECUTION_TF_LABEL, pd.DataFrame())
-                        # Use multi-timeframe prediction methods if available.
-                        lstm_pred = self.lstm_models[symbol].predict_multi_timeframe(df_m5, df_m15, df_h1)
-                        cnn_pred = self.cnn_models[symbol].predict_multi_timeframe(df_m5, df_m15, df_h1)
-                    else:
-                        lstm_pred = self.lstm_model.predict_direction(df)
-                        cnn_pattern = self.cnn_model.predict_pattern(df)
+        contexts = [ctx for ctx in self.pipeline_pool.map(prepare, list(self.symbols)) if ctx]
+        t1 = time.perf_counter()
 
-                    sentiment_score = self.sentiment_models[symbol].score(latest_news_text)
+        self._infer_batch(contexts)
+        t2 = time.perf_counter()
 
-                    from .utils.indicator_analysis import learn_indicator_combos
-  
+        orders = []
+        for ctx in contexts:
+            if self._decide(ctx):
+                orders.append(self.order_executor.submit(place, ctx))
+        for future in orders:
+            try:
+                future.result()
+            except Exception as e:
+                self.log_event(f"❌ Order placement failed: {e}")
+        t3 = time.perf_counter()
+
+        for stage, seconds in (("features", t1 - t0), ("inference", t2 - t1), ("orders", t3 - t2), ("cycle", t3 - t0)):
+            self.metrics.record(f"stage.{stage}", seconds)
+        self.stage_timings = {
+            "features_ms": (t1 - t0) * 1000,
+            "inference_ms": (t2 - t1) * 1000,
+            "orders_ms": (t3 - t2) * 1000,
+            "cycle_ms": (t3 - t0) * 1000,
+            "symbols": len(self.symbols),
+            "ready": len(contexts),
+            "orders": len(orders),
+        }
+        st = self.stage_timings
+        self.log_event(
+            f"[Pipeline] symbols={st['symbols']} ready={st['ready']} orders={st['orders']} | "
+            f"features={st['features_ms']:.1f}ms inference={st['inference_ms']:.1f}ms "
+            f"orders={st['orders_ms']:.1f}ms total={st['cycle_ms']:.1f}ms"
+        )
+        return contexts
+
+    def _prepare_symbol(self, symbol, cfg=None):
+        """Stage 1 (worker thread): bootstrap, market check, bars, indicators, signals."""
+        cfg = cfg or self.config.current
+        try:
+            missing = [k for k in ("lstm", "cnn") if not self.registry.has_model(symbol, k)]
+            if missing and symbol not in self._bootstrapping:
+                self.log_event(f"🛠️ Bootstrapping new symbol: {symbol}")
 
-                    # Learn indicator combo performance dynamically
-                    top_combos = learn_indicator_combos(symbol)
+                # Build and enrich data if needed
+                try:
+                    build_from_symbol(symbol, timeframes=[cfg.EXECUTION_TF_LABEL, cfg.EXECUTION_TF_LABEL, cfg.EXECUTION_TF_LABEL])
+                except Exception as e:
+                    self.log_event(f"❌ Failed to build data for {symbol}: {e}")
+                    return None
+
+                # Training in background; finché non c'è il modello del simbolo
+                # l'inferenza usa quello condiviso
+                self._bootstrapping.add(symbol)
+                self.retrain_models(symbol, kinds=missing)
+
+            if self.is_market_closed(symbol):
+                self.log_event(f"⏸️ Market appears closed for {symbol}. Skipping.")
+                return None
+            exec_label = cfg.EXECUTION_TF_LABEL
+            tf_data = self.fetch_multiple_timeframes(symbol, exec_label)
+            df = tf_data.get(exec_label)
 
-                    # Convert predictions to fusion-ready scores
-                    lstm_score = 1.0 if lstm_pred == 1 else -1.0 if lstm_pred == -1 else 0.0
-                    cnn_score = 1.0 if cnn_pattern == "double_bottom" else -1.0 if cnn_pattern == "head_and_shoulders" else 0.0
-                    classical_score = 1.0 if signals.get("buy") else -1.0 if signals.get("sell") else 0.0
+            if df is None or df.empty:
+                self.log_event(f"No usable {exec_label} data for {symbol}, skipping.", logging.WARNING,
+                               symbol=symbol)
+                return None
 
-                    # Fuse it all together
-                    fused_direction = fuse_probabilities(
-                        lstm_score=lstm_score,
-                        cnn_score=cnn_score,
-                        sentiment_score=sentiment_score,
-                        classical_score=classical_score
-                    )
+            # Solo le barre chiuse dall'ultimo ciclo aggiornano gli indicatori
+            ind = self.indicators.update(symbol, exec_label, df, forming_last=serves_forming_bar())
+            ind_df = self.indicators.frame(symbol, exec_label)
+            short_ma, long_ma, atr = ind['MA_50'], ind['MA_200'], ind['ATR']
 
-                    # Translate to direction
-                    if fused_direction == 1:
-                        direction = 'long'
-                    elif fused_direction == -1:
-                        direction = 'short'
-                    else:
-                        direction = 'hold'
-
-                    # Confidence = average absolute strength
-                    confidence = abs(lstm_score + cnn_score + sentiment_score + classical_score) / 4
-                    used_inds = ["lstm", "cnn", "sentiment", "classical"]
-
-                    combo_key = tuple(sorted(used_inds))
-                    if combo_key in top_combos and top_combos[combo_key] > 0:
-                        self.log_event(f"🔥 Combo {combo_key} has avg PnL {top_combos[combo_key]:.2f} — boosting confidence")
-                        confidence *= 1.1
-
-                    #  Now place your message block here:
-                    if confidence > 0.6 or direction != 'hold':
-                        send_message(
-                            f"📊 *{symbol}*\n"
-                            f"LSTM: `{lstm_score:.2f}` | CNN: `{cnn_score:.2f}`\n"
-                            f"Sentiment: `{sentiment_score:.2f}` | Classical: `{classical_score:.2f}`\n"
-                            f"📈 *Direction:* `{direction}` | *Confidence:* `{confidence:.2f}`"
-                        )
-
-
-                    combo_key = tuple(sorted(used_inds))
-                    if combo_key in top_combos and top_combos[combo_key] > 0:
-                        self.log_event(f"🔥 Combo {combo_key} has avg PnL {top_combos[combo_key]:.2f} — boosting confidence")
-                        confidence *= 1.1  # or adjust based on PnL magnitude
-                    final_prob = confidence
-
-                    self.log_event(f"Symbol: {symbol}, Decision: {direction}, Confidence: {confidence:.2f}")
-
-                    if direction == 'hold':
-                        continue
-
-                    can_flip = self.allowed_to_flip_direction(symbol, direction, df, market_phase)
-                    if not can_flip:
-                        continue
-
-                    symbol_info_tick = mt5.symbol_info_tick(symbol)
-                    if not symbol_info_tick:
-                        continue
-
-                    entry_price = symbol_info_tick.ask if direction == 'long' else symbol_info_tick.bid
-                    sl_price = entry_price - (.settings.ATR_MULTIPLIER) if direction == 'long' else entry_price + (.settings.ATR_MULTIPLIER)
-                    lot_size = self.trade_manager.calculate_position_size(
-                        balance=self.get_balance(),
-                        symbol=symbol,
-                        entry_price=entry_price,
-                        sl_price=sl_price,
-                        risk_percent=.settings.RISK_PERCENT,
-                        confidence=confidence
-                    )
-                    trade_result = self.trade_manager.execute_trade(
-                        symbol, direction, entry_price, atr, lot_size, confidence
-                    )
-                    self.trade_manager.update_trailing_stop(symbol)
-                    if trade_result is not None:
-                        last_df_time = df['TradingSystem.TradingBot.time'].iloc[-1]
-                        self.last_flip_bar[symbol] = last_df_time
-                        self.last_direction[symbol] = direction
-
-                        trade_result['used_indicators'] = used_inds
-                        trade_result['phase'] = market_phase
-                        trade_result['symbol'] = symbol
-                        trade_result['atr'] = atr
-                        trade_result['confidence'] = confidence
-                        trade_result['direction'] = direction
-                        trade_result['entry'] = entry_price
-                        trade_result['sl'] = sl_price
-                        trade_result['size'] = lot_size
-                        trade_result['opened_bar'] = last_df_time
-
-                        self.positions.append(trade_result)
-                        self.log_event(f"Opened trade: {trade_result}")
+            market_phase = self.market_phase_manager.detect_phase_for_symbol(
+                symbol, ind_df['close'], short_ma, long_ma, atr
+            )
+            signals = self.strategy_manager.calculate_signals(ind_df, market_phase)
 
-                self.save_indicator_weights()
-                self.log_event("Cycle complete, waiting for next iteration.")
+            # Finestra di feature per LSTM/CNN (stesse colonne del training)
+            try:
+                window = live_feature_window(symbol)
+            except Exception as e:
+                self.log_event(f"⚠️ No model features for {symbol}: {e}")
+                window = None
 
-                if self.consecutive_failures >= .settings.MAX_CONSECUTIVE_FAILURES:
-                    self.log_event("🚨 Max consecutive trade failures reached!")
-                    send_message("🚨 Max consecutive trade failures reached!")
-        
-                current_equity = self.get_balance()
-                if current_equity < .settings.EQUITY_ALERT_THRESHOLD and self.last_known_equity >= .settings.EQUITY_ALERT_THRESHOLD:
-                    self.log_event(f"🚨 Equity dropped below threshold! Current: ${current_equity:.2f}")
-                    # 🔔 TODO: Add Telegram alert here
-                    send_message(f"🚨 Equity dropped below threshold! Current: ${current_equity:.2f}")
+            return {
+                "symbol": symbol,
+                "config": cfg,
+                "tf_data": tf_data,
+                "df": df,
+                "atr": atr,
+                "phase": market_phase,
+                "signals": signals,
+                "window": window,
+            }
+        except Exception as e:
+            self.log_event(f"❌ Feature stage failed for {symbol}: {e}")
+            return None
 
-                self.last_known_equity = current_equity
-                # Patch testing eval
-                # Patch testing eval
-                if settings_manager.FULL_PRODUCTION_MODE:
-                    try:
-                        from TradingSystem.AutoManager.supervisor import evaluate_patch_result_and_decide
-                        evaluate_patch_result_and_decide(
-                            winrate=bot_stats.get("winrate", 1.0),
-                            drawdown=bot_stats.get("max_drawdown", 0.0),
-                            profit=bot_stats.get("daily_profit", 0.0),
-                            precision=bot_stats.get("precision", 1.0)
-                        )
-                    except Exception as e:
-                        self.log_event(f"[PatchEval] Errore valutazione patch: {e}")
-                TradingSystem.TradingBot.time.sleep(.settings.LOOP_INTERVAL_SECONDS)
+    def _infer_batch(self, contexts):
+        """Stage 2: one batched LSTM/CNN pass over every prepared symbol, then sentiment."""
+        with self.metrics.timer("inference", None):
+            preds = self.inference.predict({ctx["symbol"]: ctx["window"] for ctx in contexts})
+        for ctx in contexts:
+            symbol = ctx["symbol"]
+            ctx["lstm_pred"] = preds[symbol]["lstm"]
+            ctx["cnn_pattern"] = preds[symbol]["cnn"]
+            # precalcolato dal NewsSentimentService: nessuna rete/NLP nel ciclo
+            ctx["sentiment"] = self.news.score(symbol)
+
+    def _decide(self, ctx):
+        """Stage 3a: fusion + confidence. Returns True when an order should be placed."""
+        symbol = ctx["symbol"]
+        lstm_pred = ctx["lstm_pred"]
+        cnn_pattern = ctx["cnn_pattern"]
+        sentiment_score = ctx["sentiment"]
+        signals = ctx["signals"]
+        cfg = ctx["config"]
+
+        # Convert predictions to fusion-ready scores
+        lstm_score = 1.0 if lstm_pred == 1 else -1.0 if lstm_pred == -1 else 0.0
+        cnn_score = 1.0 if cnn_pattern == "double_bottom" else -1.0 if cnn_pattern == "head_and_shoulders" else 0.0
+        classical_score = 1.0 if signals.get("buy") else -1.0 if signals.get("sell") else 0.0
+
+        # Fuse it all together (stessa fusione usata dal backtester)
+        direction, confidence, final_prob, used_inds = fuse_probabilities(
+            signals,
+            lstm_pred=(lstm_score + 1) / 2,
+            cnn_pred=cnn_pattern,
+            sentiment=sentiment_score,
+            symbol_weights=self.strategy_manager.get_weights(symbol),
+        )
+
+        # Statistiche combo già indicizzate (aggiornate a ogni trade chiuso): il sottoinsieme
+        # più specifico dei segnali usati, perché le combo salvate hanno al massimo COMBO_MAX_SIZE voci
+        match = self.combo_stats.best_match(symbol, used_inds) if cfg.ENABLE_COMBO_CONFIDENCE_BOOST else None
+        if match and match[1] > 0:
+            combo_key, avg_pnl = match
+            self.log_event(f"🔥 Combo {combo_key} has avg PnL {avg_pnl:.2f} — boosting confidence")
+            confidence *= 1.1  # or adjust based on PnL magnitude
+
+        if cfg.ALERTS_ENABLED and (confidence > 0.6 or direction != 'hold'):
+            # una riga per simbolo nel riepilogo del ciclo, solo se direzione/confidenza cambiano
+            self.notifier.add_to_digest(
+                symbol,
+                f"*{symbol}* `{direction}` conf `{confidence:.2f}` | "
+                f"LSTM `{lstm_score:.2f}` CNN `{cnn_score:.2f}` "
+                f"Sent `{sentiment_score:.2f}` Cls `{classical_score:.2f}`",
+                signature=(direction, round(confidence, 1)),
+            )
+
+        self.log_event(f"Symbol: {symbol}, Decision: {direction}, Confidence: {confidence:.2f}")
+
+        ctx.update(direction=direction, confidence=confidence, final_prob=final_prob, used_inds=used_inds)
+        if direction == 'hold':
+            return False
+        return self.allowed_to_flip_direction(symbol, direction, ctx["df"], ctx["phase"])
+
+    def _place_order(self, ctx):
+        """Stage 3b (order executor thread): sizing, order_send and bookkeeping."""
+        symbol = ctx["symbol"]
+        direction = ctx["direction"]
+        confidence = ctx["confidence"]
+        atr = ctx["atr"]
+        df = ctx["df"]
+
+        symbol_info_tick = mt5.symbol_info_tick(symbol)
+        if not symbol_info_tick:
+            return None
 
-        finally:
-            mt5.shutdown()
-            self.save_indicator_weights()
-            self.log_event("Bot shutdown.")
+        entry_price = symbol_info_tick.ask if direction == 'long' else symbol_info_tick.bid
+        # stesso SL che execute_trade invia al broker
+        sl_price, _, _ = initial_sl_tp(direction, entry_price, atr, confidence)
+        lot_size = self.trade_manager.calculate_position_size(
+            balance=self.get_balance(),
+            symbol=symbol,
+            entry_price=entry_price,
+            sl_price=sl_price,
+            risk_percent=ctx["config"].RISK_PERCENT,
+            confidence=confidence
+        )
+        trade_result = self.trade_manager.execute_trade(
+            symbol, direction, entry_price, atr, lot_size, confidence
+        )
+        self.trade_manager.update_trailing_stop(symbol)
+        if trade_result is not None:
+            last_df_time = df['time'].iloc[-1]
+            self.last_flip_bar[symbol] = last_df_time
+            self.last_direction[symbol] = direction
+
+            trade_result['used_indicators'] = ctx["used_inds"]
+            trade_result['phase'] = ctx["phase"]
+            trade_result['symbol'] = symbol
+            trade_result['atr'] = atr
+            trade_result['confidence'] = confidence
+            trade_result['direction'] = direction
+            trade_result['entry'] = entry_price
+            trade_result['sl'] = sl_price
+            trade_result['size'] = lot_size
+            trade_result['opened_bar'] = last_df_time
+
+            self.positions.append(trade_result)
+            self.log_event(f"Opened trade: {trade_result}")
+            try:
+                log_open_trade(trade_result)
+            except Exception as e:
+                self.log_event(f"⚠️ Trade {trade_result.get('ticket')} non scritto nel journal: {e}", logging.WARNING)
+        return trade_result
 
-    def check_closed_positions(self):
-        open_tickets = {pos.ticket for pos in mt5.positions_get()}
+    def check_closed_positions(self, snapshot=None):
+        snapshot = snapshot or MarketSnapshot.take()
+        closed = [t for t in self.positions if t['ticket'] not in snapshot.positions]
+        deals_by_ticket = snapshot.closed_deals(closed)
         still_open = []
         for trade in self.positions:
-            if trade['ticket'] not in open_tickets:
-                deals = mt5.history_deals_get(ticket=trade['ticket'])
+            if trade['ticket'] not in snapshot.positions:
+                deals = deals_by_ticket.get(trade['ticket'])
                 if deals:
-                    net_profit = sum(d.profit for d in deals if d.ticket == trade['ticket'])
+                    net_profit = sum(d.profit + d.commission + d.swap for d in deals)
                     nominal_cost = trade['entry'] * trade['size']
                     pl_pct = (net_profit / nominal_cost) * 100 if nominal_cost != 0 else 0
                 else:
+                    net_profit = 0.0
                     pl_pct = 0
                 self.log_trade_result(trade, profit=net_profit, pl_pct=pl_pct)
                 self.log_event(f"Trade {trade['ticket']} closed with P/L%: {pl_pct:.2f}")
                 self.daily_pnl += net_profit
 
                 # Reset daily stats if a new day has started
-                if TradingSystem.TradingBot.datetime.now().date() != self.last_reset_date:
+                if datetime.now().date() != self.last_reset_date:
                     self.daily_pnl = 0.0
                     self.daily_start_equity = self.get_balance()
-                    self.last_reset_date = TradingSystem.TradingBot.datetime.now().date()
+                    self.last_reset_date = datetime.now().date()
                     self.daily_loss_triggered = False
 
                 # Trigger auto-disable if loss exceeds threshold
-                if not self.daily_loss_triggered:
+                cfg = self.config.current
+                if cfg.ENABLE_DAILY_LOSS_LIMIT and not self.daily_loss_triggered:
                     loss_pct = (self.daily_pnl / self.daily_start_equity) * 100
-                    if loss_pct <= -.settings.DAILY_LOSS_LIMIT_PCT:
+                    if loss_pct <= -cfg.DAILY_LOSS_LIMIT_PCT:
                         self.log_event(f"🚨 Daily loss limit hit! Net PnL: {loss_pct:.2f}% — disabling trades.")
                         send_message(f"🚨 Bot disabled due to daily loss limit ({loss_pct:.2f}%)")
                         self.daily_loss_triggered = True
 
-                self.strategy_manager.update_weights(
-                    trade['symbol'],
-                    used_indicators=trade['used_indicators'],
-                    pl_pct=pl_pct,
-                    phase=trade['phase'],
-                    direction=trade['direction'],
-                    atr_val=trade.get('atr', 1.0)
-                )
+                if not trade.get('restored'):   # trovato aperto all'avvio: decisione originale ignota
+                    self.strategy_manager.update_weights(
+                        trade['symbol'],
+                        used_indicators=trade['used_indicators'],
+                        pl_pct=pl_pct,
+                        phase=trade['phase'],
+                        direction=trade['direction'],
+                        atr_val=trade.get('atr', 1.0)
+                    )
                 self.trigger_background_retraining(trade["symbol"])
             else:
                 still_open.append(trade)
         self.positions = still_open
 
-    def manage_open_positions(self):
+    def manage_open_positions(self, snapshot=None):
+        """
+        Trailing stop, break-even and partial TP for every open trade in one
+        vectorized pass (same rules as the backtester), on the prices of
+        `snapshot`: broker calls scale with distinct symbols, not positions.
+        """
         if not self.positions:
             return
-        mt5_positions = {p.ticket: p for p in mt5.positions_get()}
+        snapshot = snapshot or MarketSnapshot.take()
+        cfg = self.config.current
+        trades, prices = [], []
         for trade in self.positions:
-            ticket = trade['ticket']
-            if ticket not in mt5_positions:
+            pos = snapshot.positions.get(trade['ticket'])
+            if pos is None:
                 continue
+            trade.setdefault('opened_at', pos.time)   # orario broker, per la query dei deals a chiusura
+            price = snapshot.price(trade['symbol'], trade['direction'])
+            if price is None:
+                continue
+            trades.append(trade)
+            prices.append(price)
+        if not trades:
+            return
 
-            current_pos = mt5_positions[ticket]
-            symbol = trade['symbol']
-            direction = trade['direction']
-            phase = trade['phase']
-            confidence = trade['confidence']
-            atr = trade['atr']
-            entry_price = trade['entry']
-            lot_size = trade['size']
-            current_sl = current_pos.sl
-            current_tp = current_pos.tp
-            current_price = mt5.symbol_info_tick(symbol).bid if direction == 'long' else mt5.symbol_info_tick(symbol).ask
-
-            # Trailing stops
-            if self.enable_trailing_stops:
-                tc = .settings.TRAILING_CONFIG.get(phase, {"base_stop_factor":2.0, "confidence_boost":0.0})
-                ts_factor = tc['base_stop_factor']
-                if confidence > 0.7:
-                    ts_factor += tc['confidence_boost']
-                if direction == 'long':
-                    desired_sl = current_price - (atr * ts_factor)
-                    if desired_sl > current_sl:
-                        self.log_event(f"Updating trailing stop for ticket {ticket}. Old SL={current_sl}, New SL={desired_sl:.5f}")
-                        self.update_sl(ticket, desired_sl)
-                else:
-                    desired_sl = current_price + (atr * ts_factor)
-                    if desired_sl < current_sl or current_sl <= 0:
-                        self.log_event(f"Updating trailing stop for ticket {ticket}. Old SL={current_sl}, New SL={desired_sl:.5f}")
-                        self.update_sl(ticket, desired_sl)
-
-            # Partial TPs
-            if self.enable_partial_tp:
-                ptc = .settings.PARTIAL_TP_CONFIG.get(phase, {"tp_factor":2.0, "confidence_boost":0.0, "partial_close_ratio":0.5})
-                tp_factor = ptc['tp_factor']
-                if confidence > 0.7:
-                    tp_factor += ptc['confidence_boost']
-                if direction == 'long':
-                    gain = current_price - entry_price
-                    if gain >= (atr * tp_factor):
-                        ratio = ptc['partial_close_ratio']
-                        partial_lots = lot_size * ratio
-                        if partial_lots >= 0.01:
-                            self.log_event(f"Taking partial TP on ticket {ticket}. Gains ~ {gain:.5f} => closing {partial_lots} lots.")
-                            self.partial_close_trade(ticket, partial_lots)
-                else:
-                    gain = entry_price - current_price
-                    if gain >= (atr * tp_factor):
-                        ratio = ptc['partial_close_ratio']
-                        partial_lots = lot_size * ratio
-                        if partial_lots >= 0.01:
-                            self.log_event(f"Taking partial TP on ticket {ticket}. Gains ~ {gain:.5f} => closing {partial_lots} lots.")
-                            self.partial_close_trade(ticket, partial_lots)
-
-            # Break-even stops
-            if self.enable_break_even:
-                bec = .settings.BREAK_EVEN_CONFIG.get(phase, {"be_factor":1.5, "confidence_boost":0.5})
-                be_factor = bec['be_factor']
-                if confidence > 0.7:
-                    be_factor += bec['confidence_boost']
-                if direction == 'long':
-                    if (current_price - entry_price) >= (atr * be_factor):
-                        if current_sl < entry_price:
-                            self.log_event(f"Moving SL to break-even for ticket {ticket}. Old SL={current_sl}, BE={entry_price}")
-                            self.update_sl(ticket, entry_price)
-                else:
-                    if (entry_price - current_price) >= (atr * be_factor):
-                        if current_sl == 0 or current_sl > entry_price:
-                            self.log_event(f"Moving SL to break-even for ticket {ticket}. Old SL={current_sl}, BE={entry_price}")
-                            self.update_sl(ticket, entry_price)
-
-    def update_sl(self, ticket, new_sl):
-        pos = mt5.positions_get(ticket=ticket)
+        new_sls, partial_lots = manage_positions(
+            [t['direction'] for t in trades], [t['phase'] for t in trades],
+            [t['confidence'] for t in trades], [t['atr'] for t in trades],
+            [t['entry'] for t in trades], prices,
+            [snapshot.positions[t['ticket']].sl for t in trades], [t['size'] for t in trades],
+            partial_done=[t.get('partial_done', False) for t in trades],
+            trailing=cfg.ENABLE_TRAILING_STOPS,
+            partial_tp=cfg.ENABLE_PARTIAL_TP,
+            break_even=cfg.ENABLE_BREAK_EVEN,
+            cfg=cfg,
+        )
+        for trade, new_sl, lots in zip(trades, new_sls, partial_lots):
+            ticket = trade['ticket']
+            pos = snapshot.positions[ticket]
+            tick = snapshot.tick(pos.symbol)
+            if not np.isnan(new_sl):
+                self.log_event(f"Updating SL for ticket {ticket}. Old SL={pos.sl}, New SL={new_sl:.5f}")
+                self.update_sl(ticket, float(new_sl), position=pos, tick=tick)
+            if lots:
+                self.log_event(f"Taking partial TP on ticket {ticket} => closing {lots} lots.")
+                future = self.partial_close_trade(ticket, float(lots), position=pos, tick=tick)
+                if future is not None:
+                    trade['partial_done'] = True
+                    # se la chiusura fallisce si ritenta al ciclo successivo
+                    future.add_done_callback(
+                        lambda f, t=trade: None if f.exception() is None and succeeded(f.result())
+                        else t.update(partial_done=False))
+
+    def update_sl(self, ticket, new_sl, position=None, tick=None):
+        """`position`/`tick` from the cycle snapshot avoid re-querying the broker."""
+        pos = (position,) if position is not None else mt5.positions_get(ticket=ticket)
         if not pos:
             self.log_event(f"Cannot update SL: no open position for ticket {ticket}.")
             return
         symbol = pos[0].symbol
         direction = pos[0].type
         volume = pos[0].volume
-        price = mt5.symbol_info_tick(symbol).bid if direction == mt5.ORDER_TYPE_BUY else mt5.symbol_info_tick(symbol).ask
+        tick = tick or mt5.symbol_info_tick(symbol)
+        price = tick.bid if direction == mt5.ORDER_TYPE_BUY else tick.ask
 
         request = {
             "action": mt5.TRADE_ACTION_SLTP,
@@ -661,25 +892,45 @@ class ForexTradingBot:
             "magic": 123456,
             "comment": "Update SL",
         }
-        result = mt5.order_send(request)
-        if result.retcode != mt5.TRADE_RETCODE_DONE:
-            self.log_event(f"SL update failed for ticket {ticket}: {result.comment}")
-        else:
-            self.log_event(f"SL updated successfully for ticket {ticket}.")
+        # non bloccante: le modifiche di ticket diversi vanno in parallelo nel gateway
+        future = self.trade_manager.gateway.submit(request)
+        future.add_done_callback(lambda f: self._log_order(
+            f, f"SL updated successfully for ticket {ticket}.", f"SL update failed for ticket {ticket}"))
+        return future
 
-    def trigger_background_retraining(self, symbol):
-        def retrain_task():
-            self.log_event(f"🧠 Starting background retraining for {symbol}...")
-            try:
-                self.lstm_models[symbol].retrain(symbol)
-                self.log_event(f"✅ Retraining complete for {symbol}.")
-            except Exception as e:
-                self.log_event(f"❌ Retraining failed for {symbol}: {e}")
+    def _log_order(self, future, ok_message, fail_message):
+        try:
+            result = future.result()
+        except Exception as e:
+            self.log_event(f"{fail_message}: {e}")
+            return False
+        if succeeded(result):
+            self.log_event(ok_message)
+            return True
+        self.log_event(f"{fail_message}: {result.comment if result is not None else 'no reply from broker'}")
+        return False
+
+    def retrain_models(self, symbol, kinds=("lstm", "cnn"), force=False):
+        """Queues a retrain of the symbol's models on the background scheduler."""
+        self.retrainer.submit(symbol, kinds, force=force)
+
+    def _on_models_retrained(self, symbol, results):
+        # chiamata dal thread di completamento, a nuova versione già attiva
+        for kind, r in results.items():
+            if r["ok"]:
+                if r["previous"]:
+                    self.inference.release(r["previous"])
+                self.log_event(f"✅ Retraining complete for {symbol} {kind} (v{r['version']}).")
+            else:
+                self.log_event(f"❌ Retraining {kind} failed for {symbol}: {r['error']}")
+        self._bootstrapping.discard(symbol)   # se manca ancora un modello, il ciclo lo rimette in coda
 
-        TradingSystem.TradingBot.threading.Thread(target=retrain_task, daemon=True).start()
+    def trigger_background_retraining(self, symbol):
+        self.log_event(f"🧠 Queued background retraining for {symbol}...")
+        self.retrain_models(symbol, kinds=("lstm",))
 
-    def partial_close_trade(self, ticket, close_lots):
-        pos = mt5.positions_get(ticket=ticket)
+    def partial_close_trade(self, ticket, close_lots, position=None, tick=None):
+        pos = (position,) if position is not None else mt5.positions_get(ticket=ticket)
         if not pos:
             self.log_event(f"Partial close failed: no position for ticket {ticket}.")
             return
@@ -688,15 +939,13 @@ class ForexTradingBot:
         if close_lots > volume:
             close_lots = volume
         
-        from .settings import MIN_LOT_SIZE
-  
-
-        if close_lots < MIN_LOT_SIZE:
+        if close_lots < settings.MIN_LOT_SIZE:
             self.log_event(f"Partial close skipped: {close_lots} below MIN_LOT_SIZE.")
             return
 
         direction = mt5.ORDER_TYPE_SELL if pos[0].type == mt5.ORDER_TYPE_BUY else mt5.ORDER_TYPE_BUY
-        price = mt5.symbol_info_tick(symbol).bid if direction == mt5.ORDER_TYPE_SELL else mt5.symbol_info_tick(symbol).ask
+        tick = tick or mt5.symbol_info_tick(symbol)
+        price = tick.bid if direction == mt5.ORDER_TYPE_SELL else tick.ask
 
         request = {
             "action": mt5.TRADE_ACTION_DEAL,
@@ -711,11 +960,10 @@ class ForexTradingBot:
             "type_time": mt5.ORDER_TIME_GTC,
             "type_filling": mt5.ORDER_FILLING_IOC,
         }
-        result = mt5.order_send(request)
-        if result.retcode != mt5.TRADE_RETCODE_DONE:
-            self.log_event(f"Partial close failed: {result.comment}")
-        else:
-            self.log_event(f"Closed {close_lots} lots from ticket {ticket}.")
+        future = self.trade_manager.gateway.submit(request)
+        future.add_done_callback(lambda f: self._log_order(
+            f, f"Closed {close_lots} lots from ticket {ticket}.", "Partial close failed"))
+        return future
 
 def main():
     print("Main originale del bot.")
\ No newline at end of file
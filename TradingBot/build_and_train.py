@@ -2,9 +2,9 @@
 import os
 import json
 from settings import ACTIVE_SYMBOLS_PATH
-from models.lstm_model import LSTMModel
-from models.cnn_model import CNNModel
-from utils.training_data_builder import build_from_symbol
+from models.model_registry import get_model_registry
+from models.retrain_scheduler import retrain_now
+from utils.training_data_builder import build_datasets, enabled_timeframes
 
 def main():
     # 1) Carica dinamicamente la lista dei simboli attivi
@@ -15,33 +15,21 @@ def main():
     with open(ACTIVE_SYMBOLS_PATH, "r") as f:
         symbols = json.load(f)
 
-    # 2) Costruisci (se mancano) i CSV con i dati + indicatori
-    for sym in symbols:
-        print(f"[DATA] Building training data for {sym}…")
-        try:
-            build_from_symbol(sym)
-        except Exception as e:
-            print(f"[DATA] FAILED for {sym}: {e}")
-
-    # 3) Instanzia i modelli (usano al loro interno build/retrain)
-    lstm_model = LSTMModel()
-    cnn_model = CNNModel()
+    # 2) Aggiorna i dataset (solo barre nuove) in parallelo su (simbolo, timeframe)
+    build_datasets([(sym, tf) for sym in symbols for tf in enabled_timeframes()])
 
-    # 4) Loop di retraining (loro gestiscono internamente se ci sono dati a sufficienza)
+    # 3) Fine-tuning in questo processo, come i job del RetrainScheduler:
+    #    modello corrente (o condiviso) → fit_on_sequences → staging → registry
+    registry = get_model_registry()
     for sym in symbols:
-        print(f"[TRAIN] Retraining LSTM for {sym}…")
-        try:
-            lstm_model.retrain(sym)
-            print(f"[TRAIN] ✅ LSTM retrained and saved for {sym}")
-        except Exception as e:
-            print(f"[TRAIN] Error during LSTM retraining for {sym}: {e}")
-
-        print(f"[TRAIN] Retraining CNN for {sym}…")
-        try:
-            cnn_model.retrain(sym)
-            print(f"[TRAIN] ✅ CNN retrained and saved for {sym}")
-        except Exception as e:
-            print(f"[TRAIN] Error during CNN retraining for {sym}: {e}")
+        for kind in ("lstm", "cnn"):
+            print(f"[TRAIN] Retraining {kind.upper()} for {sym}…")
+            result = retrain_now(sym, kind, registry, source="build_and_train")
+            if result["ok"]:
+                print(f"[TRAIN] ✅ {kind.upper()} retrained for {sym} "
+                      f"(v{result['version']}, val_accuracy={result['val_accuracy']:.3f})")
+            else:
+                print(f"[TRAIN] Error during {kind.upper()} retraining for {sym}: {result['error']}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
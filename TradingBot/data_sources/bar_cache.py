@@ -0,0 +1,178 @@
+# data_sources/bar_cache.py
+
+"""
+Shared OHLCV cache keyed by (symbol, timeframe).
+
+Each key owns a preallocated ring buffer of MT5 rates rows. A refresh asks
+the broker only for the bars newer than the last cached one (the still-open
+bar is simply overwritten), and readers get read-only views of the last N
+rows instead of a fresh array/DataFrame per call.
+
+Views stay valid until the next refresh of the same key: copy them if
+they have to outlive the current cycle.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+import settings
+from data_sources.broker import mt5
+
+
+def timeframe_code(timeframe):
+    """Accepts an MT5 timeframe constant or a label from MULTI_TIMEFRAME_LIST ("M5")."""
+    if isinstance(timeframe, str):
+        for code, label in settings.MULTI_TIMEFRAME_LIST:
+            if label == timeframe.upper():
+                return code
+        raise ValueError(f"Label TF non valida: {timeframe}")
+    return timeframe
+
+
+class BarRing:
+    """
+    Fixed-capacity ring of rates rows. Every row is written twice (slot i
+    and i + capacity), so the newest n rows are always one contiguous slice
+    of the buffer and latest(n) never copies.
+    """
+
+    def __init__(self, capacity, dtype):
+        self.capacity = capacity
+        self.buf = np.zeros(2 * capacity, dtype=dtype)
+        self.head = 0   # slot della prossima scrittura
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def last_time(self):
+        if not self.size:
+            return None
+        return int(self.buf[self.head - 1 + self.capacity]["time"])
+
+    def clear(self):
+        self.head = 0
+        self.size = 0
+
+    def extend(self, rows):
+        if len(rows) > self.capacity:
+            rows = rows[-self.capacity:]
+        k = len(rows)
+        if not k:
+            return
+        slots = (self.head + np.arange(k)) % self.capacity
+        for name in self.buf.dtype.names:
+            self.buf[name][slots] = rows[name]
+            self.buf[name][slots + self.capacity] = rows[name]
+        self.head = (self.head + k) % self.capacity
+        self.size = min(self.capacity, self.size + k)
+
+    def truncate_from(self, t):
+        """Drops the newest rows with time >= t (e.g. the bar still forming)."""
+        times = self.latest(self.size)["time"]
+        drop = self.size - int(np.searchsorted(times, t, side="left"))
+        if drop:
+            self.head = (self.head - drop) % self.capacity
+            self.size -= drop
+
+    def latest(self, n):
+        n = min(int(n), self.size)
+        end = self.head + self.capacity
+        view = self.buf[end - n:end]
+        view.flags.writeable = False
+        return view
+
+
+class _Entry:
+    __slots__ = ("ring", "lock", "fetched_at")
+
+    def __init__(self):
+        self.ring = None
+        self.lock = threading.Lock()
+        self.fetched_at = 0.0
+
+
+class BarCache:
+    def __init__(self, capacity=None, ttl=None):
+        self.capacity = capacity or settings.BAR_CACHE_CAPACITY
+        self.ttl = settings.BAR_CACHE_TTL_SECONDS if ttl is None else ttl
+        self._entries = {}
+        self._entries_lock = threading.Lock()
+
+    def _entry(self, symbol, timeframe):
+        key = (symbol, timeframe)
+        entry = self._entries.get(key)
+        if entry is None:
+            with self._entries_lock:
+                entry = self._entries.setdefault(key, _Entry())
+        return entry
+
+    def _fetch_delta(self, symbol, timeframe, ring):
+        """Fetches from the newest bar backwards, doubling until it overlaps the cache."""
+        last = ring.last_time
+        count = settings.BAR_CACHE_DELTA_BARS
+        while True:
+            rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, count)
+            if rates is None or len(rates) == 0:
+                return rates
+            if int(rates["time"][0]) <= last or len(rates) < count or count >= ring.capacity:
+                break
+            count = min(count * 2, ring.capacity)
+        if int(rates["time"][0]) > last:
+            # buco più lungo del buffer: si ricarica tutto
+            ring.clear()
+        else:
+            ring.truncate_from(int(rates["time"][0]))
+        return rates
+
+    def refresh(self, symbol, timeframe, min_bars=0, force=False):
+        """Brings (symbol, timeframe) up to date. Returns the number of cached bars."""
+        timeframe = timeframe_code(timeframe)
+        entry = self._entry(symbol, timeframe)
+        with entry.lock:
+            now = time.monotonic()
+            ring = entry.ring
+            # dentro il ttl basta la cache, salvo richieste più lunghe del buffer
+            if (not force and ring is not None and min_bars <= ring.capacity
+                    and len(ring) >= min_bars and now - entry.fetched_at < self.ttl):
+                return len(ring)
+
+            if ring is None or min_bars > ring.capacity or not len(ring):
+                capacity = max(self.capacity, min_bars, ring.capacity if ring else 0)
+                rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, capacity)
+                if rates is None or len(rates) == 0:
+                    return 0
+                ring = entry.ring = BarRing(capacity, rates.dtype)
+            else:
+                rates = self._fetch_delta(symbol, timeframe, ring)
+                if rates is None or len(rates) == 0:
+                    return len(ring)
+            ring.extend(rates)
+            entry.fetched_at = now
+            return len(ring)
+
+    def get(self, symbol, timeframe, count):
+        """
+        Last `count` bars (oldest first) as a read-only view of the cache,
+        or None if the broker has no data. Refreshes at most once per ttl.
+        """
+        if not self.refresh(symbol, timeframe, min_bars=count):
+            return None
+        entry = self._entry(symbol, timeframe_code(timeframe))
+        with entry.lock:
+            return entry.ring.latest(count)
+
+    def invalidate(self, symbol=None):
+        with self._entries_lock:
+            if symbol is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == symbol]:
+                    del self._entries[key]
+
+
+# Istanza condivisa da bot, TradeManager e fusion_engine
+bar_cache = BarCache()
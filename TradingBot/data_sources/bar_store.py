@@ -0,0 +1,137 @@
+# data_sources/bar_store.py
+
+"""
+On-disk historical bars, one dataset per (symbol, timeframe).
+
+    <root>/<SYMBOL>_<TF>/
+        manifest.json        covered range + one entry per partition
+        2024-05.parquet      closed bars of that month (UTC), typed columns
+
+Only raw OHLCV is stored: indicators are recomputed when a dataset is
+loaded, so appending never leaves them inconsistent with the history.
+Appending new bars rewrites at most the partitions they fall in (normally
+the current month), and readers use the manifest to open only the
+partitions overlapping the requested range.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import settings
+
+MANIFEST = "manifest.json"
+
+# Colonne e tipi di copy_rates_* (time come datetime64 UTC naive, come nei CSV)
+COLUMN_TYPES = {
+    "open": "float64", "high": "float64", "low": "float64", "close": "float64",
+    "tick_volume": "int64", "spread": "int32", "real_volume": "int64",
+}
+
+
+def dataset_dir(symbol, tf_label, root=None):
+    return os.path.join(root or settings.DATASET_DIR, f"{symbol}_{tf_label}")
+
+
+def to_frame(rates):
+    """Rates array or DataFrame → typed frame with datetime `time`, sorted and unique."""
+    df = pd.DataFrame(rates)
+    if df.empty:
+        return pd.DataFrame(columns=["time", *COLUMN_TYPES])
+    if pd.api.types.is_numeric_dtype(df["time"]):
+        df["time"] = pd.to_datetime(df["time"], unit="s")
+    else:
+        df["time"] = pd.to_datetime(df["time"])
+    for col, dtype in COLUMN_TYPES.items():
+        if col not in df:
+            df[col] = df["tick_volume"] if col == "real_volume" and "tick_volume" in df else 0
+        df[col] = df[col].fillna(0).astype(dtype)
+    df = df[["time", *COLUMN_TYPES]]
+    return df.drop_duplicates("time", keep="last").sort_values("time").reset_index(drop=True)
+
+
+def read_manifest(symbol, tf_label, root=None):
+    path = os.path.join(dataset_dir(symbol, tf_label, root), MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _epoch(ts):
+    """Epoch seconds from epoch numbers, datetimes or date strings (None passes through)."""
+    if ts is None or isinstance(ts, (int, float, np.integer, np.floating)):
+        return ts
+    return int(pd.Timestamp(ts).value // 10**9)
+
+
+def append_bars(symbol, tf_label, rates, root=None):
+    """
+    Adds closed bars newer than the dataset's last one. Returns the number
+    of rows added.
+    """
+    new = to_frame(rates)
+    manifest = read_manifest(symbol, tf_label, root) or {
+        "symbol": symbol, "timeframe": tf_label, "partitions": {}}
+    last = manifest.get("last_time")
+    if last is not None:
+        new = new[new["time"] > pd.to_datetime(last, unit="s")]
+    if new.empty:
+        return 0
+
+    folder = dataset_dir(symbol, tf_label, root)
+    os.makedirs(folder, exist_ok=True)
+    partitions = manifest["partitions"]
+    for month, chunk in new.groupby(new["time"].dt.strftime("%Y-%m"), sort=True):
+        fname = f"{month}.parquet"
+        path = os.path.join(folder, fname)
+        if month in partitions and os.path.exists(path):
+            chunk = pd.concat([pd.read_parquet(path), chunk], ignore_index=True)
+        tmp = path + ".tmp"
+        chunk.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        partitions[month] = {
+            "file": fname,
+            "first_time": _epoch(chunk["time"].iloc[0]),
+            "last_time": _epoch(chunk["time"].iloc[-1]),
+            "rows": int(len(chunk)),
+        }
+
+    manifest["partitions"] = dict(sorted(partitions.items()))
+    parts = list(manifest["partitions"].values())
+    manifest["first_time"] = parts[0]["first_time"]
+    manifest["last_time"] = parts[-1]["last_time"]
+    manifest["rows"] = sum(p["rows"] for p in parts)
+    tmp = os.path.join(folder, MANIFEST + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(folder, MANIFEST))
+    return int(len(new))
+
+
+def read_bars(symbol, tf_label, start=None, end=None, root=None):
+    """
+    Bars with start <= time <= end (epoch seconds or datetime) as a typed
+    DataFrame, or None if the dataset does not exist.
+    """
+    manifest = read_manifest(symbol, tf_label, root)
+    if manifest is None:
+        return None
+    lo, hi = _epoch(start), _epoch(end)
+
+    folder = dataset_dir(symbol, tf_label, root)
+    frames = [
+        pd.read_parquet(os.path.join(folder, p["file"]))
+        for p in manifest["partitions"].values()
+        if (lo is None or p["last_time"] >= lo) and (hi is None or p["first_time"] <= hi)
+    ]
+    if not frames:
+        return to_frame([])
+    df = pd.concat(frames, ignore_index=True)
+    if lo is not None:
+        df = df[df["time"] >= pd.to_datetime(lo, unit="s")]
+    if hi is not None:
+        df = df[df["time"] <= pd.to_datetime(hi, unit="s")]
+    return df.reset_index(drop=True)
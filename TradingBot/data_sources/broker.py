@@ -0,0 +1,110 @@
+# data_sources/broker.py
+
+"""
+Pluggable broker backend.
+
+The bot talks to the broker only through the `mt5` object exported here,
+which forwards every attribute to the active backend:
+  - "mt5"    → the real MetaTrader5 terminal (Windows only)
+  - "replay" → FakeMT5Reader over local bar files (settings.REPLAY_DATA_DIR)
+
+The backend is chosen by settings.BROKER_BACKEND on first use, or injected
+explicitly with set_broker() (benchmarks, backtests).
+
+With settings.METRICS_ENABLED every call through `mt5` is timed into
+utils.latency_metrics, per call name and symbol (order_send split by
+action: order_send.deal / order_send.sltp).
+"""
+
+import functools
+import time
+
+import settings
+from utils.latency_metrics import get_metrics
+
+_backend = None
+
+
+def _load_default():
+    kind = getattr(settings, "BROKER_BACKEND", "mt5")
+    if kind == "replay":
+        from data_sources.fake_mt5_reader import FakeMT5Reader
+        return FakeMT5Reader(
+            data_dir=settings.REPLAY_DATA_DIR,
+            balance=settings.DEFAULT_BALANCE,
+            spread_points=settings.REPLAY_SPREAD_POINTS,
+            slippage_points=settings.REPLAY_SLIPPAGE_POINTS,
+        )
+    if kind == "mt5":
+        import MetaTrader5
+        return MetaTrader5
+    raise ValueError(f"Unknown BROKER_BACKEND: {kind}")
+
+
+def get_broker():
+    """Returns the active backend, creating the default one if needed."""
+    global _backend
+    if _backend is None:
+        _backend = _load_default()
+    return _backend
+
+
+def set_broker(backend):
+    """Replaces the active backend (e.g. a FakeMT5Reader built by a test harness)."""
+    global _backend
+    _backend = backend
+    return backend
+
+
+def serves_forming_bar():
+    """True when copy_rates_from_pos(..., 0, n) ends with the still-open bar (real MT5)."""
+    return getattr(get_broker(), "serves_forming_bar", True)
+
+
+ORDER_ACTIONS = {1: "deal", 5: "remove", 6: "sltp", 7: "modify"}   # TRADE_ACTION_*
+
+
+def _call_symbol(name, args, kwargs):
+    if name == "order_send" and args and isinstance(args[0], dict):
+        return args[0].get("symbol")
+    if args and isinstance(args[0], str):
+        return args[0]
+    return kwargs.get("symbol")
+
+
+def _timed(name, func):
+    metrics = get_metrics()
+
+    @functools.wraps(func)
+    def call(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            label = name
+            if name == "order_send" and args and isinstance(args[0], dict):
+                label = f"order_send.{ORDER_ACTIONS.get(args[0].get('action'), args[0].get('action'))}"
+            metrics.record(label, time.perf_counter() - start, _call_symbol(name, args, kwargs))
+    return call
+
+
+class _BrokerProxy:
+    def __init__(self):
+        self._wrapped = {}   # (id backend, nome) -> funzione cronometrata
+
+    def __getattr__(self, name):
+        backend = get_broker()
+        attr = getattr(backend, name)
+        if not callable(attr) or name.startswith("_") or not getattr(settings, "METRICS_ENABLED", False):
+            return attr
+        key = (id(backend), name)
+        wrapped = self._wrapped.get(key)
+        if wrapped is None or wrapped.__wrapped__ != attr:
+            wrapped = self._wrapped[key] = _timed(name, attr)
+        return wrapped
+
+    def __repr__(self):
+        return f"<broker {get_broker()!r}>"
+
+
+mt5 = _BrokerProxy()
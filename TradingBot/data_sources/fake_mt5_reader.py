@@ -0,0 +1,569 @@
+# data_sources/fake_mt5_reader.py
+
+"""
+Offline stand-in for the `MetaTrader5` module.
+
+FakeMT5Reader replays local OHLCV bar files (Parquet or CSV) and simulates
+fills, so the bot can run on Linux without a terminal. Only the subset of
+the MT5 API used by the bot is implemented, with the same names,
+constants and return shapes (structured numpy arrays for rates,
+namedtuples for ticks/positions/deals/results).
+
+Bar files are looked up as `<data_dir>/<SYMBOL>_<TF>/` (a partitioned
+dataset written by data_sources.bar_store), `<SYMBOL>_<TF>.parquet` or
+`.csv`, the same naming used by `data/processed/`. Required columns: time,
+open, high, low, close; tick_volume, spread and real_volume are optional.
+"""
+
+import os
+import threading
+import time as _time
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------------------------------
+# Costanti con gli stessi valori del terminale MT5
+# ---------------------------------------------------------------------------
+TIMEFRAME_M1 = 1
+TIMEFRAME_M5 = 5
+TIMEFRAME_M15 = 15
+TIMEFRAME_M30 = 30
+TIMEFRAME_H1 = 16385
+TIMEFRAME_H4 = 16388
+TIMEFRAME_D1 = 16408
+TIMEFRAME_W1 = 32769
+TIMEFRAME_MN1 = 49153
+
+ORDER_TYPE_BUY = 0
+ORDER_TYPE_SELL = 1
+POSITION_TYPE_BUY = 0
+POSITION_TYPE_SELL = 1
+
+TRADE_ACTION_DEAL = 1
+TRADE_ACTION_SLTP = 6
+
+ORDER_TIME_GTC = 0
+ORDER_FILLING_FOK = 0
+ORDER_FILLING_IOC = 1
+
+DEAL_ENTRY_IN = 0
+DEAL_ENTRY_OUT = 1
+
+TRADE_RETCODE_REQUOTE = 10004
+TRADE_RETCODE_REJECT = 10006
+TRADE_RETCODE_DONE = 10009
+TRADE_RETCODE_INVALID = 10013
+TRADE_RETCODE_INVALID_VOLUME = 10014
+TRADE_RETCODE_INVALID_STOPS = 10016
+TRADE_RETCODE_MARKET_CLOSED = 10018
+TRADE_RETCODE_NO_MONEY = 10019
+TRADE_RETCODE_PRICE_CHANGED = 10020
+TRADE_RETCODE_PRICE_OFF = 10021
+TRADE_RETCODE_POSITION_CLOSED = 10036
+
+TIMEFRAME_LABELS = {
+    TIMEFRAME_M1: "M1", TIMEFRAME_M5: "M5", TIMEFRAME_M15: "M15",
+    TIMEFRAME_M30: "M30", TIMEFRAME_H1: "H1", TIMEFRAME_H4: "H4",
+    TIMEFRAME_D1: "D1", TIMEFRAME_W1: "W1", TIMEFRAME_MN1: "MN1",
+}
+TIMEFRAME_SECONDS = {
+    TIMEFRAME_M1: 60, TIMEFRAME_M5: 300, TIMEFRAME_M15: 900,
+    TIMEFRAME_M30: 1800, TIMEFRAME_H1: 3600, TIMEFRAME_H4: 14400,
+    TIMEFRAME_D1: 86400, TIMEFRAME_W1: 604800, TIMEFRAME_MN1: 2592000,
+}
+
+RATES_DTYPE = np.dtype([
+    ("time", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"),
+    ("close", "<f8"), ("tick_volume", "<u8"), ("spread", "<i4"),
+    ("real_volume", "<u8"),
+])
+
+Tick = namedtuple("Tick", "time bid ask last volume time_msc flags volume_real")
+SymbolInfo = namedtuple(
+    "SymbolInfo",
+    "name visible point digits spread volume_min volume_max volume_step trade_contract_size",
+)
+AccountInfo = namedtuple(
+    "AccountInfo", "login balance equity profit margin margin_free leverage currency"
+)
+TradePosition = namedtuple(
+    "TradePosition",
+    "ticket time type magic identifier volume price_open sl tp "
+    "price_current profit symbol comment",
+)
+TradeDeal = namedtuple(
+    "TradeDeal",
+    "ticket order time type entry magic position_id volume price "
+    "commission swap profit symbol comment",
+)
+OrderSendResult = namedtuple(
+    "OrderSendResult",
+    "retcode deal order volume price bid ask comment request_id request",
+)
+
+
+def _digits_for_price(price):
+    if price < 10:
+        return 5
+    if price < 1000:
+        return 3
+    return 2
+
+
+class FakeMT5Reader:
+    """
+    Replay broker. The simulated clock (`now`, epoch seconds) decides which
+    bars are "closed": rates/ticks never leak data from after the clock.
+    With `now=None` the reader serves the end of every file, which is what
+    a latency benchmark of the live loop wants.
+    """
+
+    # A differenza del terminale, copy_rates_* non restituisce la barra in formazione
+    serves_forming_bar = False
+
+    def __init__(self, data_dir="data/processed", balance=10_000.0,
+                 spread_points=10, slippage_points=0, contract_size=100_000,
+                 start=None, stamp_ticks_now=True, leverage=100):
+        self.data_dir = data_dir
+        self.start_balance = float(balance)
+        self.balance = float(balance)
+        self.spread_points = spread_points
+        self.slippage_points = slippage_points
+        self.contract_size = contract_size
+        self.leverage = leverage
+        # Il loop live scarta i tick più vecchi di 5 minuti (is_market_closed):
+        # in replay li timbriamo con l'orologio reale per non saltare i simboli.
+        self.stamp_ticks_now = stamp_ticks_now
+        self.now = None if start is None else self._to_epoch(start)
+
+        self._rates = {}          # (symbol, tf) -> structured array
+        self._positions = {}      # ticket -> dict
+        self._deals = []
+        self._next_ticket = 1
+        self._last_error = (1, "Success")
+        self._initialized = False
+        self._stops_checked_at = {}
+        self._lock = threading.RLock()   # order_send arriva da più thread (gateway ordini)
+
+    def __getattr__(self, name):
+        # Costanti (TIMEFRAME_*, ORDER_*, TRADE_*, ...) come sul modulo MT5
+        if name.isupper() and name in globals():
+            return globals()[name]
+        raise AttributeError(name)
+
+    # ------------------------------------------------------------------
+    # Connessione
+    # ------------------------------------------------------------------
+    def initialize(self, *args, **kwargs):
+        if not os.path.isdir(self.data_dir):
+            self._last_error = (-10003, f"Replay data dir not found: {self.data_dir}")
+            return False
+        self._initialized = True
+        return True
+
+    def shutdown(self):
+        # Lo stato (posizioni, deal) resta: fusion_engine e i builder fanno
+        # initialize()/shutdown() in mezzo al loop.
+        self._initialized = False
+        return True
+
+    def last_error(self):
+        return self._last_error
+
+    # ------------------------------------------------------------------
+    # Orologio di replay
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _to_epoch(value):
+        if isinstance(value, (int, np.integer)):
+            return int(value)
+        if isinstance(value, float):
+            return int(value)
+        return int(pd.Timestamp(value).timestamp())
+
+    def set_time(self, value):
+        """Moves the replay clock to `value` and fires any SL/TP crossed on the way."""
+        with self._lock:
+            self.now = self._to_epoch(value)
+            self._check_stops()
+
+    def advance(self, seconds=300):
+        """Moves the clock forward (default: one M5 bar)."""
+        if self.now is None:
+            return
+        self.set_time(self.now + int(seconds))
+
+    # ------------------------------------------------------------------
+    # Dati
+    # ------------------------------------------------------------------
+    def _load(self, symbol, timeframe):
+        key = (symbol, timeframe)
+        if key in self._rates:
+            return self._rates[key]
+
+        # import locale: bar_store importa settings, che senza MetaTrader5 importa questo modulo
+        from data_sources import bar_store
+
+        label = TIMEFRAME_LABELS.get(timeframe, str(timeframe))
+        base = os.path.join(self.data_dir, f"{symbol}_{label}")
+        if os.path.exists(os.path.join(base, bar_store.MANIFEST)):
+            df = bar_store.read_bars(symbol, label, root=self.data_dir)
+        elif os.path.exists(base + ".parquet"):
+            df = pd.read_parquet(base + ".parquet")
+        elif os.path.exists(base + ".csv"):
+            df = pd.read_csv(base + ".csv")
+        else:
+            self._rates[key] = None
+            return None
+
+        if pd.api.types.is_numeric_dtype(df["time"]):
+            times = df["time"].to_numpy(dtype="int64")
+        else:
+            times = pd.to_datetime(df["time"]).to_numpy().astype("datetime64[s]").astype("int64")
+
+        rates = np.zeros(len(df), dtype=RATES_DTYPE)
+        rates["time"] = times
+        for col in ("open", "high", "low", "close"):
+            rates[col] = df[col].to_numpy(dtype="float64")
+        if "tick_volume" in df:
+            rates["tick_volume"] = df["tick_volume"].fillna(0).to_numpy()
+        if "spread" in df:
+            rates["spread"] = df["spread"].fillna(0).to_numpy()
+        if "real_volume" in df:
+            rates["real_volume"] = df["real_volume"].fillna(0).to_numpy()
+        rates.sort(order="time")
+
+        self._rates[key] = rates
+        return rates
+
+    def load_rates(self, symbol, timeframe, rates):
+        """Registers an in-memory rates array (same dtype as copy_rates_*)."""
+        arr = np.asarray(rates)
+        if arr.dtype != RATES_DTYPE:
+            full = np.zeros(len(arr), dtype=RATES_DTYPE)
+            for name in arr.dtype.names:
+                if name in RATES_DTYPE.names:
+                    full[name] = arr[name]
+            arr = full
+        self._rates[(symbol, timeframe)] = arr
+
+    def _closed(self, symbol, timeframe):
+        rates = self._load(symbol, timeframe)
+        if rates is None:
+            return None
+        if self.now is None:
+            return rates
+        # Una barra è chiusa quando time + durata <= now
+        cutoff = self.now - TIMEFRAME_SECONDS.get(timeframe, 0)
+        end = np.searchsorted(rates["time"], cutoff, side="right")
+        return rates[:end]
+
+    def _base_timeframe(self, symbol):
+        for tf in sorted(TIMEFRAME_SECONDS, key=TIMEFRAME_SECONDS.get):
+            if self._load(symbol, tf) is not None:
+                return tf
+        return None
+
+    def copy_rates_from_pos(self, symbol, timeframe, start_pos, count):
+        rates = self._closed(symbol, timeframe)
+        if rates is None:
+            self._last_error = (-2, f"No history for {symbol}")
+            return None
+        end = len(rates) - int(start_pos)
+        if end <= 0:
+            return np.zeros(0, dtype=RATES_DTYPE)
+        return rates[max(0, end - int(count)):end].copy()
+
+    def copy_rates_from(self, symbol, timeframe, date_from, count):
+        rates = self._closed(symbol, timeframe)
+        if rates is None:
+            self._last_error = (-2, f"No history for {symbol}")
+            return None
+        end = np.searchsorted(rates["time"], self._to_epoch(date_from), side="right")
+        return rates[max(0, end - int(count)):end].copy()
+
+    def copy_rates_range(self, symbol, timeframe, date_from, date_to):
+        rates = self._closed(symbol, timeframe)
+        if rates is None:
+            self._last_error = (-2, f"No history for {symbol}")
+            return None
+        lo = np.searchsorted(rates["time"], self._to_epoch(date_from), side="left")
+        hi = np.searchsorted(rates["time"], self._to_epoch(date_to), side="right")
+        return rates[lo:hi].copy()
+
+    def _available_symbols(self):
+        from data_sources import bar_store
+
+        if not os.path.isdir(self.data_dir):
+            return []
+        names = set()
+        for fn in os.listdir(self.data_dir):
+            stem, ext = os.path.splitext(fn)
+            if ext in (".csv", ".parquet") and "_" in stem:
+                names.add(stem.rsplit("_", 1)[0])
+            elif "_" in fn and os.path.exists(os.path.join(self.data_dir, fn, bar_store.MANIFEST)):
+                names.add(fn.rsplit("_", 1)[0])
+        return sorted(names)
+
+    def symbols_get(self, group=None):
+        out = []
+        for name in self._available_symbols():
+            info = self.symbol_info(name)
+            if info:
+                out.append(info)
+        return tuple(out)
+
+    def symbol_select(self, symbol, enable=True):
+        return self._base_timeframe(symbol) is not None
+
+    def symbol_info(self, symbol):
+        tf = self._base_timeframe(symbol)
+        if tf is None:
+            return None
+        rates = self._load(symbol, tf)
+        ref_price = float(rates["close"][-1]) if len(rates) else 1.0
+        digits = _digits_for_price(ref_price)
+        return SymbolInfo(
+            name=symbol, visible=True, point=10 ** -digits, digits=digits,
+            spread=self.spread_points, volume_min=0.01, volume_max=100.0,
+            volume_step=0.01, trade_contract_size=self.contract_size,
+        )
+
+    def symbol_info_tick(self, symbol):
+        tf = self._base_timeframe(symbol)
+        if tf is None:
+            return None
+        rates = self._closed(symbol, tf)
+        if rates is None or len(rates) == 0:
+            return None
+        bar = rates[-1]
+        point = 10 ** -_digits_for_price(float(bar["close"]))
+        bid = float(bar["close"])
+        ask = bid + self.spread_points * point
+        if self.stamp_ticks_now:
+            ts = int(_time.time())
+        else:
+            ts = int(bar["time"]) + TIMEFRAME_SECONDS[tf]
+        return Tick(time=ts, bid=bid, ask=ask, last=bid, volume=int(bar["tick_volume"]),
+                    time_msc=ts * 1000, flags=0, volume_real=float(bar["real_volume"]))
+
+    # ------------------------------------------------------------------
+    # Conto e posizioni
+    # ------------------------------------------------------------------
+    def _floating(self, pos, tick=None):
+        tick = tick or self.symbol_info_tick(pos["symbol"])
+        if not tick:
+            return 0.0, pos["price_open"]
+        if pos["type"] == POSITION_TYPE_BUY:
+            price = tick.bid
+            diff = price - pos["price_open"]
+        else:
+            price = tick.ask
+            diff = pos["price_open"] - price
+        return diff * pos["volume"] * self.contract_size, price
+
+    def account_info(self):
+        positions = list(self._positions.values())
+        floating = sum(self._floating(p)[0] for p in positions)
+        margin = sum(
+            p["volume"] * self.contract_size * p["price_open"] / self.leverage
+            for p in positions
+        )
+        equity = self.balance + floating
+        return AccountInfo(
+            login=0, balance=round(self.balance, 2), equity=round(equity, 2),
+            profit=round(floating, 2), margin=round(margin, 2),
+            margin_free=round(equity - margin, 2), leverage=self.leverage,
+            currency="USD",
+        )
+
+    def _as_position(self, pos):
+        profit, price = self._floating(pos)
+        return TradePosition(
+            ticket=pos["ticket"], time=pos["time"], type=pos["type"],
+            magic=pos["magic"], identifier=pos["ticket"], volume=pos["volume"],
+            price_open=pos["price_open"], sl=pos["sl"], tp=pos["tp"],
+            price_current=price, profit=round(profit, 2), symbol=pos["symbol"],
+            comment=pos["comment"],
+        )
+
+    def positions_get(self, symbol=None, ticket=None, group=None):
+        out = []
+        for pos in list(self._positions.values()):
+            if symbol is not None and pos["symbol"] != symbol:
+                continue
+            if ticket is not None and pos["ticket"] != ticket:
+                continue
+            out.append(self._as_position(pos))
+        return tuple(out)
+
+    def positions_total(self):
+        return len(self._positions)
+
+    def history_deals_get(self, date_from=None, date_to=None, group=None,
+                          ticket=None, position=None):
+        lo = self._to_epoch(date_from) if date_from is not None else None
+        hi = self._to_epoch(date_to) if date_to is not None else None
+        out = []
+        for deal in self._deals:
+            if ticket is not None and deal.order != ticket and deal.ticket != ticket:
+                continue
+            if position is not None and deal.position_id != position:
+                continue
+            if lo is not None and deal.time < lo:
+                continue
+            if hi is not None and deal.time > hi:
+                continue
+            out.append(deal)
+        return tuple(out)
+
+    # ------------------------------------------------------------------
+    # Esecuzione simulata
+    # ------------------------------------------------------------------
+    def _clock(self):
+        return self.now if self.now is not None else int(_time.time())
+
+    def _new_ticket(self):
+        ticket = self._next_ticket
+        self._next_ticket += 1
+        return ticket
+
+    def _result(self, retcode, request, comment, deal=0, order=0, volume=0.0,
+                price=0.0, tick=None):
+        return OrderSendResult(
+            retcode=retcode, deal=deal, order=order, volume=volume, price=price,
+            bid=tick.bid if tick else 0.0, ask=tick.ask if tick else 0.0,
+            comment=comment, request_id=self._next_ticket, request=request,
+        )
+
+    def _record_deal(self, pos, order, deal_type, entry, volume, price, profit, comment):
+        deal = TradeDeal(
+            ticket=self._new_ticket(), order=order, time=self._clock(),
+            type=deal_type, entry=entry, magic=pos["magic"],
+            position_id=pos["ticket"], volume=volume, price=price,
+            commission=0.0, swap=0.0, profit=round(profit, 2),
+            symbol=pos["symbol"], comment=comment,
+        )
+        self._deals.append(deal)
+        return deal
+
+    def _close(self, pos, volume, price, comment):
+        sign = 1 if pos["type"] == POSITION_TYPE_BUY else -1
+        profit = (price - pos["price_open"]) * sign * volume * self.contract_size
+        close_type = ORDER_TYPE_SELL if pos["type"] == POSITION_TYPE_BUY else ORDER_TYPE_BUY
+        order = self._new_ticket()
+        deal = self._record_deal(pos, order, close_type, DEAL_ENTRY_OUT,
+                                 volume, price, profit, comment)
+        self.balance += profit
+        pos["volume"] = round(pos["volume"] - volume, 2)
+        if pos["volume"] <= 0:
+            del self._positions[pos["ticket"]]
+        return deal, order
+
+    def order_send(self, request):
+        with self._lock:
+            return self._order_send(request)
+
+    def _order_send(self, request):
+        action = request.get("action")
+        symbol = request.get("symbol")
+        tick = self.symbol_info_tick(symbol) if symbol else None
+
+        if action == TRADE_ACTION_SLTP:
+            pos = self._positions.get(request.get("position"))
+            if pos is None:
+                return self._result(TRADE_RETCODE_POSITION_CLOSED, request, "Position doesn't exist")
+            pos["sl"] = float(request.get("sl") or 0.0)
+            pos["tp"] = float(request.get("tp") or 0.0)
+            return self._result(TRADE_RETCODE_DONE, request, "Request executed",
+                                order=pos["ticket"], tick=tick)
+
+        if action != TRADE_ACTION_DEAL:
+            return self._result(TRADE_RETCODE_INVALID, request, "Unsupported action")
+        if not tick:
+            return self._result(TRADE_RETCODE_MARKET_CLOSED, request, "Market closed")
+
+        volume = round(float(request.get("volume") or 0.0), 2)
+        if volume <= 0:
+            return self._result(TRADE_RETCODE_INVALID_VOLUME, request, "Invalid volume")
+
+        order_type = request.get("type")
+        point = 10 ** -_digits_for_price(tick.bid)
+        slip = self.slippage_points * point
+        if order_type == ORDER_TYPE_BUY:
+            price = tick.ask + slip
+        else:
+            price = tick.bid - slip
+
+        requested = request.get("price")
+        deviation = request.get("deviation")
+        if requested and deviation is not None and abs(price - requested) > deviation * point:
+            return self._result(TRADE_RETCODE_REQUOTE, request, "Requote", tick=tick)
+
+        # Chiusura (totale o parziale) di una posizione esistente
+        if request.get("position"):
+            pos = self._positions.get(request["position"])
+            if pos is None:
+                return self._result(TRADE_RETCODE_POSITION_CLOSED, request, "Position doesn't exist")
+            volume = min(volume, pos["volume"])
+            deal, order = self._close(pos, volume, price, request.get("comment", ""))
+            return self._result(TRADE_RETCODE_DONE, request, "Request executed",
+                                deal=deal.ticket, order=order, volume=volume,
+                                price=price, tick=tick)
+
+        # Nuova posizione
+        margin = volume * self.contract_size * price / self.leverage
+        if margin > self.account_info().margin_free:
+            return self._result(TRADE_RETCODE_NO_MONEY, request, "No money", tick=tick)
+
+        ticket = self._new_ticket()
+        pos = {
+            "ticket": ticket, "time": self._clock(), "symbol": symbol,
+            "type": POSITION_TYPE_BUY if order_type == ORDER_TYPE_BUY else POSITION_TYPE_SELL,
+            "magic": request.get("magic", 0), "volume": volume, "price_open": price,
+            "sl": float(request.get("sl") or 0.0), "tp": float(request.get("tp") or 0.0),
+            "comment": request.get("comment", ""),
+        }
+        self._positions[ticket] = pos
+        deal = self._record_deal(pos, ticket, order_type, DEAL_ENTRY_IN, volume, price,
+                                 0.0, pos["comment"])
+        self._stops_checked_at[ticket] = self._clock()
+        return self._result(TRADE_RETCODE_DONE, request, "Request executed",
+                            deal=deal.ticket, order=ticket, volume=volume,
+                            price=price, tick=tick)
+
+    def _check_stops(self):
+        """Closes positions whose SL/TP was touched by bars closed since the last check."""
+        for pos in list(self._positions.values()):
+            tf = self._base_timeframe(pos["symbol"])
+            rates = self._closed(pos["symbol"], tf)
+            if rates is None or len(rates) == 0:
+                continue
+            since = self._stops_checked_at.get(pos["ticket"], pos["time"])
+            bars = rates[np.searchsorted(rates["time"], since, side="left"):]
+            self._stops_checked_at[pos["ticket"]] = int(rates["time"][-1]) + 1
+            if len(bars) == 0:
+                continue
+
+            is_buy = pos["type"] == POSITION_TYPE_BUY
+            sl, tp = pos["sl"], pos["tp"]
+            if is_buy:
+                sl_hit = (bars["low"] <= sl) if sl > 0 else np.zeros(len(bars), bool)
+                tp_hit = (bars["high"] >= tp) if tp > 0 else np.zeros(len(bars), bool)
+            else:
+                sl_hit = (bars["high"] >= sl) if sl > 0 else np.zeros(len(bars), bool)
+                tp_hit = (bars["low"] <= tp) if tp > 0 else np.zeros(len(bars), bool)
+            hit = np.flatnonzero(sl_hit | tp_hit)
+            if len(hit) == 0:
+                continue
+            # Se nella stessa barra toccano entrambi, assumiamo lo SL (pessimista)
+            first = hit[0]
+            price, reason = (sl, "sl") if sl_hit[first] else (tp, "tp")
+            self._close(pos, pos["volume"], price, f"[{reason} {price:.5f}]")
+
+    def __repr__(self):
+        when = datetime.fromtimestamp(self.now) if self.now is not None else "end"
+        return f"<FakeMT5Reader {self.data_dir} @ {when}>"
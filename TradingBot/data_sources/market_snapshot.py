@@ -0,0 +1,80 @@
+# data_sources/market_snapshot.py
+
+"""
+Broker state for one position-management pass.
+
+MarketSnapshot.take() makes a single positions_get() call. Ticks are fetched
+on first use, once per distinct symbol, and closed-position deals come from
+one history_deals_get() over a time range instead of one query per ticket.
+Broker round-trips therefore grow with the number of symbols, not with
+positions × actions.
+
+The snapshot is only valid for the cycle that took it: orders sent during
+the pass do not update it.
+"""
+
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from data_sources.broker import mt5
+
+DEALS_MARGIN_SECONDS = 86400   # fusi orari del server MT5 / orologio del replay
+
+
+class MarketSnapshot:
+    def __init__(self, positions):
+        self.positions = {p.ticket: p for p in positions or ()}
+        self.taken_at = time.time()
+        self._ticks = {}
+
+    @classmethod
+    def take(cls):
+        return cls(mt5.positions_get())
+
+    # ------------------------------------------------------------------
+    def tick(self, symbol):
+        """Last tick of `symbol` (None if unavailable), fetched once per snapshot."""
+        if symbol not in self._ticks:
+            self._ticks[symbol] = mt5.symbol_info_tick(symbol)
+        return self._ticks[symbol]
+
+    def ticks(self, symbols):
+        return {s: self.tick(s) for s in set(symbols)}
+
+    def price(self, symbol, direction):
+        """Price a position closes at: bid for longs, ask for shorts."""
+        tick = self.tick(symbol)
+        if not tick:
+            return None
+        return tick.bid if direction == "long" else tick.ask
+
+    # ------------------------------------------------------------------
+    def closed_deals(self, trades):
+        """
+        {ticket: [deals]} for the closed `trades` (dicts with "ticket" and
+        optionally "opened_at" in broker time or "time"), from one range query.
+        Tickets missing from the range are looked up one by one.
+        """
+        if not trades:
+            return {}
+        starts = []
+        for trade in trades:
+            opened = trade.get("opened_at")
+            if opened is None and isinstance(trade.get("time"), datetime):
+                opened = trade["time"].timestamp()
+            if opened is not None:
+                starts.append(opened)
+        date_from = datetime.fromtimestamp(max(0, min(starts, default=self.taken_at) - DEALS_MARGIN_SECONDS))
+        date_to = datetime.fromtimestamp(self.taken_at + DEALS_MARGIN_SECONDS)
+
+        wanted = {t["ticket"] for t in trades}
+        by_position = defaultdict(list)
+        for deal in mt5.history_deals_get(date_from, date_to) or ():
+            if deal.position_id in wanted:
+                by_position[deal.position_id].append(deal)
+        for ticket in wanted - set(by_position):
+            deals = mt5.history_deals_get(position=ticket)
+            if deals:
+                by_position[ticket] = list(deals)
+        return dict(by_position)
@@ -1,6 +1,6 @@
 # data_sources/mt5_data.py
 
-import MetaTrader5 as mt5
+from data_sources.broker import mt5
 import pandas as pd
 import settings
 from .fake_mt5_reader import FakeMT5Reader
@@ -0,0 +1,220 @@
+# execution/order_gateway.py
+
+"""
+Single way out for order_send requests.
+
+Requests go through a submission queue with one lane per key (the position
+ticket for SL/TP changes and closes, the symbol for new trades). Within a
+lane requests run in order; different lanes run concurrently on a small
+thread pool, so SL/TP updates for different tickets do not wait for each
+other and the strategy loop does not wait for any of them (submit() returns
+a Future; send() is the blocking form). At most settings.ORDER_MAX_IN_FLIGHT
+requests are queued or running: past that, submit() waits.
+
+Every request gets a client order id in its comment
+("<comment>#<magic>.<seq>", within the 31 characters MT5 keeps). On
+requote / price changed the request is re-priced from a fresh tick and
+retried with exponential backoff. When the outcome is unknown (order_send
+returned None or raised), the id is looked up in the recent deals before
+sending again, so a fill is never duplicated.
+
+Works with any backend behind data_sources.broker (MT5 or the replay
+broker). Queue wait, end-to-end latency (retries included) and fill
+slippage are recorded in utils.latency_metrics.
+"""
+
+import itertools
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+
+import settings
+from data_sources.broker import ORDER_ACTIONS, mt5
+from utils.latency_metrics import get_metrics
+from utils.logger import get_logger
+
+log = get_logger("OrderGateway")
+
+MAX_COMMENT = 31
+RETRY_RETCODES = {10004, 10020, 10021}   # REQUOTE, PRICE_CHANGED, PRICE_OFF
+TRADE_RETCODE_DONE = 10009
+RECOVERY_WINDOW_SECONDS = 86400          # deals cercati per id in caso di esito sconosciuto
+
+# stessi campi di OrderSendResult, per gli ordini ritrovati nei deals
+OrderResult = namedtuple(
+    "OrderResult", "retcode deal order volume price bid ask comment request_id request"
+)
+
+
+def client_order_id(request, seq):
+    """`request` comment tagged with a unique id, cut to what MT5 keeps."""
+    suffix = f"#{request.get('magic', 0)}.{seq}"
+    return request.get("comment", "")[:MAX_COMMENT - len(suffix)] + suffix
+
+
+def order_key(request):
+    """Lane of a request: its position ticket if any, otherwise the symbol."""
+    return request.get("position") or request.get("symbol")
+
+
+def succeeded(result):
+    return result is not None and result.retcode == TRADE_RETCODE_DONE
+
+
+class OrderGateway:
+    def __init__(self, workers=None, max_in_flight=None, max_retries=None, backoff=None):
+        self.max_retries = settings.ORDER_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff = settings.ORDER_RETRY_BACKOFF_SECONDS if backoff is None else backoff
+        self._pool = ThreadPoolExecutor(max_workers=workers or settings.ORDER_GATEWAY_WORKERS,
+                                        thread_name_prefix="order-gateway")
+        self._slots = threading.BoundedSemaphore(max_in_flight or settings.ORDER_MAX_IN_FLIGHT)
+        self._lanes = {}
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._points = {}   # simbolo -> point, per lo slippage in punti
+        self.metrics = get_metrics()
+        # decimi di secondo dall'epoch: id crescenti anche tra un riavvio e l'altro
+        self._seq = itertools.count(int(time.time() * 10) % 10 ** 8)
+
+    # ------------------------------------------------------------------
+    def submit(self, request, key=None):
+        """
+        Queues `request`; the Future resolves to the final order_send result
+        (None if unknown). After stop() the Future fails with RuntimeError.
+        """
+        future = Future()
+        request = dict(request, comment=client_order_id(request, next(self._seq)))
+        key = key if key is not None else order_key(request)
+        self._slots.acquire()
+        with self._lock:
+            if self._stopped:
+                self._slots.release()
+                future.set_exception(RuntimeError("order gateway stopped"))
+                return future
+            lane = self._lanes.get(key)
+            if lane is not None:
+                lane.append((request, future, time.perf_counter()))
+                return future
+            self._lanes[key] = deque([(request, future, time.perf_counter())])
+            try:
+                self._pool.submit(self._drain, key)
+            except RuntimeError as e:   # pool già chiuso: niente lane orfana né slot perso
+                del self._lanes[key]
+                self._slots.release()
+                future.set_exception(e)
+        return future
+
+    def send(self, request, key=None, timeout=None):
+        return self.submit(request, key).result(timeout)
+
+    def pending(self):
+        with self._lock:
+            return sum(len(lane) for lane in self._lanes.values())
+
+    def stop(self, wait=True):
+        """Refuses new requests; with `wait`, those already queued are sent first."""
+        with self._lock:
+            self._stopped = True
+        self._pool.shutdown(wait=wait)
+
+    def _drain(self, key):
+        lane = self._lanes[key]
+        while True:
+            request, future, queued_at = lane[0]
+            symbol = request.get("symbol")
+            kind = ORDER_ACTIONS.get(request.get("action"), request.get("action"))
+            started = time.perf_counter()
+            self.metrics.record("gateway.queue", started - queued_at, symbol)
+            try:
+                requested = request.get("price")
+                result = self._send(request)
+                self._record_slippage(request, requested, result)
+                future.set_result(result)
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                self.metrics.record(f"gateway.{kind}", time.perf_counter() - started, symbol)
+                self._slots.release()
+            with self._lock:
+                lane.popleft()
+                if not lane:
+                    del self._lanes[key]
+                    return
+
+    # ------------------------------------------------------------------
+    def _send(self, request):
+        sent_at = time.time()
+        result = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                result = mt5.order_send(request)
+            except Exception as e:
+                log.warning(f"order_send error ({request['comment']}): {e}")
+                result = None
+            if result is None:
+                # esito sconosciuto: se l'ordine è stato eseguito non va reinviato
+                result = self._recover(request, sent_at)
+                if result is not None:
+                    return result
+                continue
+            if result.retcode not in RETRY_RETCODES:
+                return result
+            log.info(f"retcode {result.retcode} ({result.comment}) per {request['comment']}, "
+                     f"tentativo {attempt + 1}/{self.max_retries + 1}")
+            self._reprice(request)
+        return result
+
+    def _record_slippage(self, request, requested, result):
+        if request.get("action") != mt5.TRADE_ACTION_DEAL or not requested or not succeeded(result) \
+                or not result.price:
+            return
+        symbol = request["symbol"]
+        if symbol not in self._points:
+            info = mt5.symbol_info(symbol)
+            self._points[symbol] = info.point if info else None
+        if not self._points[symbol]:
+            return
+        worse = result.price - requested if request.get("type") == mt5.ORDER_TYPE_BUY else requested - result.price
+        self.metrics.record_slippage(symbol, worse / self._points[symbol])
+
+    @staticmethod
+    def _reprice(request):
+        if request.get("action") != mt5.TRADE_ACTION_DEAL or not request.get("price"):
+            return
+        tick = mt5.symbol_info_tick(request["symbol"])
+        if tick:
+            request["price"] = tick.ask if request.get("type") == mt5.ORDER_TYPE_BUY else tick.bid
+
+    @staticmethod
+    def _recover(request, sent_at):
+        """Result rebuilt from the deal carrying the request's client id, if it was filled."""
+        if request.get("action") != mt5.TRADE_ACTION_DEAL:
+            return None   # le modifiche SL/TP si possono ripetere senza effetti
+        try:
+            deals = mt5.history_deals_get(datetime.fromtimestamp(sent_at - RECOVERY_WINDOW_SECONDS),
+                                          datetime.fromtimestamp(time.time() + RECOVERY_WINDOW_SECONDS))
+        except Exception:
+            return None
+        for deal in deals or ():
+            if deal.comment == request["comment"]:
+                return OrderResult(TRADE_RETCODE_DONE, deal.ticket, deal.order, deal.volume, deal.price,
+                                   0.0, 0.0, "Recovered from history", 0, request)
+        return None
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_order_gateway():
+    """Process-wide OrderGateway, created on first use."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = OrderGateway()
+    return _gateway
@@ -0,0 +1,168 @@
+# execution/position_rules.py
+
+"""
+Pure SL/TP, sizing and open-position rules.
+
+Shared by the live bot (TradeManager, ForexTradingBot.manage_open_positions)
+and by the backtester, so both take exactly the same decisions. Nothing
+here talks to the broker: callers pass prices in and send orders themselves.
+manage_positions is the array form of manage_position, used by the live bot
+to evaluate every open position in one pass.
+"""
+
+import numpy as np
+
+import settings
+
+# default per fase assente dalle tabelle *_CONFIG (come manage_position)
+TRAILING_DEFAULT = {"base_stop_factor": 2.0, "confidence_boost": 0.0}
+BREAK_EVEN_DEFAULT = {"be_factor": 1.5, "confidence_boost": 0.5}
+PARTIAL_TP_DEFAULT = {"tp_factor": 2.0, "confidence_boost": 0.0, "partial_close_ratio": 0.5}
+
+
+def initial_sl_tp(direction, entry_price, atr, confidence):
+    """SL at 2×ATR, TP at SL distance × R:R (scaled by confidence if DYNAMIC_RR_ENABLED)."""
+    sl_distance = atr * 2
+
+    rr_ratio = settings.DEFAULT_RR_RATIO
+    if settings.DYNAMIC_RR_ENABLED:
+        rr_ratio *= confidence
+        rr_ratio = min(3.0, max(1.0, rr_ratio))  # bounds di sicurezza
+
+    tp_distance = sl_distance * rr_ratio
+    if direction == 'long':
+        return entry_price - sl_distance, entry_price + tp_distance, rr_ratio
+    return entry_price + sl_distance, entry_price - tp_distance, rr_ratio
+
+
+def position_size(balance, point, volume_min, volume_max, entry_price, sl_price,
+                  risk_percent, confidence, multiplier):
+    if entry_price == sl_price:
+        return volume_min
+
+    risk_amount = balance * risk_percent
+    pip_value = point * 10
+    risk_pips = abs(entry_price - sl_price) / point
+    lot_size = risk_amount / (risk_pips * pip_value)
+    lot_size *= confidence * multiplier
+    # assicurarsi nei limiti
+    return max(volume_min, min(volume_max, round(lot_size, 2)))
+
+
+def manage_position(direction, phase, confidence, atr, entry_price, current_price,
+                    current_sl, lot_size, partial_done=False, trailing=True,
+                    partial_tp=True, break_even=True, cfg=None):
+    """
+    Trailing stop, partial TP and break-even for one open position.
+    Returns (new_sl, partial_lots): new_sl is None when the stop should not
+    move; when trailing and break-even both fire, the tighter stop wins.
+    `cfg` supplies the *_CONFIG tables (the bot passes its runtime-config
+    snapshot); defaults to the settings module.
+    """
+    cfg = cfg or settings
+    is_long = direction == 'long'
+    gain = (current_price - entry_price) if is_long else (entry_price - current_price)
+    candidates = []
+
+    # Trailing stops
+    if trailing:
+        tc = cfg.TRAILING_CONFIG.get(phase, TRAILING_DEFAULT)
+        ts_factor = tc['base_stop_factor']
+        if confidence > 0.7:
+            ts_factor += tc['confidence_boost']
+        if is_long:
+            desired_sl = current_price - (atr * ts_factor)
+            if desired_sl > current_sl:
+                candidates.append(desired_sl)
+        else:
+            desired_sl = current_price + (atr * ts_factor)
+            if desired_sl < current_sl or current_sl <= 0:
+                candidates.append(desired_sl)
+
+    # Break-even stops
+    if break_even:
+        bec = cfg.BREAK_EVEN_CONFIG.get(phase, BREAK_EVEN_DEFAULT)
+        be_factor = bec['be_factor']
+        if confidence > 0.7:
+            be_factor += bec['confidence_boost']
+        if gain >= (atr * be_factor):
+            if is_long and current_sl < entry_price:
+                candidates.append(entry_price)
+            elif not is_long and (current_sl == 0 or current_sl > entry_price):
+                candidates.append(entry_price)
+
+    new_sl = None
+    if candidates:
+        new_sl = max(candidates) if is_long else min(candidates)
+
+    # Partial TPs
+    partial_lots = 0.0
+    if partial_tp and not partial_done:
+        ptc = cfg.PARTIAL_TP_CONFIG.get(phase, PARTIAL_TP_DEFAULT)
+        tp_factor = ptc['tp_factor']
+        if confidence > 0.7:
+            tp_factor += ptc['confidence_boost']
+        if gain >= (atr * tp_factor):
+            lots = lot_size * ptc['partial_close_ratio']
+            if lots >= 0.01:
+                partial_lots = lots
+
+    return new_sl, partial_lots
+
+
+def _phase_column(table, phases, default, key):
+    return np.array([table.get(phase, default)[key] for phase in phases], dtype=float)
+
+
+def manage_positions(direction, phase, confidence, atr, entry_price, current_price,
+                     current_sl, lot_size, partial_done=None, trailing=True,
+                     partial_tp=True, break_even=True, cfg=None):
+    """
+    manage_position over N positions at once (sequences of equal length).
+    Returns (new_sl, partial_lots) arrays: new_sl is NaN where the stop
+    should not move, partial_lots is 0 where no partial TP fires. Same
+    decisions as calling manage_position row by row.
+    """
+    cfg = cfg or settings
+    is_long = np.asarray(direction) == 'long'
+    confidence = np.asarray(confidence, dtype=float)
+    atr = np.asarray(atr, dtype=float)
+    entry = np.asarray(entry_price, dtype=float)
+    price = np.asarray(current_price, dtype=float)
+    sl = np.asarray(current_sl, dtype=float)
+    lots = np.asarray(lot_size, dtype=float)
+    done = np.zeros(len(is_long), dtype=bool) if partial_done is None else np.asarray(partial_done, dtype=bool)
+    boosted = confidence > 0.7
+
+    gain = np.where(is_long, price - entry, entry - price)
+    trail_sl = np.full(len(is_long), np.nan)
+    be_sl = np.full(len(is_long), np.nan)
+
+    # Trailing stops
+    if trailing:
+        factor = (_phase_column(cfg.TRAILING_CONFIG, phase, TRAILING_DEFAULT, 'base_stop_factor')
+                  + np.where(boosted, _phase_column(cfg.TRAILING_CONFIG, phase, TRAILING_DEFAULT, 'confidence_boost'), 0.0))
+        desired = np.where(is_long, price - atr * factor, price + atr * factor)
+        better = np.where(is_long, desired > sl, (desired < sl) | (sl <= 0))
+        trail_sl = np.where(better, desired, np.nan)
+
+    # Break-even stops
+    if break_even:
+        factor = (_phase_column(cfg.BREAK_EVEN_CONFIG, phase, BREAK_EVEN_DEFAULT, 'be_factor')
+                  + np.where(boosted, _phase_column(cfg.BREAK_EVEN_CONFIG, phase, BREAK_EVEN_DEFAULT, 'confidence_boost'), 0.0))
+        below_entry = np.where(is_long, sl < entry, (sl == 0) | (sl > entry))
+        be_sl = np.where((gain >= atr * factor) & below_entry, entry, np.nan)
+
+    # lo stop più stretto vince; fmax/fmin ignorano i NaN
+    new_sl = np.where(is_long, np.fmax(trail_sl, be_sl), np.fmin(trail_sl, be_sl))
+
+    # Partial TPs
+    partial_lots = np.zeros(len(is_long))
+    if partial_tp:
+        factor = (_phase_column(cfg.PARTIAL_TP_CONFIG, phase, PARTIAL_TP_DEFAULT, 'tp_factor')
+                  + np.where(boosted, _phase_column(cfg.PARTIAL_TP_CONFIG, phase, PARTIAL_TP_DEFAULT, 'confidence_boost'), 0.0))
+        close = lots * _phase_column(cfg.PARTIAL_TP_CONFIG, phase, PARTIAL_TP_DEFAULT, 'partial_close_ratio')
+        fire = ~done & (gain >= atr * factor) & (close >= 0.01)
+        partial_lots = np.where(fire, close, 0.0)
+
+    return new_sl, partial_lots
@@ -1,13 +1,20 @@
 # execution/trade_manager.py
-import MetaTrader5 as mt5
+from data_sources.broker import mt5
 import settings
 from datetime import datetime
-import pandas as pd
-import pandas_ta as ta
+from data_sources.bar_cache import bar_cache
+from execution.position_rules import initial_sl_tp, position_size
+from execution.order_gateway import get_order_gateway, succeeded
+from utils.vector_indicators import atr as atr_series
+from utils.logger import get_logger
+
+log = get_logger("TradeManager")
 
 class TradeManager:
-    def __init__(self, manual_position_multiplier=settings.MANUAL_POSITION_MULTIPLIER):
+    def __init__(self, manual_position_multiplier=settings.MANUAL_POSITION_MULTIPLIER, gateway=None):
         self.manual_position_multiplier = manual_position_multiplier
+        # tutti gli order_send passano dal gateway (coda, retry su requote)
+        self.gateway = gateway or get_order_gateway()
         if not mt5.initialize():
             raise ConnectionError(f"MT5 init failed: {mt5.last_error()}")
 
@@ -29,16 +36,14 @@ class TradeManager:
         current_sl = position.sl
 
         # Fetch recent candles for ATR calculation
-        rates = mt5.copy_rates_from_pos(symbol, settings.DEFAULT_TIMEFRAME, 0, 20)
+        rates = bar_cache.get(symbol, settings.DEFAULT_TIMEFRAME, 20)
         if rates is None or len(rates) < 14:
             return
 
-        df = pd.DataFrame(rates)
-        df['atr'] = ta.atr(df['high'], df['low'], df['close'], length=14)
-        atr = df['atr'].iloc[-1]
+        atr = atr_series(rates['high'], rates['low'], rates['close'], length=14)[-1]
 
         # Calculate ideal SL
-        sl_buffer = settings.ATR_MULTIPLIER * settings.SL_MULTIPLIER
+        sl_buffer = atr * settings.SL_MULTIPLIER  # ATR × multiplier = SL
         new_sl = current_price - sl_buffer if is_buy else current_price + sl_buffer
 
         # Only update SL if it's more favorable
@@ -58,49 +63,31 @@ class TradeManager:
                 "type_time": mt5.ORDER_TIME_GTC,
                 "type_filling": mt5.ORDER_FILLING_IOC,
             }
-            mt5.order_send(request)
+            # non bloccante: il ciclo prosegue mentre il broker risponde
+            self.gateway.submit(request)
 
     def set_manual_multiplier(self, new_multiplier):
         self.manual_position_multiplier = new_multiplier
-        print(f"Multiplier updated: {new_multiplier}")
+        log.info(f"Multiplier updated: {new_multiplier}")
 
     def calculate_position_size(self, balance, symbol, entry_price, sl_price, risk_percent, confidence):
         symbol_info = mt5.symbol_info(symbol)
         if not symbol_info or entry_price == sl_price:
             return symbol_info.volume_min if symbol_info else 0.01
 
-        risk_amount = balance * risk_percent
-        pip_value = symbol_info.point * 10
-        risk_pips = abs(entry_price - sl_price) / symbol_info.point
-        lot_size = risk_amount / (risk_pips * pip_value)
-        lot_size *= confidence * self.manual_position_multiplier
-        # assicurarsi nei limiti
-        return max(symbol_info.volume_min, min(symbol_info.volume_max, round(lot_size, 2)))
+        return position_size(
+            balance, symbol_info.point, symbol_info.volume_min, symbol_info.volume_max,
+            entry_price, sl_price, risk_percent, confidence, self.manual_position_multiplier
+        )
 
     def execute_trade(self, symbol, direction, entry_price, atr, lot_size, confidence):
         symbol_info_tick = mt5.symbol_info_tick(symbol)
         if not symbol_info_tick:
-            print(f"Trade failed: No tick data for {symbol}")
+            log.warning(f"Trade failed: No tick data for {symbol}")
             return None
 
-        # SL base calcolato su ATR
-        sl_distance = atr * 2
-        if direction == 'long':
-            sl = entry_price - sl_distance
-        else:
-            sl = entry_price + sl_distance
-
-        # R:R dinamico
-        rr_ratio = settings.DEFAULT_RR_RATIO
-        if settings.DYNAMIC_RR_ENABLED:
-            rr_ratio *= confidence
-            rr_ratio = min(3.0, max(1.0, rr_ratio))  # bounds di sicurezza
-
-        tp_distance = sl_distance * rr_ratio
-        if direction == 'long':
-            tp = entry_price + tp_distance
-        else:
-            tp = entry_price - tp_distance
+        # SL su ATR, TP con R:R dinamico
+        sl, tp, rr_ratio = initial_sl_tp(direction, entry_price, atr, confidence)
 
         order_type = mt5.ORDER_TYPE_BUY if direction == 'long' else mt5.ORDER_TYPE_SELL
 
@@ -119,14 +106,15 @@ class TradeManager:
             "type_filling": mt5.ORDER_FILLING_IOC,
         }
 
-        result = mt5.order_send(request)
-        if result.retcode != mt5.TRADE_RETCODE_DONE:
-            print(f"[TradeManager] Trade failed for {symbol}")
-            print(f"  ↳ retcode: {result.retcode}")
-            print(f"  ↳ comment: {result.comment}")
-            print(f"  ↳ request_id: {result.request_id}")
-            print(f"  ↳ order: {result.order}")
-            print(f"  ↳ volume: {lot_size} | direction: {direction}")
+        result = self.gateway.send(request)
+        if not succeeded(result):
+            if result is None:
+                log.warning(f"Trade failed for {symbol}: no reply from broker")
+                return None
+            log.warning(f"Trade failed for {symbol}: retcode {result.retcode} ({result.comment})",
+                        extra={"fields": {"symbol": symbol, "retcode": result.retcode, "comment": result.comment,
+                                          "request_id": result.request_id, "order": result.order,
+                                          "volume": lot_size, "direction": direction}})
             return None
 
         return {
@@ -149,7 +137,7 @@ class TradeManager:
         # filtrare per ticket
         pos_list = [p for p in positions if p.ticket == ticket] if positions else []
         if not pos_list:
-            print(f"Position not found: {ticket}")
+            log.warning(f"Position not found: {ticket}")
             return False
 
         pos = pos_list[0]
@@ -172,8 +160,7 @@ class TradeManager:
             "type_time": mt5.ORDER_TIME_GTC,
             "type_filling": mt5.ORDER_FILLING_IOC,
         }
-        result = mt5.order_send(request)
-        return result.retcode == mt5.TRADE_RETCODE_DONE
+        return succeeded(self.gateway.send(request))
 
     # Funzione aggiuntiva per chiusura sicura exportata
     @staticmethod
@@ -183,19 +170,21 @@ class TradeManager:
         restituisce True se tutte le chiusure sono andate a buon fine.
         """
         if not mt5.initialize():
-            print(f"[TradeManager] MT5 init failed in close_position_safely: {mt5.last_error()}")
+            log.warning(f"MT5 init failed in close_position_safely: {mt5.last_error()}")
             return False
 
         positions = mt5.positions_get(symbol=symbol)
         if not positions:
             return False
 
-        results = []
+        tick = mt5.symbol_info_tick(symbol)
+        if not tick:
+            return False
+
+        # chiusure inviate insieme (una coda per ticket), poi si attendono tutte
+        gateway = get_order_gateway()
+        futures = []
         for pos in positions:
-            tick = mt5.symbol_info_tick(symbol)
-            if not tick:
-                results.append(False)
-                continue
             price = tick.bid if pos.type == mt5.POSITION_TYPE_BUY else tick.ask
             opp_type = mt5.ORDER_TYPE_SELL if pos.type == mt5.POSITION_TYPE_BUY else mt5.ORDER_TYPE_BUY
             request = {
@@ -211,17 +200,16 @@ class TradeManager:
                 "type_time": mt5.ORDER_TIME_GTC,
                 "type_filling": mt5.ORDER_FILLING_IOC,
             }
-            res = mt5.order_send(request)
-            results.append(res.retcode == mt5.TRADE_RETCODE_DONE)
+            futures.append(gateway.submit(request))
 
-        return all(results)
+        return all(succeeded(f.result()) for f in futures)
     
     def revalidate_stop_targets(self, open_positions):
         """
         Dopo il riavvio, riallinea SL/TP o monitor interni per le posizioni aperte.
         """
         if not open_positions:
-            print("[TradeManager] Nessuna posizione aperta da riconciliare.")
+            log.info("Nessuna posizione aperta da riconciliare.")
             return
 
         for pos in open_positions:
@@ -233,8 +221,7 @@ class TradeManager:
             volume = pos.volume
             direction = "BUY" if pos.type == mt5.POSITION_TYPE_BUY else "SELL"
 
-            print(f"[TM] ➕ Validazione SL/TP → {symbol} (#{ticket}) {direction} {volume} @ {entry}")
-            print(f"     SL attuale: {sl} | TP attuale: {tp}")
+            log.info(f"➕ Validazione SL/TP → {symbol} (#{ticket}) {direction} {volume} @ {entry} | SL {sl} | TP {tp}")
 
             # (Opzionale) Riattiva sistemi dinamici se servono:
             # es. trailing, break-even, TP multipli
@@ -1,9 +1,13 @@
 # logic/fusion_engine.py
 
-import pandas as pd
-import MetaTrader5 as mt5
-from datetime import datetime
+import numpy as np
+from data_sources.broker import mt5
+from data_sources.bar_cache import bar_cache
 import settings
+from utils.vector_indicators import true_range
+from utils.logger import get_logger
+
+log = get_logger("Fusion")
 
 def get_market_phase(symbol: str,
                      timeframe_label: str = None,
@@ -24,36 +28,29 @@ def get_market_phase(symbol: str,
         raise ValueError(f"Label TF non valida: {tf_label}")
     tf_code = tf_map[tf_label]
 
-    # 3) Scarica le ultime `bars` barre da MT5
+    # 3) Ultime `bars` barre dalla cache condivisa (niente shutdown: la
+    #    connessione è la stessa usata dal bot)
     if not mt5.initialize():
         raise RuntimeError("MT5 init failed")
-    rates = mt5.copy_rates_from(symbol, tf_code, datetime.now(), bars)
-    mt5.shutdown()
+    rates = bar_cache.get(symbol, tf_code, bars)
     if rates is None or len(rates) == 0:
         raise RuntimeError(f"Nessun dato MT5 per {symbol} @ {tf_label}")
 
-    df = pd.DataFrame(rates)
-    df['time'] = pd.to_datetime(df['time'], unit='s')
-    df.set_index('time', inplace=True)
-
-    close = df['close']
-    high  = df['high']
-    low   = df['low']
+    close = rates['close']
+    high  = rates['high']
+    low   = rates['low']
 
-    # 4) Calcola l'ATR a 14 barre
-    prev_close = close.shift(1)
-    tr1 = high - low
-    tr2 = (high - prev_close).abs()
-    tr3 = (low  - prev_close).abs()
-    tr  = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-    atr = tr.rolling(14).mean().iloc[-1]
+    # 4) Calcola l'ATR a 14 barre (media semplice del true range)
+    tr = true_range(high, low, close)
+    tr[0] = high[0] - low[0]
+    atr = tr[-14:].mean() if len(tr) >= 14 else np.nan
 
     # 5) Rapporto ATR / prezzo medio
     rel_atr = atr / close.mean()
 
     # 6) Calcola SMA50 e SMA200
-    sma50  = close.rolling(50).mean().iloc[-1]
-    sma200 = close.rolling(200).mean().iloc[-1]
+    sma50  = close[-50:].mean() if len(close) >= 50 else np.nan
+    sma200 = close[-200:].mean() if len(close) >= 200 else np.nan
     rel_sma_diff = (sma50 - sma200) / sma200
 
     # 7) Soglie lette da settings.py
@@ -118,7 +115,7 @@ def fuse_probabilities(classical_signals, lstm_pred=None, cnn_pred=None, sentime
             short_score += (1 - cnn_pred) * model_weights['CNN']
             used_indicators.append('CNN')
         except TypeError as e:
-            print(f"[Fusion Engine] CNN prediction type error: {e} (cnn_pred: {cnn_pred})")
+            log.warning(f"CNN prediction type error: {e} (cnn_pred: {cnn_pred})")
 
     # Sentiment
     if sentiment is not None:
@@ -139,4 +136,52 @@ def fuse_probabilities(classical_signals, lstm_pred=None, cnn_pred=None, sentime
     final_probability = long_score / total_score if total_score != 0 else 0.5
     confidence = abs(long_score - short_score) / total_score if total_score != 0 else 0
 
-    return direction, confidence, final_probability, used_indicators
\ No newline at end of file
+    return direction, confidence, final_probability, used_indicators
+
+
+def fuse_probabilities_array(classical_signals, lstm_pred=None, cnn_pred=None, sentiment=None, symbol_weights=None):
+    """
+    Vectorized fuse_probabilities over many bars: every signal/prediction is
+    an array (or scalar) with one value per bar, CNN pattern labels excluded.
+    Returns (direction, confidence, final_probability) arrays, with direction
+    coded 1=long, -1=short, 0=hold.
+    """
+    if symbol_weights is None:
+        symbol_weights = settings.DEFAULT_INDICATOR_WEIGHTS
+    model_weights = settings.MODEL_WEIGHTS
+
+    long_score = 0.0
+    short_score = 0.0
+
+    for ind, prob in classical_signals.items():
+        long_weight = symbol_weights.get(ind, {'long':1.0})['long']
+        short_weight = symbol_weights.get(ind, {'short':1.0})['short']
+        long_score = long_score + prob * long_weight
+        short_score = short_score + (1 - prob) * short_weight
+
+    if lstm_pred is not None:
+        long_score = long_score + lstm_pred * model_weights['LSTM']
+        short_score = short_score + (1 - lstm_pred) * model_weights['LSTM']
+
+    if cnn_pred is not None:
+        long_score = long_score + cnn_pred * model_weights['CNN']
+        short_score = short_score + (1 - cnn_pred) * model_weights['CNN']
+
+    if sentiment is not None:
+        sentiment = np.asarray(sentiment, dtype="float64")
+        sentiment_scaled = np.where(sentiment < 0, (sentiment + 1) / 2, sentiment)
+        long_score = long_score + sentiment_scaled * model_weights['SENTIMENT']
+        short_score = short_score + (1 - sentiment_scaled) * model_weights['SENTIMENT']
+
+    long_score = np.asarray(long_score, dtype="float64")
+    short_score = np.asarray(short_score, dtype="float64")
+
+    direction = np.sign(long_score - short_score)
+    direction = np.nan_to_num(direction, nan=0.0).astype("int8")
+
+    total_score = long_score + short_score
+    with np.errstate(divide="ignore", invalid="ignore"):
+        final_probability = np.where(total_score != 0, long_score / total_score, 0.5)
+        confidence = np.where(total_score != 0, np.abs(long_score - short_score) / total_score, 0.0)
+
+    return direction, confidence, final_probability
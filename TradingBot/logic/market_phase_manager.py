@@ -1,6 +1,10 @@
 # logic/market_phase_manager.py
+import numpy as np
 import settings
 
+# Ordine usato dalle versioni vettoriali (codici int8 per barra)
+PHASES = ("ranging", "trending_up", "trending_down", "volatile")
+
 class MarketPhaseManager:
     def __init__(self):
         self.symbol_phases = {}
@@ -36,6 +40,27 @@ class MarketPhaseManager:
         self.symbol_phases[symbol] = phase
         return phase
 
+    def detect_phases(self, close, short_ma, long_ma, atr):
+        """
+        Same rules as detect_phase_for_symbol, evaluated on every bar at once.
+        Returns an int8 array of indexes into PHASES (bar 0 is 'ranging').
+        """
+        close = np.asarray(close, dtype="float64")
+        price_change = np.abs(np.diff(close, prepend=close[:1]))
+        atr = np.asarray(atr, dtype="float64")
+
+        phases = np.select(
+            [
+                (close > long_ma) & (price_change > atr * self.trend_multiplier),
+                (close < short_ma) & (price_change > atr * self.trend_multiplier),
+                price_change < atr * self.ranging_multiplier,
+                price_change > atr * self.volatility_multiplier,
+            ],
+            [1, 2, 0, 3],
+            default=0,
+        ).astype("int8")
+        return phases
+
     def update_symbol_phase_performance(self, symbol, phase, pl_pct):
         if phase not in self.phase_performance:
             self.phase_performance[phase] = {"wins":0, "losses":0}
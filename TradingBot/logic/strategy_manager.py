@@ -1,12 +1,26 @@
 # strategy_manager.py
+import numpy as np
 import settings
 from logic.fusion_engine import fuse_probabilities
 from logic.meta_strategy_tuner import MetaStrategyTuner
 from logic.meta_indicator_learning import MetaIndicatorLearning
-from logic.market_phase_manager import MarketPhaseManager
+from logic.market_phase_manager import MarketPhaseManager, PHASES
 from utils.runtime_optimizer import load_active_symbols, refresh_active_symbols
-from execution.trade_manager import close_position_safely
-from mt5_wrapper import is_position_open
+from execution.trade_manager import TradeManager
+from mt5_wrapper import is_position_open, get_all_open_symbols
+from utils.messaging import send_message
+from utils.logger import get_logger
+
+log = get_logger("StrategyManager")
+
+close_position_safely = TradeManager.close_position_safely
+
+# Parametri per fase usati da calculate_signals / calculate_signals_array
+PHASE_PARAMS = {
+    'trending':     {'rsi': 60, 'macd_gap': 0.0, 'stoch': 20, 'cloud_clearance': 0.0},
+    'ranging':      {'rsi': 50, 'macd_gap': 0.2, 'stoch': 30, 'cloud_clearance': 0.01},
+    'volatile':     {'rsi': 40, 'macd_gap': 0.4, 'stoch': 40, 'cloud_clearance': 0.02},
+}
 
 class StrategyManager:
     def __init__(self, indicators=settings.DEFAULT_INDICATOR_WEIGHTS):
@@ -19,7 +33,7 @@ class StrategyManager:
 
     def evaluate_symbol(self, symbol, market_data):
         if symbol not in self.active_symbols:
-            print(f"[StrategyManager] ⏭️ Skipping {symbol} — not in top 20.")
+            log.warning(f"⏭️ Skipping {symbol} — not in top 20.")
             return None
 
         # Inserisci qui la logica vera di valutazione, es. fusione
@@ -30,7 +44,7 @@ class StrategyManager:
         all_symbols = get_all_open_symbols()  # Funzione che restituisce i simboli con posizioni aperte
         for symbol in all_symbols:
             if symbol not in self.active_symbols:
-                print(f"[Bot] {symbol} fuori dalla top 20. Chiusura posizione.")
+                log.info(f"{symbol} fuori dalla top 20. Chiusura posizione.")
                 close_position_safely(symbol)
                 send_message(f"Posizione chiusa su {symbol} (fuori dalla top 20).")
 
@@ -44,12 +58,7 @@ class StrategyManager:
         close = df['close'].iloc[-1]
 
         # Phase-based parameters
-        phase_params = {
-            'trending':     {'rsi': 60, 'macd_gap': 0.0, 'stoch': 20, 'cloud_clearance': 0.0},
-            'ranging':      {'rsi': 50, 'macd_gap': 0.2, 'stoch': 30, 'cloud_clearance': 0.01},
-            'volatile':     {'rsi': 40, 'macd_gap': 0.4, 'stoch': 40, 'cloud_clearance': 0.02},
-        }
-        p = phase_params.get(market_phase, phase_params['ranging'])
+        p = PHASE_PARAMS.get(market_phase, PHASE_PARAMS['ranging'])
 
         if 'RSI' in df.columns:
             rsi = df['RSI'].iloc[-1]
@@ -91,6 +100,49 @@ class StrategyManager:
 
         return signals
 
+    def calculate_signals_array(self, cols, phases):
+        """
+        Vectorized calculate_signals: `cols` maps indicator column names to
+        arrays, `phases` holds per-bar indexes into PHASES. Returns the same
+        signal keys, each as an array with one value per bar.
+        """
+        signals = {}
+        close = np.asarray(cols['close'], dtype="float64")
+
+        def param(name):
+            table = np.array([PHASE_PARAMS.get(ph, PHASE_PARAMS['ranging'])[name] for ph in PHASES])
+            return table[phases]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if 'RSI' in cols:
+                signals['RSI'] = (cols['RSI'] < param('rsi')).astype(float)
+
+            if 'MACD' in cols and 'MACD_signal' in cols:
+                signals['MACD'] = ((cols['MACD'] - cols['MACD_signal']) > param('macd_gap')).astype(float)
+
+            if 'MA_50' in cols and 'MA_200' in cols:
+                ma50, ma200 = cols['MA_50'], cols['MA_200']
+                crossover_gap = np.abs(ma50 - ma200) / close
+                signals['MA'] = ((ma50 > ma200) & (crossover_gap > 0.005)).astype(float)
+
+            if 'Stoch' in cols:
+                signals['Stochastic'] = (cols['Stoch'] < param('stoch')).astype(float)
+
+            if 'BBL' in cols and 'BBU' in cols:
+                band_width = cols['BBU'] - cols['BBL']
+                signals['BBands'] = np.where(band_width != 0, (close - cols['BBL']) / band_width, 0.5)
+
+            if 'OBV' in cols:
+                obv_slope = np.diff(cols['OBV'], prepend=np.nan)
+                signals['OBV'] = (obv_slope > 0).astype(float)
+
+            if 'SpanA' in cols and 'SpanB' in cols:
+                cloud = np.maximum(cols['SpanA'], cols['SpanB'])
+                clearance = (close - cloud) / close
+                signals['Ichimoku'] = (clearance > param('cloud_clearance')).astype(float)
+
+        return signals
+
     def evaluate_position(self, symbol, signals, df, market_phase, lstm_pred, cnn_pred, sentiment):
         weights = self.get_weights(symbol)
         direction, confidence, final_prob, used_inds = fuse_probabilities(signals, lstm_pred, cnn_pred, sentiment, weights)
@@ -5,15 +5,19 @@ import time
 import os
 import psutil
 from utils.runtime_optimizer import get_top_symbols, save_active_symbols
+import settings
 from settings import SYMBOLS
 
 # Calcola dinamicamente il limite di simboli basato su memoria disponibile
-def calculate_symbol_limit(estimate_per_symbol_mb=1024):
+def calculate_symbol_limit(estimate_per_symbol_mb=settings.SYMBOL_MEMORY_MB):
     proc = psutil.Process()
     total_mb = psutil.virtual_memory().total / (1024 * 1024)
     used_mb = proc.memory_info().rss / (1024 * 1024)
+    # I modelli stanno in una LRU di dimensione fissa (InferenceService):
+    # la loro RAM si riserva una volta sola, non per simbolo
+    models_mb = settings.INFERENCE_MAX_LOADED_MODELS * settings.INFERENCE_MODEL_MB
     # Teniamo libero il 20% della RAM e consideriamo un ulteriore margine del 20%
-    headroom_mb = total_mb * 0.8 - used_mb
+    headroom_mb = total_mb * 0.8 - used_mb - models_mb
     limit = max(1, int(headroom_mb / estimate_per_symbol_mb * 0.8))
     print(f"[MAIN] Calculated symbol limit: {limit}")
     return limit
@@ -0,0 +1,168 @@
+# models/inference_service.py
+
+"""
+In-process batched inference for the LSTM/CNN direction models.
+
+Each cycle the bot hands over one feature window per symbol. For every
+model kind the windows that resolve to the same model file are stacked and
+run through a single forward pass: symbols without a model of their own in
+the registry (models/model_registry.py) fall back to the architecture-wide
+shared model and share one batch. Models are loaded on first use, warmed up
+with a dummy batch through the runtime chosen by settings.INFERENCE_BACKEND
+(models/model_runtime.py), and kept in an LRU of at most
+settings.INFERENCE_MAX_LOADED_MODELS, so memory no longer grows with the
+number of active symbols.
+
+Cache entries are keyed by the versioned file path, so activating a new
+version in the registry switches the next cycle to it; `warm` lets the
+caller load a version before activating it.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import settings
+from models.model_registry import get_model_registry
+from models.model_runtime import load_for_backend
+from utils.logger import get_logger
+
+log = get_logger("Inference")
+
+MODEL_KINDS = ("lstm", "cnn")
+
+# Soglie di confidenza come in sanity_check.py: sotto soglia → HOLD
+CONFIDENCE_THRESHOLDS = {"lstm": 0.60, "cnn": 0.70}
+
+# Classi dei modelli: 0=hold, 1=up, 2=down
+CLASS_TO_DIRECTION = {0: 0, 1: 1, 2: -1}
+CNN_PATTERNS = {0: "no_pattern", 1: "double_bottom", 2: "head_and_shoulders"}
+
+
+def _fits(model, window):
+    """True if `window` matches the model input shape (batch dim excluded)."""
+    shape = getattr(model, "input_shape", None)
+    if not shape:
+        return True
+    expected = tuple(shape[1:])
+    return len(expected) == window.ndim and all(
+        e is None or e == w for e, w in zip(expected, window.shape)
+    )
+
+
+def _warm_up(model):
+    # la prima predict costruisce il grafo: la paghiamo al caricamento, non nel ciclo
+    shape = getattr(model, "input_shape", None)
+    if not shape:
+        return
+    dims = [settings.LOOKBACK if d is None else d for d in shape[1:]]
+    model.predict_on_batch(np.zeros((1, *dims), dtype="float32"))
+
+
+class InferenceService:
+    def __init__(self, max_loaded=None, loader=load_for_backend, registry=None):
+        self.max_loaded = max_loaded or settings.INFERENCE_MAX_LOADED_MODELS
+        self.loader = loader
+        self.registry = registry or get_model_registry()
+        self._models = OrderedDict()   # path -> modello, dal meno al più recente
+        self._lock = threading.RLock()
+        self.stats = {"loads": 0, "evictions": 0, "forward_passes": 0}
+
+    # ------------------------------------------------------------------
+    # Modelli
+    # ------------------------------------------------------------------
+    def model_path(self, kind, symbol):
+        return self.registry.resolve(symbol, kind)
+
+    def get_model(self, path):
+        with self._lock:
+            model = self._models.get(path)
+            if model is not None:
+                self._models.move_to_end(path)
+                return model
+
+            model = self.loader(path)
+            if settings.INFERENCE_WARMUP:
+                try:
+                    _warm_up(model)
+                except Exception as e:
+                    log.warning(f"warm-up failed for {path}: {e}")
+            self._models[path] = model
+            self.stats["loads"] += 1
+            while len(self._models) > self.max_loaded:
+                evicted, _ = self._models.popitem(last=False)
+                self.stats["evictions"] += 1
+                log.info(f"LRU evicted {evicted}")
+            return model
+
+    def warm(self, path):
+        """Loads (and warms up) `path` ahead of use, e.g. before activating a new version."""
+        self.get_model(path)
+
+    def release(self, path):
+        with self._lock:
+            self._models.pop(path, None)
+
+    def invalidate(self, symbol=None):
+        """Drops cached models (all, or those of `symbol`) so the next call reloads them."""
+        with self._lock:
+            if symbol is None:
+                self._models.clear()
+                return
+            # solo i file del simbolo: il modello condiviso serve anche gli altri simboli
+            for kind in MODEL_KINDS:
+                for version in self.registry.versions(symbol, kind):
+                    self._models.pop(version["path"], None)
+
+    def loaded(self):
+        with self._lock:
+            return list(self._models)
+
+    # ------------------------------------------------------------------
+    # Inferenza
+    # ------------------------------------------------------------------
+    def predict(self, windows):
+        """
+        windows: {symbol: ndarray (lookback, n_features) or None}.
+        Returns {symbol: {"lstm": -1/0/1, "cnn": pattern label,
+        "lstm_proba": ..., "cnn_proba": ...}}; symbols without a usable
+        model or window get a neutral prediction.
+        """
+        results = {symbol: {"lstm": 0, "cnn": "no_pattern"} for symbol in windows}
+
+        for kind in MODEL_KINDS:
+            groups = OrderedDict()
+            for symbol, window in windows.items():
+                if window is None:
+                    continue
+                path = self.model_path(kind, symbol)
+                if path:
+                    groups.setdefault(path, []).append(symbol)
+
+            for path, symbols in groups.items():
+                try:
+                    model = self.get_model(path)
+                    symbols = [s for s in symbols if _fits(model, windows[s])]
+                    if not symbols:
+                        log.info(f"{kind}: no window matches {path} input shape")
+                        continue
+                    batch = np.stack([windows[s] for s in symbols]).astype("float32")
+                    proba = np.asarray(model.predict_on_batch(batch))
+                    self.stats["forward_passes"] += 1
+                except Exception as e:
+                    log.warning(f"{kind} failed on {path}: {e}")
+                    continue
+
+                for symbol, p in zip(symbols, proba):
+                    results[symbol][kind] = self._decode(kind, p)
+                    results[symbol][f"{kind}_proba"] = p
+
+        return results
+
+    @staticmethod
+    def _decode(kind, proba):
+        cls = int(np.argmax(proba)) if proba.max() >= CONFIDENCE_THRESHOLDS[kind] else 0
+        if kind == "cnn":
+            return CNN_PATTERNS.get(cls, "no_pattern")
+        return CLASS_TO_DIRECTION.get(cls, 0)
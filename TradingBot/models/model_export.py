@@ -0,0 +1,208 @@
+# models/model_export.py
+
+"""
+Export of the Keras LSTM/CNN models to the CPU runtimes of model_runtime.py.
+
+    export_model("models/registry/EURUSD/lstm/v0004.h5")
+        → models/registry/EURUSD/lstm/v0004.tflite   (settings.INFERENCE_BACKEND)
+
+Quantization (settings.INFERENCE_QUANTIZATION):
+    None        float32, same outputs as Keras up to rounding
+    "float16"   float16 weights, about half the size
+    "int8"      int8 weights with dynamic-range quantization (activations
+                stay float, so no calibration set is needed)
+
+The retrain worker exports every new version before it is published. Run
+`python -m models.model_export` to export the active versions of all
+registered models, check parity against Keras and print per-model latency:
+
+    python -m models.model_export [--backend tflite|onnx] [--quantize int8|float16]
+                                  [--symbols EURUSD GBPUSD] [--no-export]
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+import settings
+from models.model_runtime import RUNTIMES, exported_path, load_keras
+from utils.logger import get_logger
+
+log = get_logger("Export")
+
+# Scarto massimo ammesso tra probabilità Keras ed esportate
+PARITY_TOLERANCE = {None: 1e-4, "float16": 1e-2, "int8": 5e-2}
+
+
+def _tflite_converter(model, quantize, select_tf_ops):
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if select_tf_ops:
+        # op Flex: servono TensorFlow completo o un runtime con le Select TF ops
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS, tf.lite.OpsSet.SELECT_TF_OPS]
+        converter._experimental_lower_tensor_list_ops = False
+    else:
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS]
+    if quantize in ("float16", "int8"):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantize == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    return converter
+
+
+def _tflite_bytes(model, quantize):
+    """
+    Builtin ops only when the model converts that way (runs on plain
+    tflite_runtime); Select TF ops otherwise, which needs full TensorFlow at
+    load time.
+    """
+    try:
+        data = _tflite_converter(model, quantize, select_tf_ops=False).convert()
+        log.info(f"{model.name}: export TFLite con sole op builtin")
+        return data
+    except Exception as e:
+        log.warning(f"{model.name}: conversione builtin non riuscita ({e}), uso le Select TF ops "
+                    f"(il modello richiederà TensorFlow completo)")
+    return _tflite_converter(model, quantize, select_tf_ops=True).convert()
+
+
+def _export_onnx(model, path, quantize):
+    import tensorflow as tf
+    import tf2onnx
+    spec = (tf.TensorSpec((None, *model.input_shape[1:]), tf.float32, name="input"),)
+    tmp = path + ".tmp"
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=tmp)
+    if quantize == "int8":
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(tmp, path, weight_type=QuantType.QInt8)
+        os.remove(tmp)
+    elif quantize == "float16":
+        import onnx
+        from onnxconverter_common import float16
+        onnx.save(float16.convert_float_to_float16(onnx.load(tmp), keep_io_types=True), path)
+        os.remove(tmp)
+    else:
+        os.replace(tmp, path)
+
+
+def export_model(path, backend=None, quantize=None, model=None):
+    """Writes the exported sibling of the .h5 at `path` and returns its path."""
+    backend = backend or settings.INFERENCE_BACKEND
+    quantize = settings.INFERENCE_QUANTIZATION if quantize is None else quantize
+    if backend not in RUNTIMES:
+        raise ValueError(f"backend senza export: {backend}")
+    model = model or load_keras(path)
+    target = exported_path(path, backend)
+    if backend == "tflite":
+        tmp = target + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_tflite_bytes(model, quantize))
+        os.replace(tmp, target)
+    else:
+        _export_onnx(model, target, quantize)
+    return target
+
+
+# ----------------------------------------------------------------------
+# Parità e latenza
+# ----------------------------------------------------------------------
+def sample_windows(model, symbol=None, n=64, seed=0):
+    """Real validation windows of `symbol` when available, else random ones of the model's input shape."""
+    shape = [settings.LOOKBACK if d is None else d for d in model.input_shape[1:]]
+    if symbol:
+        try:
+            from utils.training_sequence import training_sequences
+            _, val = training_sequences(symbol, lookback=shape[0])
+            if val is not None and len(val):
+                windows = np.concatenate([val[i][0] for i in range(min(len(val), -(-n // val.batch_size)))])
+                if windows.shape[1:] == tuple(shape):
+                    return windows[:n].astype("float32")
+        except Exception as e:
+            log.warning(f"finestre reali non disponibili per {symbol}: {e}")
+    return np.random.default_rng(seed).normal(size=(n, *shape)).astype("float32")
+
+
+def parity(reference, candidate, windows):
+    """Max abs probability difference and argmax agreement between two models."""
+    a = np.asarray(reference.predict_on_batch(windows), dtype="float64")
+    b = np.asarray(candidate.predict_on_batch(windows), dtype="float64")
+    return {
+        "max_abs_diff": float(np.max(np.abs(a - b))),
+        "argmax_agreement": float(np.mean(a.argmax(axis=1) == b.argmax(axis=1))),
+    }
+
+
+def benchmark(model, windows, batch_sizes=(1, 8), repeats=50):
+    """{batch_size: {"p50_ms", "p95_ms"}} of predict_on_batch, after one warm-up call."""
+    result = {}
+    for size in batch_sizes:
+        batch = windows[:size]
+        model.predict_on_batch(batch)
+        timings = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            model.predict_on_batch(batch)
+            timings.append((time.perf_counter() - t0) * 1000)
+        result[size] = {"p50_ms": float(np.percentile(timings, 50)),
+                        "p95_ms": float(np.percentile(timings, 95))}
+    return result
+
+
+def check_model(path, symbol=None, backend=None, quantize=None, export=True):
+    """Exports (optionally) and compares `path` with its exported sibling; returns the report."""
+    backend = backend or settings.INFERENCE_BACKEND
+    quantize = settings.INFERENCE_QUANTIZATION if quantize is None else quantize
+    keras_model = load_keras(path)
+    target = export_model(path, backend, quantize, model=keras_model) if export else exported_path(path, backend)
+    runtime_model = RUNTIMES[backend](target)
+
+    windows = sample_windows(keras_model, symbol)
+    report = {"path": target, "size_kb": os.path.getsize(target) // 1024,
+              **parity(keras_model, runtime_model, windows)}
+    report["ok"] = report["max_abs_diff"] <= PARITY_TOLERANCE.get(quantize, 5e-2)
+    report["keras"] = benchmark(keras_model, windows)
+    report[backend] = benchmark(runtime_model, windows)
+    return report
+
+
+def main():
+    from models.model_registry import get_model_registry
+
+    parser = argparse.ArgumentParser(description="Export LSTM/CNN models and check parity/latency")
+    parser.add_argument("--backend", default=None, choices=sorted(RUNTIMES))
+    parser.add_argument("--quantize", default=None, choices=["none", "float16", "int8"])
+    parser.add_argument("--symbols", nargs="*")
+    parser.add_argument("--no-export", action="store_true", help="usa gli export già presenti")
+    args = parser.parse_args()
+
+    backend = args.backend or (settings.INFERENCE_BACKEND if settings.INFERENCE_BACKEND in RUNTIMES else "tflite")
+    quantize = None if args.quantize == "none" else (args.quantize or settings.INFERENCE_QUANTIZATION)
+    registry = get_model_registry()
+    symbols = args.symbols or registry.symbols()
+
+    failures = 0
+    for symbol in symbols:
+        for kind in ("lstm", "cnn"):
+            meta = registry.current(symbol, kind)
+            if meta is None:
+                continue
+            try:
+                r = check_model(meta["path"], symbol, backend, quantize, export=not args.no_export)
+            except Exception as e:
+                failures += 1
+                print(f"❌ {symbol:7} {kind:4} v{meta['version']}: {e}")
+                continue
+            failures += not r["ok"]
+            print(f"{'✅' if r['ok'] else '❌'} {symbol:7} {kind:4} v{meta['version']} → {r['path']} "
+                  f"({r['size_kb']} KB) max|Δp|={r['max_abs_diff']:.5f} argmax={r['argmax_agreement']:.1%}")
+            for size in r["keras"]:
+                print(f"      batch {size:2}: keras p50={r['keras'][size]['p50_ms']:.2f}ms "
+                      f"p95={r['keras'][size]['p95_ms']:.2f}ms | {backend} "
+                      f"p50={r[backend][size]['p50_ms']:.2f}ms p95={r[backend][size]['p95_ms']:.2f}ms")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# models/model_registry.py
+
+"""
+Versioned model artifacts per (symbol, model kind).
+
+    <root>/registry.json                   index: current version + history
+    <root>/<SYMBOL>/<kind>/v0003.h5        one file per published version
+    <root>/<SYMBOL>/<kind>/v0003.tflite    its CPU export, if any (model_runtime.py)
+
+Every version records its training metadata (time, base model, samples,
+epochs, validation score). The index is read once at start-up and then kept
+in memory, so the live loop asks "which file serves EURUSD lstm?" without
+touching the filesystem. A new version is added inactive, can be loaded
+and warmed up, and only then becomes current with `activate`; the old file
+stays until it falls out of the last settings.MODEL_REGISTRY_KEEP versions.
+
+Symbol models saved at the legacy paths (settings.LSTM_MODEL_PATH etc.) and
+the shared models are registered in place, as version 1, the first time the
+index is created.
+"""
+
+import json
+import os
+import threading
+import time
+
+import settings
+from models.model_runtime import sibling_exports
+from utils.logger import get_logger
+
+log = get_logger("Registry")
+
+MODEL_KINDS = ("lstm", "cnn")
+SHARED = "_shared"   # pseudo-simbolo dei modelli condivisi
+INDEX = "registry.json"
+
+LEGACY_PATHS = {"lstm": "LSTM_MODEL_PATH", "cnn": "CNN_MODEL_PATH"}
+SHARED_PATHS = {"lstm": "SHARED_LSTM_MODEL_PATH", "cnn": "SHARED_CNN_MODEL_PATH"}
+
+
+class ModelRegistry:
+    def __init__(self, root=None, keep=None):
+        self.root = root or settings.MODEL_REGISTRY_DIR
+        self.keep = keep or settings.MODEL_REGISTRY_KEEP
+        self.index = {}   # simbolo -> kind -> {"current": n, "versions": [...]}
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------
+    # Lettura (solo memoria)
+    # ------------------------------------------------------------------
+    def current(self, symbol, kind):
+        """Metadata of the active version, or None."""
+        with self._lock:
+            entry = self.index.get(symbol, {}).get(kind)
+            if not entry or entry.get("current") is None:
+                return None
+            return self._version(entry, entry["current"])
+
+    def has_model(self, symbol, kind):
+        return self.current(symbol, kind) is not None
+
+    def resolve(self, symbol, kind):
+        """Path serving `symbol`: its own current version, else the shared model, else None."""
+        meta = self.current(symbol, kind) or self.current(SHARED, kind)
+        return meta["path"] if meta else None
+
+    def versions(self, symbol, kind):
+        with self._lock:
+            entry = self.index.get(symbol, {}).get(kind)
+            return [dict(v) for v in entry["versions"]] if entry else []
+
+    def symbols(self):
+        with self._lock:
+            return [s for s in self.index if s != SHARED]
+
+    @staticmethod
+    def _version(entry, number):
+        for v in entry["versions"]:
+            if v["version"] == number:
+                return dict(v)
+        return None
+
+    # ------------------------------------------------------------------
+    # Scrittura
+    # ------------------------------------------------------------------
+    def staging_path(self, symbol, kind):
+        folder = os.path.join(self.root, symbol, kind)
+        os.makedirs(folder, exist_ok=True)
+        return os.path.join(folder, f"staging_{os.getpid()}_{time.time_ns()}.h5")
+
+    def add_version(self, symbol, kind, src_path, metadata=None, activate=False):
+        """
+        Moves `src_path` into the registry as the next version of
+        (symbol, kind) and returns its metadata. The version becomes current
+        only with activate=True or a later `activate` call.
+        """
+        with self._lock:
+            entry = self.index.setdefault(symbol, {}).setdefault(kind, {"current": None, "versions": []})
+            number = max((v["version"] for v in entry["versions"]), default=0) + 1
+            folder = os.path.join(self.root, symbol, kind)
+            os.makedirs(folder, exist_ok=True)
+            path = os.path.join(folder, f"v{number:04d}.h5")
+            for exported in sibling_exports(src_path):   # .tflite/.onnx seguono il .h5
+                os.replace(exported, os.path.splitext(path)[0] + os.path.splitext(exported)[1])
+            os.replace(src_path, path)
+            meta = {"version": number, "path": path, "created": time.time(), **(metadata or {})}
+            entry["versions"].append(meta)
+            if activate:
+                entry["current"] = number
+            self._prune(entry)
+            self.save()
+            return dict(meta)
+
+    def activate(self, symbol, kind, version):
+        """Makes `version` current (also used for rollbacks)."""
+        with self._lock:
+            entry = self.index.get(symbol, {}).get(kind)
+            if not entry or self._version(entry, version) is None:
+                raise KeyError(f"{symbol} {kind} v{version} non registrata")
+            entry["current"] = version
+            self.save()
+        log.info(f"{symbol} {kind} → v{version}")
+
+    def _prune(self, entry):
+        # tiene le ultime `keep` versioni più quella attiva; i file legacy non si cancellano
+        keep = {v["version"] for v in entry["versions"][-self.keep:]} | {entry["current"]}
+        kept = []
+        root = os.path.abspath(self.root)
+        for v in entry["versions"]:
+            if v["version"] in keep:
+                kept.append(v)
+            elif os.path.abspath(v["path"]).startswith(root):
+                for path in [v["path"], *sibling_exports(v["path"])]:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            else:
+                kept.append(v)
+        entry["versions"] = kept
+
+    # ------------------------------------------------------------------
+    # Persistenza
+    # ------------------------------------------------------------------
+    def save(self):
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            tmp = os.path.join(self.root, INDEX + ".tmp")
+            with open(tmp, "w") as f:
+                json.dump(self.index, f, indent=2)
+            os.replace(tmp, os.path.join(self.root, INDEX))
+
+    def load(self):
+        """Reads the index; the first time, registers the models found at the legacy paths."""
+        path = os.path.join(self.root, INDEX)
+        if os.path.exists(path):
+            with open(path) as f:
+                index = json.load(f)
+            with self._lock:
+                self.index = index
+            return self
+        self._import_legacy()
+        self.save()
+        return self
+
+    def _import_legacy(self):
+        folder = os.path.dirname(settings.LSTM_MODEL_PATH) or "."
+        candidates = []
+        for kind in MODEL_KINDS:
+            shared = getattr(settings, SHARED_PATHS[kind], None)
+            if shared:
+                candidates.append((SHARED, kind, shared))
+            prefix, suffix = getattr(settings, LEGACY_PATHS[kind]).split("{}")
+            prefix = os.path.basename(prefix)
+            if os.path.isdir(folder):
+                for name in os.listdir(folder):
+                    if name.startswith(prefix) and name.endswith(suffix) and len(name) > len(prefix + suffix):
+                        symbol = name[len(prefix):-len(suffix)]
+                        if symbol != "shared":
+                            candidates.append((symbol, kind, os.path.join(folder, name)))
+
+        with self._lock:
+            for symbol, kind, path in candidates:
+                if not os.path.exists(path):
+                    continue
+                self.index.setdefault(symbol, {})[kind] = {"current": 1, "versions": [{
+                    "version": 1, "path": path, "created": os.path.getmtime(path), "source": "legacy",
+                }]}
+                log.info(f"registrato {path} come {symbol} {kind} v1")
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry():
+    """Process-wide ModelRegistry, loaded on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ModelRegistry().load()
+    return _registry
@@ -0,0 +1,104 @@
+# models/model_runtime.py
+
+"""
+CPU runtimes for the exported LSTM/CNN models.
+
+settings.INFERENCE_BACKEND selects how InferenceService loads a registered
+model file:
+
+    "keras"   the .h5 through tensorflow.keras (previous behaviour)
+    "tflite"  the sibling .tflite through tflite_runtime, or tf.lite if
+              tflite_runtime is not installed
+    "onnx"    the sibling .onnx through onnxruntime
+
+The exported file sits next to the .h5 with the same name (v0004.h5 →
+v0004.tflite). When it is missing the model is loaded with Keras, so a
+backend switch never leaves a symbol without predictions. The wrappers
+expose the two things the service uses from a Keras model: `input_shape`
+and `predict_on_batch`.
+"""
+
+import os
+
+import numpy as np
+
+import settings
+from utils.logger import get_logger
+
+log = get_logger("Inference")
+
+EXTENSIONS = {"tflite": ".tflite", "onnx": ".onnx"}
+
+
+def exported_path(path, backend):
+    return os.path.splitext(path)[0] + EXTENSIONS[backend]
+
+
+def sibling_exports(path):
+    """Exported files that exist next to `path`."""
+    stem = os.path.splitext(path)[0]
+    return [stem + ext for ext in EXTENSIONS.values() if os.path.exists(stem + ext)]
+
+
+class TFLiteModel:
+    def __init__(self, path, threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+        self.path = path
+        self.interpreter = Interpreter(model_path=path, num_threads=threads or settings.INFERENCE_THREADS)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self.input_shape = (None, *[int(d) for d in self._input["shape"][1:]])
+        self._batch = int(self._input["shape"][0])
+
+    def predict_on_batch(self, batch):
+        batch = np.asarray(batch, dtype=self._input["dtype"])
+        if len(batch) != self._batch:
+            # il batch cambia con il numero di simboli: ridimensiona solo quando serve
+            self.interpreter.resize_tensor_input(self._input["index"], batch.shape)
+            self.interpreter.allocate_tensors()
+            self._input = self.interpreter.get_input_details()[0]
+            self._output = self.interpreter.get_output_details()[0]
+            self._batch = len(batch)
+        self.interpreter.set_tensor(self._input["index"], batch)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self._output["index"]).astype("float32")
+
+
+class OnnxModel:
+    def __init__(self, path, threads=None):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads or settings.INFERENCE_THREADS
+        options.inter_op_num_threads = 1
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        inp = self.session.get_inputs()[0]
+        self._input = inp.name
+        self.input_shape = (None, *[d if isinstance(d, int) else None for d in inp.shape[1:]])
+
+    def predict_on_batch(self, batch):
+        return self.session.run(None, {self._input: np.asarray(batch, dtype="float32")})[0]
+
+
+RUNTIMES = {"tflite": TFLiteModel, "onnx": OnnxModel}
+
+
+def load_keras(path):
+    # import pesante: solo se serve davvero Keras
+    from tensorflow.keras.models import load_model
+    return load_model(path, compile=False)
+
+
+def load_for_backend(path, backend=None):
+    """Loads `path` with the configured backend, falling back to Keras without an export."""
+    backend = backend or settings.INFERENCE_BACKEND
+    if backend in RUNTIMES:
+        exported = exported_path(path, backend)
+        if os.path.exists(exported):
+            return RUNTIMES[backend](exported)
+        log.info(f"{exported} assente, uso Keras per {path}")
+    return load_keras(path)
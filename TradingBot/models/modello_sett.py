@@ -1,11 +1,16 @@
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
-import torch.nn.functional as F
+# transformers/torch si importano solo quando il modello viene davvero creato
 import os
+import hashlib
+import threading
+import time
 import settings
+from utils.logger import get_logger
+
+log = get_logger("Sentiment")
 
 class SentimentModel:
     def __init__(self, model_name=None, local_path=None):
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
         self.tokenizer = None
         self.model = None
         model_name = model_name or getattr(
@@ -13,30 +18,102 @@ class SentimentModel:
         )
         local_path = local_path or "models/sentiment_model"
         try:
-            print(f"[SentimentModel] Loading model: {model_name}")
+            log.info(f"Loading model: {model_name}")
             if os.path.isdir(local_path):
                 self.tokenizer = AutoTokenizer.from_pretrained(local_path)
                 self.model = AutoModelForSequenceClassification.from_pretrained(local_path)
-                print(f"[SentimentModel] Loaded from local path: {local_path}")
+                log.info(f"Loaded from local path: {local_path}")
             else:
                 self.tokenizer = AutoTokenizer.from_pretrained(model_name)
                 self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
                 os.makedirs(local_path, exist_ok=True)
                 self.tokenizer.save_pretrained(local_path)
                 self.model.save_pretrained(local_path)
-                print(f"[SentimentModel] Downloaded to: {local_path}")
+                log.info(f"Downloaded to: {local_path}")
         except Exception as e:
-            print(f"[SentimentModel] Failed to load model: {e}")
+            log.error(f"Failed to load model: {e}")
             raise
 
+        self._model_lock = threading.Lock()
+        self._cache = {}            # sha1(testo) -> (score, scadenza)
+        self._cache_lock = threading.Lock()
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha1(text.strip()[:512].encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key, now):
+        hit = self._cache.get(key)
+        if hit and hit[1] > now:
+            return hit[0]
+        return None
+
+    def _cache_put(self, items, now):
+        ttl = getattr(settings, "SENTIMENT_CACHE_TTL_SECONDS", 3600)
+        max_items = getattr(settings, "SENTIMENT_CACHE_MAX_ITEMS", 5000)
+        with self._cache_lock:
+            for key, score in items:
+                self._cache[key] = (score, now + ttl)
+            if len(self._cache) > max_items:
+                # prima le voci scadute, poi le più vecchie
+                for key in [k for k, (_, exp) in self._cache.items() if exp <= now]:
+                    del self._cache[key]
+                while len(self._cache) > max_items:
+                    del self._cache[next(iter(self._cache))]
+
+    def analyze_batch(self, texts: list[str]) -> list[float]:
+        """
+        Scores many headlines at once (pos - neg probability, [-1, 1]).
+        Identical texts are scored once and cached for SENTIMENT_CACHE_TTL_SECONDS.
+        """
+        now = time.time()
+        keys = [self._key(t) for t in texts]
+        scores = {}
+        missing = {}
+        with self._cache_lock:
+            for key, text in zip(keys, texts):
+                cached = self._cache_get(key, now)
+                if cached is not None:
+                    scores[key] = cached
+                elif key not in missing:
+                    missing[key] = text.strip()[:512]
+
+        if missing:
+            import torch
+            import torch.nn.functional as F
+            batch_size = getattr(settings, "SENTIMENT_BATCH_SIZE", 16)
+            pending = list(missing.items())
+            fresh = []
+            for i in range(0, len(pending), batch_size):
+                chunk = pending[i:i + batch_size]
+                try:
+                    inputs = self.tokenizer([t for _, t in chunk], return_tensors="pt",
+                                            padding=True, truncation=True, max_length=512)
+                    with self._model_lock, torch.no_grad():
+                        logits = self.model(**inputs).logits
+                    probs = F.softmax(logits, dim=-1).tolist()
+                    fresh.extend((key, round(pos - neg, 3)) for (key, _), (neg, pos) in zip(chunk, probs))
+                except Exception as e:
+                    log.warning(f"Error analyzing batch: {e}")
+                    scores.update((key, 0.0) for key, _ in chunk)
+            self._cache_put(fresh, now)
+            scores.update(fresh)
+
+        return [scores[key] for key in keys]
+
     def analyze(self, text: str) -> float:
-        try:
-            inputs = self.tokenizer(text[:512], return_tensors="pt", truncation=True)
-            with torch.no_grad():
-                logits = self.model(**inputs).logits
-            probs = F.softmax(logits, dim=-1)
-            neg, pos = probs[0].tolist()
-            return round(pos - neg, 3)
-        except Exception as e:
-            print(f"[SentimentModel] Error analyzing text: {e}")
-            return 0.0
+        return self.analyze_batch([text])[0]
+
+
+_shared_model = None
+_shared_lock = threading.Lock()
+
+
+def get_sentiment_model() -> SentimentModel:
+    """Process-wide SentimentModel: DistilBERT is loaded once and shared by every symbol."""
+    global _shared_model
+    if _shared_model is None:
+        with _shared_lock:
+            if _shared_model is None:
+                _shared_model = SentimentModel()
+    return _shared_model
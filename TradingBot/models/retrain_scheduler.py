@@ -0,0 +1,244 @@
+# models/retrain_scheduler.py
+
+"""
+Background retraining outside the trading process.
+
+Requests are queued per symbol: repeated requests within
+settings.RETRAIN_DEBOUNCE_SECONDS are coalesced into one job (model kinds
+merged), a symbol is never trained twice at the same time and not more
+often than settings.RETRAIN_MIN_INTERVAL_SECONDS. Jobs run on a small
+spawned process pool (settings.RETRAIN_MAX_WORKERS) at lowered CPU
+priority, so the live loop keeps its GIL, cores and RAM.
+
+A job writes the new model to a staging file and validates it there; only
+a model that loads, fits the input shape and reaches
+settings.RETRAIN_MIN_VAL_ACCURACY is added to the model registry as a new
+version, warmed up through the `warm` callback and then activated. The live
+loop therefore switches from one complete model to the next, never to a
+partial file.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import settings
+from models.model_registry import get_model_registry
+from models.model_runtime import RUNTIMES, sibling_exports
+from utils.logger import get_logger
+
+log = get_logger("Retrain")
+
+
+# ----------------------------------------------------------------------
+# Lato worker (processo separato)
+# ----------------------------------------------------------------------
+def _init_worker(nice, threads):
+    # prima di importare TensorFlow: limita i thread BLAS/TF del worker
+    for var in ("OMP_NUM_THREADS", "TF_NUM_INTRAOP_THREADS", "TF_NUM_INTEROP_THREADS"):
+        os.environ[var] = str(threads)
+    try:
+        os.nice(nice)
+    except (AttributeError, OSError):
+        try:
+            import psutil
+            psutil.Process().nice(psutil.BELOW_NORMAL_PRIORITY_CLASS)
+        except Exception:
+            pass
+
+
+def _retrain_job(symbol, kind, staging_path, base_path):
+    """
+    Fine-tunes `base_path` (the symbol's current model or the shared one) on
+    fresh data and saves it to `staging_path`. Returns the path and the
+    training metadata for the registry.
+    """
+    from tensorflow.keras.models import load_model
+    from utils.training_sequence import fit_on_sequences
+
+    if not base_path or not os.path.exists(base_path):
+        raise FileNotFoundError(f"nessun modello {kind} di partenza per {symbol}")
+
+    started = time.time()
+    model = load_model(base_path, compile=False)
+    model.compile(optimizer="adam", loss="sparse_categorical_crossentropy", metrics=["accuracy"])
+    history = fit_on_sequences(model, symbol, lookback=model.input_shape[1])
+    if history is None:
+        raise ValueError("dati di training insufficienti")
+    val_acc = history.history.get("val_accuracy") or history.history.get("accuracy") or [0.0]
+    model.save(staging_path)
+
+    # il file salvato deve ricaricarsi con la stessa forma di input
+    reloaded = load_model(staging_path, compile=False)
+    if tuple(reloaded.input_shape) != tuple(model.input_shape):
+        raise ValueError("modello salvato non coerente")
+
+    # export per il backend CPU configurato, pubblicato insieme al .h5
+    if settings.INFERENCE_BACKEND in RUNTIMES:
+        from models.model_export import PARITY_TOLERANCE, export_model, parity, sample_windows
+        target = export_model(staging_path, model=reloaded)
+        check = parity(reloaded, RUNTIMES[settings.INFERENCE_BACKEND](target), sample_windows(reloaded))
+        if check["max_abs_diff"] > PARITY_TOLERANCE.get(settings.INFERENCE_QUANTIZATION, 5e-2):
+            raise ValueError(f"export {settings.INFERENCE_BACKEND} non conforme: {check}")
+    return {
+        "path": staging_path,
+        "val_accuracy": float(val_acc[-1]),
+        "base": base_path,
+        "epochs": len(history.epoch),
+        "train_seconds": round(time.time() - started, 1),
+    }
+
+
+def publish(registry, symbol, kind, result, warm=None):
+    """Adds a validated staging model as the active version; below threshold it is discarded."""
+    staging = result.pop("path")
+    if result["val_accuracy"] < settings.RETRAIN_MIN_VAL_ACCURACY:
+        for path in [staging, *sibling_exports(staging)]:
+            os.remove(path)
+        return {"ok": False, "error": f"val_accuracy {result['val_accuracy']:.3f} sotto soglia",
+                "val_accuracy": result["val_accuracy"]}
+    previous = registry.current(symbol, kind)
+    meta = registry.add_version(symbol, kind, staging, result)
+    if warm:
+        warm(meta["path"])   # caricato prima di diventare attivo
+    registry.activate(symbol, kind, meta["version"])
+    return {"ok": True, "val_accuracy": meta["val_accuracy"], "version": meta["version"],
+            "path": meta["path"], "previous": previous["path"] if previous else None}
+
+
+def retrain_now(symbol, kind, registry=None, **metadata):
+    """
+    Same job and publication as the scheduler, in the calling process
+    (build_and_train.py, CSV uploads). Returns publish()'s result dict.
+    """
+    registry = registry or get_model_registry()
+    try:
+        result = _retrain_job(symbol, kind, registry.staging_path(symbol, kind),
+                              registry.resolve(symbol, kind))
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+    result.update(metadata)
+    return publish(registry, symbol, kind, result)
+
+
+# ----------------------------------------------------------------------
+# Lato bot
+# ----------------------------------------------------------------------
+class RetrainScheduler:
+    def __init__(self, on_done=None, warm=None, registry=None, workers=None, debounce=None,
+                 min_interval=None, nice=None, threads=None, job=_retrain_job):
+        self.on_done = on_done
+        self.warm = warm
+        self.registry = registry or get_model_registry()
+        self.workers = workers or settings.RETRAIN_MAX_WORKERS
+        self.debounce = settings.RETRAIN_DEBOUNCE_SECONDS if debounce is None else debounce
+        self.min_interval = settings.RETRAIN_MIN_INTERVAL_SECONDS if min_interval is None else min_interval
+        self.nice = settings.RETRAIN_NICE if nice is None else nice
+        self.threads = threads or settings.RETRAIN_THREADS
+        self.job = job
+
+        self._pending = {}     # simbolo -> {"kinds": set, "due": t}
+        self._running = set()
+        self._last_done = {}   # simbolo -> fine dell'ultimo job
+        self._cond = threading.Condition()
+        self._pool = None
+        self._stopped = False
+        self._thread = threading.Thread(target=self._dispatch, name="retrain-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, symbol, kinds=("lstm", "cnn"), force=False):
+        """Queues a retrain; requests for a symbol already queued are merged."""
+        now = time.monotonic()
+        with self._cond:
+            job = self._pending.get(symbol)
+            if job is None:
+                due = now if force else max(now + self.debounce,
+                                            self._last_done.get(symbol, -1e18) + self.min_interval)
+                job = self._pending[symbol] = {"kinds": set(), "due": due}
+            elif force:
+                job["due"] = now
+            job["kinds"].update(kinds)
+            self._cond.notify()
+
+    def pending(self):
+        with self._cond:
+            return {s: sorted(j["kinds"]) for s, j in self._pending.items()}, set(self._running)
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=get_context("spawn"),   # niente fork di un processo con thread
+                initializer=_init_worker,
+                initargs=(self.nice, self.threads),
+            )
+        return self._pool
+
+    def _dispatch(self):
+        with self._cond:
+            while not self._stopped:
+                now = time.monotonic()
+                ready = [s for s, j in self._pending.items()
+                         if j["due"] <= now and s not in self._running]
+                for symbol in sorted(ready, key=lambda s: self._pending[s]["due"]):
+                    if len(self._running) >= self.workers:
+                        break
+                    job = self._pending.pop(symbol)
+                    self._running.add(symbol)
+                    self._start(symbol, sorted(job["kinds"]))
+                waits = [j["due"] - now for s, j in self._pending.items() if s not in self._running]
+                self._cond.wait(timeout=max(0.05, min(waits)) if waits else None)
+
+    def _start(self, symbol, kinds):
+        pool = self._executor()
+        futures = {}
+        for kind in kinds:
+            staging = self.registry.staging_path(symbol, kind)
+            base = self.registry.resolve(symbol, kind)
+            futures[kind] = pool.submit(self.job, symbol, kind, staging, base)
+        log.info(f"{symbol}: avviato {', '.join(kinds)}")
+
+        remaining = [len(futures)]
+        results = {}
+
+        def finished(kind, fut):
+            try:
+                results[kind] = self._publish(symbol, kind, fut.result())
+            except Exception as e:
+                results[kind] = {"ok": False, "error": str(e)}
+            with self._cond:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+                self._running.discard(symbol)
+                self._last_done[symbol] = time.monotonic()
+                self._cond.notify()
+            self._report(symbol, results)
+
+        for kind, fut in futures.items():
+            fut.add_done_callback(lambda f, k=kind: finished(k, f))
+
+    def _publish(self, symbol, kind, result):
+        return publish(self.registry, symbol, kind, result, warm=self.warm)
+
+    def _report(self, symbol, results):
+        for kind, r in results.items():
+            if r["ok"]:
+                log.info(f"{symbol} {kind}: v{r['version']} attiva (val_accuracy={r['val_accuracy']:.3f})")
+            else:
+                log.warning(f"{symbol} {kind}: scartato ({r['error']})")
+        if self.on_done:
+            try:
+                self.on_done(symbol, results)
+            except Exception as e:
+                log.warning(f"callback fallita per {symbol}: {e}")
+
+    def stop(self, wait=False):
+        with self._cond:
+            self._stopped = True
+            self._pending.clear()
+            self._cond.notify()
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
@@ -1,6 +1,6 @@
 # mt5_wrapper.py
 
-import MetaTrader5 as mt5
+from data_sources.broker import mt5
 
 def initialize_mt5():
     if not mt5.initialize():
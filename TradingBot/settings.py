@@ -1,10 +1,38 @@
-import MetaTrader5 as mt5
+try:
+    import MetaTrader5 as mt5
+except ImportError:  # Linux / backtest: stessi codici timeframe dal replay
+    import data_sources.fake_mt5_reader as mt5
 DEFAULT_BALANCE = 4_000
 RISK_PERCENT = 0.01
 MANUAL_POSITION_MULTIPLIER = 1.0
 # TELEGRAM SETTINGS
 TELEGRAM_TOKEN = "placeholder"
 TELEGRAM_CHAT_ID = "placeholder"
+# NOTIFICHE TELEGRAM (utils/notifier.py): coda + thread, mai chiamate HTTP dal loop di trading
+NOTIFY_QUEUE_SIZE = 200              # messaggi in attesa oltre i quali si scartano
+NOTIFY_MIN_INTERVAL_SECONDS = 1.0    # Telegram: circa 1 messaggio/s per chat
+NOTIFY_DEDUP_SECONDS = 900           # stesso segnale per simbolo non ripetuto prima di così
+NOTIFY_TIMEOUT = (3.05, 10)          # connect, read (secondi)
+NOTIFY_MAX_ATTEMPTS = 3
+# CANALE DI CONTROLLO (bot ↔ Telegram / watchdog / AutoManager)
+CONTROL_SOCKET_PATH = "run/tradingbot.sock"  # socket Unix, relativo alla cartella TradingBot
+CONTROL_TCP_PORT = 47800                     # 127.0.0.1, solo dove AF_UNIX non c'è (Windows)
+CONTROL_TIMEOUT = 5
+CONTROL_TOKEN_FILE = "run/control.token"     # segreto condiviso (0600) richiesto a ogni comando
+# METRICHE DI LATENZA (utils/latency_metrics.py, comando "metrics" del canale)
+METRICS_ENABLED = True               # cronometra ogni chiamata al broker, stage e inferenza
+METRICS_SUMMARY_SECONDS = 900        # ogni quanto il bot scrive il riepilogo nel log
+# CONFIG A CALDO (utils/runtime_config.py): i valori qui sotto sono i default,
+# le modifiche a runtime vanno nel sidecar e non riscrivono questo file
+RUNTIME_CONFIG_FILE = "config/runtime_config.json"   # relativo alla cartella TradingBot
+RUNTIME_CONFIG_KEYS = [
+    "RISK_PERCENT", "MANUAL_POSITION_MULTIPLIER", "STRATEGY_MODE", "FLIP_COOLDOWN_SECONDS",
+    "SHORT_THRESHOLD", "LONG_THRESHOLD", "ENABLE_DAILY_LOSS_LIMIT", "DAILY_LOSS_LIMIT_PCT",
+    "ENABLE_COMBO_CONFIDENCE_BOOST", "ALERTS_ENABLED", "EXECUTION_TF_LABEL",
+    "ENABLE_TRAILING_STOPS", "ENABLE_PARTIAL_TP", "ENABLE_BREAK_EVEN",
+    "TRAILING_CONFIG", "PARTIAL_TP_CONFIG", "BREAK_EVEN_CONFIG",
+]
+WATCHDOG_STALL_SECONDS = 600                 # nessun ciclo completato da così tanto → allarme
 ATR_MULTIPLIER = {
     "ranging":       0.3,
     "trending_up":   0.5,
@@ -14,6 +42,16 @@ ATR_MULTIPLIER = {
 ATR_PERIOD = 7
 MIN_LOT_SIZE = 0.05
 LOOKBACK = 50
+TRAIN_BATCH_SIZE = 64
+TRAIN_EPOCHS = 10
+TRAIN_VALIDATION_SPLIT = 0.1          # ultime finestre (in ordine di tempo) per la validazione
+TRAIN_CACHE_DIR = "data/train_cache"  # matrici di feature memory-mapped per il training
+RETRAIN_MAX_WORKERS = 1               # processi di retraining in parallelo (fuori dal processo del bot)
+RETRAIN_DEBOUNCE_SECONDS = 300        # richieste per lo stesso simbolo entro la finestra → un solo job
+RETRAIN_MIN_INTERVAL_SECONDS = 1800   # distanza minima tra due retraining dello stesso simbolo
+RETRAIN_NICE = 10                     # priorità CPU ridotta dei worker (os.nice)
+RETRAIN_THREADS = 2                   # thread TF/BLAS per worker
+RETRAIN_MIN_VAL_ACCURACY = 0.40       # sotto soglia il nuovo modello viene scartato
 DEBUG_BUILD = True     # mettilo a False quando non ti serve più
 ENABLE_TRAILING_STOPS = True
 ENABLE_PARTIAL_TP = True
@@ -47,6 +85,11 @@ THRESHOLD_PERCENTS = {
 VOLATILE_ATR_THRESHOLD = 0.005
 TREND_SMA_THRESHOLD = 0.001
 TRADE_LOG_CSV = "trade_logs.csv"
+PERFORMANCE_STATS_FILE = "performance_stats.json"  # stato delle statistiche incrementali
+PERFORMANCE_STATS_SAVE_SECONDS = 60                 # salvataggio al massimo ogni N secondi
+PERFORMANCE_WINDOWS = {"24h": 86400, "7d": 7 * 86400, "30d": 30 * 86400}
+COMBO_STATS_FILE = "combo_stats.json"   # statistiche combo di indicatori per simbolo
+COMBO_MAX_SIZE = 3                      # indicatori massimi per combo (sottoinsiemi enumerati)
 ENABLE_SUB_POSITIONING = True  # placeholder if you want sub-position logic
 LONG_THRESHOLD = 0.6
 SHORT_THRESHOLD = 0.4
@@ -55,13 +98,33 @@ VOLATILY_MULTIPLIER = 2.0
 RANGING_MULTIPLIER    = 0.5
 DAILY_LOSS_LIMIT_PCT = 10.0
 MAX_WORKERS = 4
+PIPELINE_WORKERS = MAX_WORKERS  # thread per fetch/feature dei simboli nel loop live
+ORDER_GATEWAY_WORKERS = 4            # invii concorrenti (ticket/simboli diversi) del gateway ordini
+ORDER_MAX_IN_FLIGHT = 16             # richieste in coda/in volo oltre le quali submit() attende
+ORDER_MAX_RETRIES = 3                # nuovi tentativi su requote / prezzo cambiato
+ORDER_RETRY_BACKOFF_SECONDS = 0.2    # attesa del primo retry, raddoppia a ogni tentativo
 DEFAULT_CHUNKS = 2
 CHUNK_SPACING_PIPS = 10.0
 OHLCV_BARS = 5000
+DATASET_DIR = "data/processed"       # dataset storici: <SYMBOL>_<TF>/ con partizioni mensili parquet
+DATASET_BUILD_WORKERS = MAX_WORKERS  # processi per il build dei dataset (simbolo, timeframe)
 INDICATOR_WEIGHTS_FILE = "indicator_weights.json"
-TRADE_HISTORY_FILE = "trade_history.xlsx"
-LOG_FILE = "log.txt"
+TRADE_HISTORY_FILE = "trade_history.xlsx"   # solo export per consultazione (export_trade_history)
+TRADE_JOURNAL_DB = "trade_journal.sqlite"   # journal dei trade (SQLite WAL), relativo alla cartella TradingBot
+LOG_FILE = "logs/bot.jsonl"          # record JSON, uno per riga (utils/logger.py)
+LOG_LEVEL = "INFO"                   # livello di default dei componenti
+LOG_LEVELS = {"News": "WARNING"}     # livelli per componente ("[Component]" dei messaggi)
+LOG_CONSOLE = True                   # copia leggibile su stdout (catturata dal watchdog)
+LOG_QUEUE_SIZE = 10000               # record in attesa oltre i quali si scarta (mai bloccare)
+LOG_BATCH_SIZE = 256                 # record scritti per ogni write
+LOG_FLUSH_SECONDS = 1.0              # flush anche se il batch non è pieno
+LOG_MAX_BYTES = 20 * 1024 * 1024     # rotazione per dimensione...
+LOG_ROTATE_SECONDS = 86400           # ...o per età del file
+LOG_BACKUP_COUNT = 7
 BAR_COUNT = 600
+BAR_CACHE_CAPACITY = 1000       # barre tenute in memoria per (simbolo, timeframe)
+BAR_CACHE_TTL_SECONDS = 1.0     # letture entro questo intervallo non interrogano il broker
+BAR_CACHE_DELTA_BARS = 4        # prima richiesta incrementale (raddoppia se non basta)
 SYMBOLS = [
     "EURUSD", "GBPUSD", "USDCHF", "USDJPY", "BTCUSD", "ETHUSD", "LTCUSD", "XRPUSD", "DOGUSD", "ADAUSD"]
 
@@ -83,7 +146,22 @@ MODEL_WEIGHTS = {
 
 LSTM_MODEL_PATH = "models/{}_lstm_model.h5"
 CNN_MODEL_PATH = "models/{}_cnn_model.h5"
+# Modello condiviso per architettura, usato dai simboli senza un .h5 dedicato
+SHARED_LSTM_MODEL_PATH = "models/shared_lstm_model.h5"
+SHARED_CNN_MODEL_PATH = "models/shared_cnn_model.h5"
+INFERENCE_MAX_LOADED_MODELS = 8   # LRU: modelli Keras tenuti in memoria
+INFERENCE_WARMUP = True           # predict fittizia al caricamento (grafo costruito fuori dal ciclo)
+INFERENCE_BACKEND = "keras"       # "keras" | "tflite" | "onnx" (export accanto al .h5, vedi models/model_export.py)
+INFERENCE_QUANTIZATION = None     # None | "float16" | "int8" per gli export
+INFERENCE_THREADS = 2             # thread CPU dei runtime tflite/onnx
+MODEL_REGISTRY_DIR = "models/registry"  # versioni dei modelli + registry.json
+MODEL_REGISTRY_KEEP = 3                 # versioni tenute su disco per (simbolo, tipo), oltre all'attiva
+INFERENCE_MODEL_MB = 256          # stima RAM per modello caricato
+SYMBOL_MEMORY_MB = 64             # stima RAM per simbolo attivo (barre, indicatori, finestre)
 SENTIMENT_MODEL_NAME = "distilbert-base-uncased-finetuned-sst-2-english"
+SENTIMENT_BATCH_SIZE = 16            # titoli per forward pass
+SENTIMENT_CACHE_TTL_SECONDS = 3600   # lo stesso titolo non viene rivalutato prima di questo
+SENTIMENT_CACHE_MAX_ITEMS = 5000
 ACTIVE_SYMBOLS_PATH  = "active/active_symbols.json"
 PHASE_BASED_FLIP_COOLDOWN_CANDLES = {
     "trending_up":   2,
@@ -151,6 +229,47 @@ DECAY_ATR_LOW_THRESHOLD = 0.5    # Below this = slower decay
 DECAY_MODIFIER_STRONG = 0.01     # How much to subtract if high ATR
 DECAY_MODIFIER_WEAK = 0.005      # How much to add if low ATR
 
+###############################
+# BROKER BACKEND
+###############################
+# "mt5"    = terminale MetaTrader5 reale
+# "replay" = FakeMT5Reader su file locali (Parquet/CSV), fill simulati
+BROKER_BACKEND = "mt5"
+REPLAY_DATA_DIR = "data/processed"   # file <SYMBOL>_<TF>.parquet|csv
+REPLAY_SPREAD_POINTS = 10
+REPLAY_SLIPPAGE_POINTS = 0
+
+###############################
+# NEWS / SENTIMENT
+###############################
+RSS_FEEDS = [
+    "https://www.cnbc.com/id/100003114/device/rss/rss.html",
+    "https://feeds.reuters.com/reuters/businessNews",
+    "https://www.forexlive.com/feed/"
+]
+
+# Parole chiave (parole intere, minuscole) → simbolo
+SYMBOL_KEYWORDS = {
+    "EURUSD": ["eur", "euro", "usd", "dollar", "ecb", "fed"],
+    "GBPUSD": ["gbp", "pound", "sterling", "boe", "bank of england", "usd", "fed"],
+    "USDCHF": ["chf", "franc", "snb", "usd", "fed"],
+    "USDJPY": ["yen", "jpy", "boj", "usd", "fed", "bank of japan"],
+    "BTCUSD": ["bitcoin", "btc", "crypto"],
+    "ETHUSD": ["ethereum", "ether", "eth", "crypto"],
+    "LTCUSD": ["litecoin", "ltc", "crypto"],
+    "XRPUSD": ["xrp", "ripple", "crypto"],
+    "DOGUSD": ["dogecoin", "doge", "crypto"],
+    "ADAUSD": ["cardano", "ada", "crypto"],
+    "GOLD": ["gold"]
+}
+
+NEWS_SERVICE_ENABLED = True
+NEWS_POLL_SECONDS = 120                   # intervallo tra due giri sui feed
+NEWS_HTTP_TIMEOUT = 10
+NEWS_SENTIMENT_HALF_LIFE_SECONDS = 7200   # peso di una notizia dimezzato ogni 2h
+NEWS_SEEN_MAX = 10000                     # id di notizie ricordati per la deduplica
+NEWS_MAX_BACKOFF_SECONDS = 3600           # attesa massima prima di riprovare un feed in errore
+
 ###############################
 # MULTI-TIMEFRAME SETTINGS FOR AI SIGNALS
 ###############################
@@ -175,6 +294,8 @@ MULTI_TIMEFRAME_LIST = [
 DEBUG_MODE = True
 TELEGRAM_NOTIFY_ON_RESTART = True
 MAX_CONSECUTIVE_FAILURES = 3
+LOOP_INTERVAL_SECONDS = 60
+FLIP_COOLDOWN_SECONDS = 300
 EQUITY_ALERT_THRESHOLD = 100  # Adjust as needed
 
 # SL/TP LOGIC
@@ -3,50 +3,46 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import telebot
 import settings
-import importlib
 from datetime import datetime
-from bot import ForexTradingBot
-from utils.sentiment_fetcher import fetch_sentiment_for
-import settings
-from logic.fusion_engine import fuse_probabilities
+from utils.control_channel import ControlClient, ControlError, control_address, control_token_path
+from utils.runtime_config import RuntimeConfig
 
 bot = telebot.TeleBot(settings.TELEGRAM_TOKEN)
-bot_instance = ForexTradingBot()
+
+# Stato e comandi passano dal bot in esecuzione (niente seconda sessione MT5 né modelli duplicati)
+control = ControlClient(control_address(settings), timeout=settings.CONTROL_TIMEOUT,
+                        token_path=control_token_path(settings))
 
 def send_message(msg):
     bot.send_message(settings.TELEGRAM_CHAT_ID, msg, parse_mode="Markdown")
 
-# Reload settings and update file
-def update_settings_file(key, value, is_string=False):
-    path = "settings.py"
-    with open(path, "r") as f:
-        lines = f.readlines()
-
-    new_lines = []
-    updated = False
-    for line in lines:
-        if line.strip().startswith(f"{key}"):
-            new_line = f"{key} = \"{value}\"\n" if is_string else f"{key} = {value}\n"
-            new_lines.append(new_line)
-            updated = True
-        else:
-            new_lines.append(line)
-
-    if not updated:
-        new_lines.append(f"{key} = {value}\n")
-
-    with open(path, "w") as f:
-        f.writelines(new_lines)
-
-    importlib.reload(settings)
-        
+def apply_settings(changes):
+    """
+    Pushes `changes` to the running bot as one config update; when the bot is
+    down they go to the runtime-config sidecar, applied at the next start.
+    settings.py is never rewritten. Returns a note for the reply.
+    """
+    try:
+        control.call("update", changes=changes, source="telegram")
+        return ""
+    except ControlError as e:
+        if control.available():
+            raise   # il bot ha rifiutato il valore
+        RuntimeConfig(settings).load().update(changes, source="telegram")
+        return f" (saved, applied at next start: {e})"
+
+
+def apply_setting(key, value):
+    return apply_settings({key: value})
+
+
 # /risk command
 @bot.message_handler(commands=['risk'])
 def set_risk(message):
     try:
         value = float(message.text.split()[1])
-        update_settings_file("RISK_PERCENT", value)
-        send_message(f"Risk percent updated to {value}")
+        note = apply_setting("RISK_PERCENT", value)
+        send_message(f"Risk percent updated to {value}{note}")
     except Exception:
         send_message("Usage: /risk 0.01")
 
@@ -55,8 +51,8 @@ def set_risk(message):
 def set_multiplier(message):
     try:
         value = float(message.text.split()[1])
-        update_settings_file("MANUAL_POSITION_MULTIPLIER", value)
-        send_message(f"Multiplier updated to {value}")
+        note = apply_setting("MANUAL_POSITION_MULTIPLIER", value)
+        send_message(f"Multiplier updated to {value}{note}")
     except Exception:
         send_message("Usage: /multiplier 1.5")
 
@@ -67,19 +63,28 @@ def set_mode(message):
         mode = message.text.split()[1].strip().lower()
         if mode not in ["normal", "conservative"]:
             raise ValueError("Invalid mode")
-        update_settings_file("STRATEGY_MODE", mode, is_string=True)
-        send_message(f"Strategy mode updated to `{mode}`")
+        note = apply_setting("STRATEGY_MODE", mode)
+        send_message(f"Strategy mode updated to `{mode}`{note}")
     except Exception:
         send_message("Usage: /mode normal OR /mode conservative")
 
 # /status command
 @bot.message_handler(commands=['status'])
 def show_status(message):
+    try:
+        st = control.call("status")
+    except ControlError as e:
+        send_message(f"*Bot Status:* offline ({e})")
+        return
+    cfg = st["settings"]
+    last = datetime.fromtimestamp(st["last_cycle_at"]).strftime("%H:%M:%S") if st["last_cycle_at"] else "-"
     status = (
-        f"*Bot Status:*\n"
-        f"- Risk: `{settings.RISK_PERCENT}`\n"
-        f"- Multiplier: `{settings.MANUAL_POSITION_MULTIPLIER}`\n"
-        f"- Mode: `{getattr(settings, 'STRATEGY_MODE', 'normal')}`\n"
+        f"*Bot Status:* {'paused' if st['paused'] else 'running'}\n"
+        f"- Equity: `{st['equity']:.2f}` | Daily PnL: `{st['daily_pnl']:.2f}`\n"
+        f"- Open positions: `{st['open_positions']}` | Last cycle: `{last}`\n"
+        f"- Risk: `{cfg['RISK_PERCENT']}`\n"
+        f"- Multiplier: `{cfg['MANUAL_POSITION_MULTIPLIER']}`\n"
+        f"- Mode: `{cfg['STRATEGY_MODE']}`\n"
     )
     send_message(status)
 
@@ -87,8 +92,8 @@ def show_status(message):
 @bot.message_handler(commands=['performance'])
 def performance_command(message):
     try:
-        stats = bot_instance.get_performance_stats()
-        if not stats:
+        stats = control.call("performance")
+        if not any(s["trades"] for s in stats.values()):
             send_message("No performance data available.")
             return
 
@@ -116,8 +121,11 @@ def performance_command(message):
 # /shutdown command
 @bot.message_handler(commands=['shutdown'])
 def shutdown_bot(message):
-    bot_instance.close_all_flag = True
-    send_message("Bot shutdown signal sent. Use `/status` to confirm.")
+    try:
+        control.call("shutdown")
+        send_message("Bot shutdown signal sent. Use `/status` to confirm.")
+    except ControlError as e:
+        send_message(f"Shutdown failed: {e}")
 
 @bot.message_handler(commands=['sentiment'])
 def sentiment_command(message):
@@ -128,8 +136,10 @@ def sentiment_command(message):
             return
 
         symbol = parts[1].upper()
-        from utils.sentiment_fetcher import fetch_sentiment_for
-        score = fetch_sentiment_for(symbol)
+        score = control.call("sentiment", symbol=symbol)
+        if score is None:   # servizio notizie spento nel bot: calcolo diretto
+            from utils.sentiment_fetcher import fetch_sentiment_for
+            score = fetch_sentiment_for(symbol)
         send_message(f"Sentiment for *{symbol}*: `{score:.2f}`")
 
     except Exception as e:
@@ -170,6 +180,8 @@ def expand_command(message):
 /sentiment EURUSD — Sentiment score for symbol.
 /retrain EURUSD — Retrain LSTM + CNN.
 /rebuild EURUSD — Regenerate CSVs and retrain.
+/models EURUSD — Model versions and validation scores.
+/rollback EURUSD lstm 3 — Activate an earlier model version.
 /weights EURUSD — Show indicator weights.
 /combo EURUSD — Show best-performing combos.
 
@@ -177,7 +189,6 @@ def expand_command(message):
 /alerts on|off — Toggle Telegram alerts.
 /health — Bot ping check.
 /ping — Test bot response.
-/reload_settings — Reload settings.py live.
 /eval 2 + 2 — Evaluate Python expression (dev only).
 """, parse_mode="Markdown")
     except Exception as e:
@@ -186,14 +197,20 @@ def expand_command(message):
 # === /pause ===
 @bot.message_handler(commands=['pause'])
 def pause_bot(message):
-    bot_instance.pause_trading = True
-    send_message("Trading paused. Open trades will continue to be managed.")
+    try:
+        control.call("pause")
+        send_message("Trading paused. Open trades will continue to be managed.")
+    except ControlError as e:
+        send_message(f"Pause failed: {e}")
 
 # === /resume ===
 @bot.message_handler(commands=['resume'])
 def resume_bot(message):
-    bot_instance.pause_trading = False
-    send_message("Trading resumed.")
+    try:
+        control.call("resume")
+        send_message("Trading resumed.")
+    except ControlError as e:
+        send_message(f"Resume failed: {e}")
 
 # === /restart ===
 @bot.message_handler(commands=['restart'])
@@ -206,37 +223,33 @@ def restart_bot(message):
 @bot.message_handler(commands=['refresh_models'])
 def refresh_models(message):
     try:
-        bot_instance.lstm_model = LSTMModel(settings.LSTM_MODEL_PATH)
-        bot_instance.cnn_model = CNNModel(settings.CNN_MODEL_PATH)
+        # i modelli vengono ricaricati dal disco al prossimo ciclo
+        control.call("refresh_models")
         send_message("Models reloaded from disk.")
     except Exception as e:
         send_message(f"Failed to reload models: {e}")
 
-# === /status ===
-@bot.message_handler(commands=['status'])
-def show_status(message):
-    status = (
-        f"*Bot Status:*\n"
-        f"- Risk: `{settings.RISK_PERCENT}`\n"
-        f"- Multiplier: `{settings.MANUAL_POSITION_MULTIPLIER}`\n"
-        f"- Mode: `{getattr(settings, 'STRATEGY_MODE', 'normal')}`\n"
-    )
-    send_message(status)
-
 # === /drawdown ===
 @bot.message_handler(commands=['drawdown'])
 def drawdown(message):
-    dd = getattr(bot_instance, 'max_drawdown', 'Not tracked')
-    send_message(f"Max Drawdown: {dd}")
+    try:
+        dd = control.call("drawdown")
+        send_message(f"Max Drawdown: {dd['max_drawdown']:.2%} (current {dd['drawdown']:.2%})")
+    except ControlError as e:
+        send_message(f"Drawdown unavailable: {e}")
 
 # === /open_trades ===
 @bot.message_handler(commands=['open_trades'])
 def open_trades(message):
-    positions = mt5.positions_get()
+    try:
+        positions = control.call("positions")
+    except ControlError as e:
+        send_message(f"Open trades unavailable: {e}")
+        return
     if not positions:
         send_message("No open trades.")
         return
-    summary = "\n".join([f"{p.symbol} | {p.volume} lots | {'BUY' if p.type==0 else 'SELL'} @ {p.price_open}" for p in positions])
+    summary = "\n".join([f"{p['symbol']} | {p['size']} lots | {p['direction']} @ {p['entry']}" for p in positions])
     send_message(f"Open Trades:\n{summary}")
 
 # === /flipcooldown ===
@@ -244,8 +257,8 @@ def open_trades(message):
 def flipcooldown(message):
     try:
         value = int(message.text.split()[1])
-        update_settings_file("FLIP_COOLDOWN_SECONDS", value)
-        send_message(f"Flip cooldown updated to {value} seconds.")
+        note = apply_setting("FLIP_COOLDOWN_SECONDS", value)
+        send_message(f"Flip cooldown updated to {value} seconds.{note}")
     except:
         send_message("Usage: /flipcooldown 300")
 
@@ -261,10 +274,9 @@ def update_thresholds(message):
         short_thres = float(parts[1])
         long_thres = float(parts[2])
 
-        update_settings_file("SHORT_THRESHOLD", short_thres)
-        update_settings_file("LONG_THRESHOLD", long_thres)
+        note = apply_settings({"SHORT_THRESHOLD": short_thres, "LONG_THRESHOLD": long_thres})
 
-        send_message(f"Thresholds aggiornati:\n- SHORT: `{short_thres}`\n- LONG: `{long_thres}`")
+        send_message(f"Thresholds aggiornati:\n- SHORT: `{short_thres}`\n- LONG: `{long_thres}`{note}")
     except Exception as e:
         send_message(f"Errore durante l'aggiornamento: {e}")
 
@@ -275,8 +287,10 @@ def trailconfig(message):
         parts = message.text.split()
         phase = parts[1]
         value = float(parts[2])
-        settings.TRAILING_CONFIG[phase]['base_stop_factor'] = value
-        send_message(f"Trailing config updated for {phase} to {value}")
+        if phase not in settings.TRAILING_CONFIG:
+            raise KeyError(phase)
+        note = apply_setting("TRAILING_CONFIG", {phase: {"base_stop_factor": value}})
+        send_message(f"Trailing config updated for {phase} to {value}{note}")
     except:
         send_message("Usage: /trailconfig trend_up 2.0")
 
@@ -290,8 +304,8 @@ def riskmode_toggle(message):
                 return
 
             mode = parts[1].lower()
-            update_settings_file("ENABLE_DAILY_LOSS_LIMIT", mode == "on")
-            send_message(f"Daily loss limit {'abilitato' if mode == 'on' else 'disabilitato'}")
+            note = apply_setting("ENABLE_DAILY_LOSS_LIMIT", mode == "on")
+            send_message(f"Daily loss limit {'abilitato' if mode == 'on' else 'disabilitato'}{note}")
     except Exception as e:
             send_message(f"Errore: {e}")
 
@@ -305,8 +319,8 @@ def toggle_boost(message):
             return
 
         mode = parts[1].lower()
-        update_settings_file("ENABLE_COMBO_CONFIDENCE_BOOST", mode == "on")
-        send_message(f"Combo boost {'abilitato' if mode == 'on' else 'disabilitato'}.")
+        note = apply_setting("ENABLE_COMBO_CONFIDENCE_BOOST", mode == "on")
+        send_message(f"Combo boost {'abilitato' if mode == 'on' else 'disabilitato'}.{note}")
     except Exception as e:
         send_message(f"Errore: {e}")
 
@@ -315,9 +329,8 @@ def toggle_boost(message):
 def retrain_model(message):
     try:
         symbol = message.text.split()[1].upper()
-        bot_instance.lstm_model.retrain(symbol)
-        bot_instance.cnn_model.retrain(symbol)
-        send_message(f"Retraining triggered for {symbol}")
+        control.call("retrain", symbol=symbol)
+        send_message(f"Retraining queued for {symbol}")
     except Exception as e:
         send_message(f"Retrain failed: {e}")
 
@@ -326,29 +339,61 @@ def retrain_model(message):
 def rebuild(message):
     try:
         symbol = message.text.split()[1].upper()
-        from utils.training_data_builder import build_from_symbol
-        build_from_symbol(symbol)
-        bot_instance.lstm_model.retrain(symbol)
-        bot_instance.cnn_model.retrain(symbol)
-        send_message(f"Rebuilt data and retrained for {symbol}")
+        control.call("retrain", symbol=symbol, rebuild=True)
+        send_message(f"Rebuilding data for {symbol}, retraining queued")
     except Exception as e:
         send_message(f"Rebuild failed: {e}")
 
+# === /models ===
+@bot.message_handler(commands=['models'])
+def model_versions(message):
+    try:
+        symbol = message.text.split()[1].upper()
+        lines = []
+        versions = control.call("models", symbol=symbol)
+        current = control.call("current_models", symbol=symbol)
+        for kind in ("lstm", "cnn"):
+            active = current[kind]
+            for v in versions[kind]:
+                mark = "*" if active and v["version"] == active["version"] else " "
+                score = v.get("val_accuracy")
+                created = datetime.fromtimestamp(v["created"]).strftime("%Y-%m-%d %H:%M")
+                lines.append(f"{mark} {kind} v{v['version']} {created}"
+                             + (f" val_acc={score:.3f}" if score is not None else ""))
+        send_message("\n".join(lines) if lines else f"No models registered for {symbol}")
+    except Exception as e:
+        send_message(f"Errore: {e}")
+
+# === /rollback ===
+@bot.message_handler(commands=['rollback'])
+def rollback_model(message):
+    try:
+        _, symbol, kind, version = message.text.split()
+        control.call("rollback", symbol=symbol.upper(), kind=kind.lower(), version=int(version))
+        send_message(f"{symbol.upper()} {kind.lower()} → v{version}")
+    except Exception as e:
+        send_message(f"Rollback failed: {e}")
+
 # === /weights ===
 @bot.message_handler(commands=['weights'])
 def weights(message):
-    symbol = message.text.split()[1].upper()
-    weights = bot_instance.strategy_manager.indicators_by_symbol.get(symbol, {})
-    send_message(f"Weights for {symbol}:\n{weights}")
+    try:
+        symbol = message.text.split()[1].upper()
+        weights = control.call("weights", symbol=symbol)
+        send_message(f"Weights for {symbol}:\n{weights}")
+    except Exception as e:
+        send_message(f"Errore: {e}")
 
 # === /combo ===
 @bot.message_handler(commands=['combo'])
 def combo(message):
-    from utils.indicator_analysis import learn_indicator_combos
-    symbol = message.text.split()[1].upper()
-    combos = learn_indicator_combos(symbol)
-    output = "\n".join([f"{combo}: {pnl:.2f}" for combo, pnl in combos.items()])
-    send_message(f"Top combos for {symbol}:\n{output}")
+    try:
+        symbol = message.text.split()[1].upper()
+        combos = control.call("combos", symbol=symbol)
+        output = "\n".join([f"{combo}: {pnl:.2f}" for combo, pnl in combos.items()])
+        send_message(f"Top combos for {symbol}:\n{output}")
+    except Exception as e:
+        send_message(f"Errore: {e}")
 
 # === /alerts ===
 @bot.message_handler(commands=['alerts'])
@@ -360,15 +405,18 @@ def alerts_toggle(message):
             return
 
         mode = parts[1].lower()
-        update_settings_file("ALERTS_ENABLED", mode == "on")
-        send_message(f"Alerts {'enabled' if mode == 'on' else 'disabled'}.")
+        note = apply_setting("ALERTS_ENABLED", mode == "on")
+        send_message(f"Alerts {'enabled' if mode == 'on' else 'disabled'}.{note}")
     except Exception as e:
         send_message(f"Errore nella modifica degli alert: {e}")
 
 # === /health ===
 @bot.message_handler(commands=['health'])
 def health(message):
-    send_message("Bot is alive and responding.")
+    if control.available():
+        send_message("Bot is alive and responding.")
+    else:
+        send_message("Bot is not responding on the control channel.")
 
 # === /ping ===
 @bot.message_handler(commands=['ping'])
@@ -401,8 +449,8 @@ def set_execution_tf(message):
             send_message(f"Invalid label: {new_tf}. Must be one of: {', '.join(valid_labels)}")
             return
 
-        update_settings_file("EXECUTION_TF_LABEL", f'"{new_tf}"', is_string=True)
-        send_message(f"Execution timeframe set to *{new_tf}*")
+        note = apply_setting("EXECUTION_TF_LABEL", new_tf)
+        send_message(f"Execution timeframe set to *{new_tf}*{note}")
 
     except Exception as e:
         send_message(f"Failed to update execution TF: {e}")
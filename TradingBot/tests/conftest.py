@@ -0,0 +1,18 @@
+# tests/conftest.py
+
+"""
+Shared test setup. TradingBot modules use absolute imports (the bot runs
+from its own folder), so the folder goes on sys.path; the log file goes to
+a temporary directory instead of logs/ in the working tree.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import settings  # noqa: E402
+
+settings.LOG_FILE = os.path.join(tempfile.mkdtemp(prefix="tradingbot-tests-"), "bot.jsonl")
+settings.LOG_CONSOLE = False
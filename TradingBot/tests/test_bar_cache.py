@@ -0,0 +1,136 @@
+# tests/test_bar_cache.py
+
+"""BarRing wraparound and BarCache delta refreshes against the replay broker."""
+
+import numpy as np
+import pytest
+
+from data_sources import broker
+from data_sources.bar_cache import BarCache, BarRing
+from data_sources.fake_mt5_reader import RATES_DTYPE, TIMEFRAME_M5, FakeMT5Reader
+
+SYMBOL = "EURUSD"
+START = 300 * 5_666_666      # allineato alle barre M5
+BARS = 3000
+
+
+class CountingBroker(FakeMT5Reader):
+    """Logs copy_rates_from_pos counts; with `forming` appends the open bar like real MT5."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.requests = []
+        self.forming = False
+        self.forming_close = 1.0
+
+    def copy_rates_from_pos(self, symbol, timeframe, start_pos, count):
+        self.requests.append(count)
+        closed = super().copy_rates_from_pos(symbol, timeframe, start_pos, count)
+        if not self.forming:
+            return closed
+        bar = np.zeros(1, dtype=RATES_DTYPE)
+        bar["time"] = self.now - self.now % 300
+        bar["close"] = self.forming_close
+        return np.concatenate([closed, bar])[-count:]
+
+
+def rows(times):
+    out = np.zeros(len(times), dtype=RATES_DTYPE)
+    out["time"] = times
+    out["close"] = times
+    return out
+
+
+@pytest.fixture
+def fake(tmp_path):
+    fake = CountingBroker(data_dir=str(tmp_path), start=START + 300 * 1000)
+    data = rows(START + 300 * np.arange(BARS))
+    data["close"] = np.arange(BARS, dtype="float64")
+    fake.load_rates(SYMBOL, TIMEFRAME_M5, data)
+    previous = broker._backend
+    broker.set_broker(fake)
+    yield fake
+    broker.set_broker(previous)
+
+
+def closed_bars(fake, n):
+    return FakeMT5Reader.copy_rates_from_pos(fake, SYMBOL, TIMEFRAME_M5, 0, n)
+
+
+def test_ring_wraps_and_latest_is_a_contiguous_read_only_view():
+    ring = BarRing(5, RATES_DTYPE)
+    ring.extend(rows([1, 2, 3]))
+    ring.extend(rows([4, 5, 6, 7]))
+    view = ring.latest(5)
+
+    assert view["time"].tolist() == [3, 4, 5, 6, 7]
+    assert ring.last_time == 7 and len(ring) == 5
+    assert np.shares_memory(view, ring.buf)
+    with pytest.raises(ValueError):
+        view["close"][0] = 0
+
+    ring.extend(rows(range(10, 22)))            # più righe della capacità: restano le ultime
+    assert ring.latest(10)["time"].tolist() == [17, 18, 19, 20, 21]
+
+
+def test_ring_truncate_drops_the_newest_rows():
+    ring = BarRing(4, RATES_DTYPE)
+    ring.extend(rows([1, 2, 3, 4, 5]))
+    ring.truncate_from(4)
+    assert ring.latest(4)["time"].tolist() == [2, 3]
+    ring.extend(rows([4, 5]))
+    assert ring.latest(4)["time"].tolist() == [2, 3, 4, 5]
+
+
+def test_refresh_fetches_only_the_new_bars(fake, monkeypatch):
+    monkeypatch.setattr("settings.BAR_CACHE_DELTA_BARS", 4)
+    cache = BarCache(capacity=200, ttl=0)
+    first = cache.get(SYMBOL, TIMEFRAME_M5, 100)
+    assert fake.requests == [200]
+    np.testing.assert_array_equal(first, closed_bars(fake, 100))
+
+    fake.advance(3 * 300)
+    latest = cache.get(SYMBOL, TIMEFRAME_M5, 100)
+    assert fake.requests[1:] == [4]
+    np.testing.assert_array_equal(latest, closed_bars(fake, 100))
+
+    fake.advance(10 * 300)                      # 4 e 8 non bastano a sovrapporsi: raddoppia
+    fake.requests.clear()
+    np.testing.assert_array_equal(cache.get(SYMBOL, "M5", 150), closed_bars(fake, 150))
+    assert fake.requests == [4, 8, 16]
+
+
+def test_gap_longer_than_the_buffer_reloads(fake):
+    cache = BarCache(capacity=50, ttl=0)
+    cache.get(SYMBOL, TIMEFRAME_M5, 50)
+    fake.advance(500 * 300)
+    fake.requests.clear()
+
+    np.testing.assert_array_equal(cache.get(SYMBOL, TIMEFRAME_M5, 50), closed_bars(fake, 50))
+    assert fake.requests[-1] == 50
+
+
+def test_forming_bar_is_overwritten(fake):
+    fake.forming = True
+    cache = BarCache(capacity=100, ttl=0)
+    assert cache.get(SYMBOL, TIMEFRAME_M5, 10)["close"][-1] == 1.0
+
+    fake.forming_close = 2.0
+    bars = cache.get(SYMBOL, TIMEFRAME_M5, 10)
+    assert bars["close"][-1] == 2.0
+    assert np.all(np.diff(bars["time"]) == 300)   # nessuna barra duplicata
+
+
+def test_ttl_and_invalidate(fake):
+    cache = BarCache(capacity=100, ttl=60)
+    cache.get(SYMBOL, TIMEFRAME_M5, 50)
+    fake.advance(300)
+    cache.get(SYMBOL, TIMEFRAME_M5, 50)
+    assert fake.requests == [100]               # entro il ttl: nessuna richiesta
+
+    cache.get(SYMBOL, TIMEFRAME_M5, 300)        # più barre della capacità: ricarica
+    assert fake.requests[-1] == 300
+
+    cache.invalidate(SYMBOL)
+    cache.get(SYMBOL, TIMEFRAME_M5, 50)
+    assert fake.requests[-1] == 100
@@ -0,0 +1,52 @@
+# tests/test_logger.py
+
+"""Size rotation of utils.logger.LogWriter, including a rotation that fails."""
+
+import json
+import logging
+import os
+import queue
+
+from utils.logger import LogWriter
+
+
+def records(n, start=0):
+    return [logging.LogRecord("tradingbot.Test", logging.INFO, __file__, 0, f"msg {i}", None, None)
+            for i in range(start, start + n)]
+
+
+def messages(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["msg"] for line in f]
+
+
+def writer(tmp_path, **kwargs):
+    return LogWriter(queue.Queue(), str(tmp_path / "logs" / "bot.jsonl"), console=False, **kwargs)
+
+
+def test_rotates_on_size_and_keeps_backups(tmp_path):
+    w = writer(tmp_path, max_bytes=1, backups=2)
+    for i in range(4):
+        w._write(records(1, i))
+    assert messages(w.path) == ["msg 3"]
+    assert messages(w.path + ".1") == ["msg 2"]
+    assert messages(w.path + ".2") == ["msg 1"]
+    assert not os.path.exists(w.path + ".3")
+
+
+def test_failed_rotation_keeps_writing_to_the_same_file(tmp_path, monkeypatch, capsys):
+    w = writer(tmp_path, max_bytes=1, backups=2)
+    w._write(records(1))
+
+    def locked(src, dst):
+        raise PermissionError(13, "file in uso", src)
+
+    monkeypatch.setattr(os, "replace", locked)
+    w._write(records(1, 1))
+    assert "rotazione" in capsys.readouterr().err
+    assert not w._file.closed
+
+    monkeypatch.undo()
+    w._write(records(1, 2))
+    assert messages(w.path + ".1") == ["msg 0", "msg 1"]
+    assert messages(w.path) == ["msg 2"]
@@ -0,0 +1,129 @@
+# tests/test_model_export.py
+
+"""
+Model export checks. The converter choice (builtin ops first, Select TF ops
+as fallback) and parity()/benchmark() run everywhere, with a stand-in
+converter and numpy models; the end-to-end TFLite export of a tiny Keras
+LSTM runs only where TensorFlow is installed.
+"""
+
+import os
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from models import model_export
+from models.model_runtime import RUNTIMES
+
+BUILTINS, SELECT_TF_OPS = "TFLITE_BUILTINS", "SELECT_TF_OPS"
+
+
+class FakeConverter:
+    """TFLiteConverter stand-in: fails without Select TF ops when `needs_flex`."""
+
+    created = []
+
+    def __init__(self, needs_flex):
+        self.needs_flex = needs_flex
+        self.target_spec = types.SimpleNamespace(supported_ops=None, supported_types=None)
+        self.optimizations = None
+        FakeConverter.created.append(self)
+
+    def convert(self):
+        if self.needs_flex and SELECT_TF_OPS not in self.target_spec.supported_ops:
+            raise RuntimeError("ops not supported by TFLite builtins: TensorListReserve")
+        return b"flex" if SELECT_TF_OPS in self.target_spec.supported_ops else b"builtins"
+
+
+def fake_tensorflow(monkeypatch, needs_flex):
+    FakeConverter.created = []
+    lite = types.SimpleNamespace(
+        TFLiteConverter=types.SimpleNamespace(from_keras_model=lambda model: FakeConverter(needs_flex)),
+        OpsSet=types.SimpleNamespace(TFLITE_BUILTINS=BUILTINS, SELECT_TF_OPS=SELECT_TF_OPS),
+        Optimize=types.SimpleNamespace(DEFAULT="DEFAULT"),
+    )
+    monkeypatch.setitem(sys.modules, "tensorflow", types.SimpleNamespace(lite=lite, float16="float16"))
+
+
+class Linear:
+    """predict_on_batch as softmax(x·W), the only method parity/benchmark use."""
+
+    def __init__(self, weights, noise=0.0):
+        self.weights = weights
+        self.noise = noise
+
+    def predict_on_batch(self, batch):
+        logits = batch.reshape(len(batch), -1) @ self.weights + self.noise
+        e = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return e / e.sum(axis=1, keepdims=True)
+
+
+def test_tflite_uses_builtin_ops_when_possible(monkeypatch):
+    fake_tensorflow(monkeypatch, needs_flex=False)
+    model = types.SimpleNamespace(name="cnn")
+
+    assert model_export._tflite_bytes(model, None) == b"builtins"
+    converter, = FakeConverter.created
+    assert converter.target_spec.supported_ops == [BUILTINS]
+    assert not hasattr(converter, "_experimental_lower_tensor_list_ops")
+
+
+def test_tflite_falls_back_to_select_tf_ops(monkeypatch):
+    fake_tensorflow(monkeypatch, needs_flex=True)
+    model = types.SimpleNamespace(name="lstm")
+
+    assert model_export._tflite_bytes(model, "float16") == b"flex"
+    builtins, flex = FakeConverter.created
+    assert builtins.target_spec.supported_ops == [BUILTINS]
+    assert flex.target_spec.supported_ops == [BUILTINS, SELECT_TF_OPS]
+    assert flex._experimental_lower_tensor_list_ops is False
+    assert flex.optimizations == ["DEFAULT"] and flex.target_spec.supported_types == ["float16"]
+
+
+def test_parity_and_benchmark():
+    rng = np.random.default_rng(0)
+    windows = rng.normal(size=(16, 8, 4)).astype("float32")
+    reference = Linear(rng.normal(size=(32, 3)))
+
+    same = model_export.parity(reference, Linear(reference.weights), windows)
+    assert same == {"max_abs_diff": 0.0, "argmax_agreement": 1.0}
+    shifted = model_export.parity(reference, Linear(reference.weights, noise=np.array([5.0, 0.0, 0.0])), windows)
+    assert shifted["max_abs_diff"] > model_export.PARITY_TOLERANCE["int8"]
+    assert shifted["argmax_agreement"] < 1.0
+
+    latency = model_export.benchmark(reference, windows, batch_sizes=(1, 8), repeats=5)
+    assert set(latency) == {1, 8}
+    for timings in latency.values():
+        assert 0 < timings["p50_ms"] <= timings["p95_ms"]
+
+
+@pytest.fixture(scope="module")
+def keras_model():
+    tf = pytest.importorskip("tensorflow")
+    model = tf.keras.Sequential([
+        tf.keras.Input(shape=(8, 4)),
+        tf.keras.layers.LSTM(6),
+        tf.keras.layers.Dense(3, activation="softmax"),
+    ])
+    model.compile(optimizer="adam", loss="categorical_crossentropy")
+    return model
+
+
+def test_tflite_export_parity_and_benchmark(keras_model, tmp_path):
+    target = model_export.export_model(str(tmp_path / "v0001.h5"), backend="tflite", quantize=None,
+                                       model=keras_model)
+    assert target.endswith(".tflite") and os.path.getsize(target) > 0
+    runtime_model = RUNTIMES["tflite"](target)
+
+    windows = model_export.sample_windows(keras_model, n=16)
+    assert windows.shape == (16, 8, 4)
+    report = model_export.parity(keras_model, runtime_model, windows)
+    assert report["max_abs_diff"] <= model_export.PARITY_TOLERANCE[None]
+    assert report["argmax_agreement"] == 1.0
+
+    latency = model_export.benchmark(runtime_model, windows, batch_sizes=(1, 8), repeats=5)
+    assert set(latency) == {1, 8}
+    for timings in latency.values():
+        assert 0 < timings["p50_ms"] <= timings["p95_ms"]
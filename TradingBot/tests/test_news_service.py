@@ -0,0 +1,169 @@
+# tests/test_news_service.py
+
+"""NewsSentimentService against fixture feeds served by http.server on localhost."""
+
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.news_service import NewsSentimentService, parse_feed
+
+RSS = """<?xml version="1.0"?>
+<rss version="2.0"><channel><title>fixture</title>
+{items}
+</channel></rss>"""
+ITEM = "<item><guid>{guid}</guid><title>{title}</title><pubDate>{date}</pubDate></item>"
+DATE = "Mon, 06 Jan 2025 10:00:00 GMT"
+
+ATOM = b"""<?xml version="1.0"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <entry><id>tag:1</id><title>ECB holds rates</title><updated>2025-01-06T10:00:00Z</updated>
+    <link href="https://example.com/1"/></entry>
+</feed>"""
+
+
+class FeedServer:
+    """Serves `self.feeds[path] = (etag, body)`; 304 on a matching If-None-Match."""
+
+    def __init__(self):
+        self.feeds = {}
+        self.errors = {}       # path -> (status, headers)
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append((self.path, self.headers.get("If-None-Match")))
+                if self.path in server.errors:
+                    status, headers = server.errors[self.path]
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    return
+                etag, body = server.feeds[self.path]
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "application/rss+xml")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}{path}"
+
+    def publish(self, path, etag, items):
+        date = formatdate(time.time() - 60, usegmt=True)   # notizie fresche: peso quasi pieno
+        body = RSS.format(items="\n".join(ITEM.format(guid=g, title=t, date=date) for g, t in items))
+        self.feeds[path] = (etag, body.encode("utf-8"))
+
+    def hits(self, path):
+        return [inm for p, inm in self.requests if p == path]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    server = FeedServer()
+    yield server
+    server.close()
+
+
+def scorer(texts):
+    return [1.0 if "rises" in t else -1.0 for t in texts]
+
+
+def service(urls, **kwargs):
+    return NewsSentimentService(
+        feeds=urls, symbol_keywords={"EURUSD": ["euro", "ecb"], "USDJPY": ["yen", "bank of japan"]},
+        poll_interval=60, half_life=3600, scorer=scorer, timeout=2, seen_max=100, **kwargs)
+
+
+def test_parse_feed_rss_and_atom():
+    rss = RSS.format(items=ITEM.format(guid="a1", title="Euro rises", date=DATE)).encode()
+    assert parse_feed(rss) == [{"id": "a1", "title": "Euro rises", "published": 1736157600.0}]
+    entry, = parse_feed(ATOM)
+    assert entry["id"] == "tag:1" and entry["title"] == "ECB holds rates"
+    assert entry["published"] == 1736157600.0
+
+
+def test_poll_matches_symbols_and_scores(server):
+    server.publish("/fx", '"v1"', [("a1", "Euro rises after ECB meeting"),
+                                   ("a2", "Bank of Japan cuts forecasts"),
+                                   ("a3", "Oil prices flat")])
+    news = service([server.url("/fx")])
+
+    assert news.poll_once() == 2
+    assert news.score("EURUSD") == pytest.approx(1.0, abs=0.05)
+    assert news.score("USDJPY") == pytest.approx(-1.0, abs=0.05)
+    assert news.score("GBPUSD") == 0.0
+    assert news.latest_text("EURUSD") == "Euro rises after ECB meeting"
+
+
+def test_conditional_get_and_deduplication(server):
+    server.publish("/fx", '"v1"', [("a1", "Euro rises")])
+    news = service([server.url("/fx")])
+    assert news.poll_once() == 1
+
+    assert news.poll_once() == 0                      # stesso ETag → 304, niente parsing
+    assert server.hits("/fx") == [None, '"v1"']
+    assert news.stats["not_modified"] == 1
+
+    server.publish("/fx", '"v2"', [("a1", "Euro rises"), ("a4", "Euro slips")])
+    assert news.poll_once() == 1                      # solo la notizia nuova
+    assert news.stats["new_entries"] == 2
+    assert news.latest_text("EURUSD") == "Euro slips"
+    assert news.score("EURUSD") == pytest.approx(0.0, abs=0.05)
+
+
+def test_failing_feed_is_backed_off(server):
+    server.publish("/fx", '"v1"', [("a1", "Euro rises")])
+    server.errors["/down"] = (503, {})
+    news = service([server.url("/fx"), server.url("/down")])
+    news.poll_interval = 0.2
+
+    assert news.poll_once() == 1                      # il feed sano non risente dell'errore
+    assert news.stats["errors"] == 1
+    news.poll_once()
+    assert len(server.hits("/down")) == 1             # in backoff: nessuna richiesta
+    assert news.stats["backed_off"] == 1
+
+    time.sleep(0.25)
+    news.poll_once()
+    assert len(server.hits("/down")) == 2             # riprovato, ora attende 0.4s
+    news.poll_once()
+    assert len(server.hits("/down")) == 2
+
+    del server.errors["/down"]
+    server.publish("/down", '"d1"', [("b1", "Yen rises")])
+    time.sleep(0.45)
+    assert news.poll_once() == 1
+    assert server.url("/down") not in news._backoff
+
+
+def test_retry_after_extends_the_backoff(server):
+    server.errors["/busy"] = (429, {"Retry-After": "120"})
+    news = service([server.url("/busy")], max_backoff=30)
+    news.poll_interval = 0.01
+
+    news.poll_once()
+    failures, retry_at = news._backoff[server.url("/busy")]
+    assert failures == 1
+    assert retry_at - time.time() > 100
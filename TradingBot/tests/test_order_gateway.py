@@ -0,0 +1,160 @@
+# tests/test_order_gateway.py
+
+"""OrderGateway against the replay broker (FakeMT5Reader)."""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from data_sources import broker
+from data_sources.fake_mt5_reader import (
+    DEAL_ENTRY_IN, ORDER_FILLING_IOC, ORDER_TIME_GTC, ORDER_TYPE_BUY, RATES_DTYPE,
+    TIMEFRAME_M5, TRADE_ACTION_DEAL, TRADE_ACTION_SLTP, FakeMT5Reader,
+)
+from execution.order_gateway import OrderGateway, succeeded
+
+SYMBOL = "EURUSD"
+
+
+class ScriptedBroker(FakeMT5Reader):
+    """FakeMT5Reader with hooks around order_send: call log, delay, lost replies, a gate."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = []
+        self.delay = 0.0
+        self.lose_replies = 0
+        self.gate = None
+        self.active = 0
+        self.max_active = 0
+        self._count_lock = threading.Lock()
+
+    def order_send(self, request):
+        with self._count_lock:
+            self.calls.append(dict(request))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if self.gate is not None:
+                self.gate.wait(5)
+            if self.delay:
+                time.sleep(self.delay)
+            result = super().order_send(request)
+            with self._count_lock:
+                lost, self.lose_replies = self.lose_replies > 0, max(self.lose_replies - 1, 0)
+            return None if lost else result
+        finally:
+            with self._count_lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def fake(tmp_path):
+    fake = ScriptedBroker(data_dir=str(tmp_path), spread_points=10)
+    bars = np.zeros(50, dtype=RATES_DTYPE)
+    bars["time"] = 1_700_000_000 + 300 * np.arange(50)
+    bars["open"] = bars["high"] = bars["low"] = bars["close"] = 1.10000
+    fake.load_rates(SYMBOL, TIMEFRAME_M5, bars)
+    previous = broker._backend
+    broker.set_broker(fake)
+    yield fake
+    broker.set_broker(previous)
+
+
+@pytest.fixture
+def gateway():
+    gateway = OrderGateway(workers=4, max_in_flight=8, max_retries=2, backoff=0.0)
+    yield gateway
+    gateway.stop(wait=True)
+
+
+def buy(price=None, deviation=10):
+    return {
+        "action": TRADE_ACTION_DEAL, "symbol": SYMBOL, "volume": 0.1, "type": ORDER_TYPE_BUY,
+        "price": price, "deviation": deviation, "magic": 7, "comment": "test",
+        "type_time": ORDER_TIME_GTC, "type_filling": ORDER_FILLING_IOC,
+    }
+
+
+def open_position(fake):
+    tick = fake.symbol_info_tick(SYMBOL)
+    return fake.order_send(buy(tick.ask)).order
+
+
+def set_sl(ticket, sl):
+    return {"action": TRADE_ACTION_SLTP, "symbol": SYMBOL, "position": ticket, "sl": sl, "tp": 0.0}
+
+
+def entries(fake):
+    return [d for d in fake.history_deals_get() if d.entry == DEAL_ENTRY_IN]
+
+
+def test_requote_is_repriced_and_retried(fake, gateway):
+    stale = fake.symbol_info_tick(SYMBOL).ask - 0.0050   # 500 punti: oltre la deviation
+    result = gateway.send(buy(stale), timeout=5)
+
+    assert succeeded(result)
+    assert len(fake.calls) == 2
+    assert fake.calls[0]["price"] == pytest.approx(stale)
+    assert fake.calls[1]["price"] == pytest.approx(fake.symbol_info_tick(SYMBOL).ask)
+    assert len(entries(fake)) == 1
+
+
+def test_lost_reply_is_recovered_without_a_second_fill(fake, gateway):
+    fake.lose_replies = 1
+    result = gateway.send(buy(fake.symbol_info_tick(SYMBOL).ask), timeout=5)
+
+    assert succeeded(result)
+    assert result.comment == "Recovered from history"
+    assert len(fake.calls) == 1
+    assert len(entries(fake)) == 1
+    assert len(fake.positions_get()) == 1
+
+
+def test_requests_on_one_ticket_run_in_order(fake, gateway):
+    ticket = open_position(fake)
+    fake.calls.clear()
+    fake.delay = 0.01
+    stops = [1.0900 + i * 0.0001 for i in range(6)]
+    futures = [gateway.submit(set_sl(ticket, sl)) for sl in stops]
+
+    assert all(succeeded(f.result(5)) for f in futures)
+    assert [c["sl"] for c in fake.calls] == stops
+    assert fake.max_active == 1
+    assert fake.positions_get(ticket=ticket)[0].sl == pytest.approx(stops[-1])
+
+
+def test_different_tickets_run_concurrently(fake, gateway):
+    tickets = [open_position(fake) for _ in range(4)]
+    fake.calls.clear()
+    fake.delay = 0.2
+    started = time.perf_counter()
+    futures = [gateway.submit(set_sl(ticket, 1.09)) for ticket in tickets]
+
+    assert all(succeeded(f.result(5)) for f in futures)
+    assert fake.max_active > 1
+    assert time.perf_counter() - started < 0.2 * len(tickets)
+
+
+def test_submit_waits_when_max_in_flight_is_reached(fake):
+    tickets = [open_position(fake) for _ in range(3)]
+    fake.gate = threading.Event()
+    gateway = OrderGateway(workers=1, max_in_flight=2, max_retries=0, backoff=0.0)
+    try:
+        first = [gateway.submit(set_sl(ticket, 1.09)) for ticket in tickets[:2]]
+        third = []
+        waiter = threading.Thread(target=lambda: third.append(gateway.submit(set_sl(tickets[2], 1.09))))
+        waiter.start()
+        waiter.join(0.3)
+        assert waiter.is_alive() and not third     # terza richiesta ferma in submit()
+        assert gateway.pending() == 2
+
+        fake.gate.set()
+        waiter.join(5)
+        assert not waiter.is_alive()
+        assert all(succeeded(f.result(5)) for f in first + third)
+    finally:
+        fake.gate.set()
+        gateway.stop(wait=True)
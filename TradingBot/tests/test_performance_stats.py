@@ -0,0 +1,114 @@
+# tests/test_performance_stats.py
+
+"""Sliding-window statistics, drawdown and persistence of utils.performance_stats."""
+
+import csv
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from utils.performance_stats import DrawdownTracker, PerformanceStats
+
+WINDOWS = {"1h": 3600, "1d": 86400, "7d": 7 * 86400}
+
+
+def stats(tmp_path, **kwargs):
+    return PerformanceStats(path=str(tmp_path / "performance_stats.json"), windows=WINDOWS,
+                            save_interval=kwargs.pop("save_interval", 3600), **kwargs)
+
+
+def brute_force(trades, now, seconds):
+    inside = [p for ts, p in trades if ts > now - seconds]
+    n = len(inside)
+    return {
+        "trades": n,
+        "win_rate": round(sum(p > 0 for p in inside) / n * 100, 2) if n else 0,
+        "avg_profit": round(sum(inside) / n, 2) if n else 0,
+        "total_pnl": round(sum(inside), 2),
+    }
+
+
+def test_windows_match_a_full_rescan(tmp_path):
+    now = time.time()
+    rng = np.random.default_rng(0)
+    trades = sorted(zip(now - rng.uniform(0, 10 * 86400, 300), rng.normal(0, 20, 300).round(2)))
+    perf = stats(tmp_path)
+    for ts, profit in trades:
+        perf.record_trade(profit, ts=ts)
+
+    for later in (0, 1800, 86400, 3 * 86400):
+        summary = perf.summary(now=now + later)
+        for name, seconds in WINDOWS.items():
+            expected = brute_force(trades, now + later, seconds)
+            assert summary[name]["trades"] == expected["trades"]
+            assert summary[name]["win_rate"] == expected["win_rate"]
+            assert summary[name]["total_pnl"] == pytest.approx(expected["total_pnl"], abs=0.011)
+
+
+def test_trades_expire_from_each_window(tmp_path):
+    now = time.time()
+    perf = stats(tmp_path)
+    perf.record_trade(10.0, ts=now - 7200)
+    perf.record_trade(-4.0, ts=now - 60)
+
+    summary = perf.summary(now=now)
+    assert summary["1h"] == {"trades": 1, "win_rate": 0.0, "avg_profit": -4.0, "total_pnl": -4.0}
+    assert summary["1d"] == {"trades": 2, "win_rate": 50.0, "avg_profit": 3.0, "total_pnl": 6.0}
+
+    summary = perf.summary(now=now + 3600)
+    assert summary["1h"] == {"trades": 0, "win_rate": 0, "avg_profit": 0, "total_pnl": 0.0}
+    assert summary["1d"]["trades"] == 2
+    assert perf.summary(now=now + 86400)["1d"]["trades"] == 0
+    assert perf.summary(now=now + 86400)["7d"]["trades"] == 2
+
+
+def test_drawdown_tracks_peak_and_worst_drop():
+    dd = DrawdownTracker()
+    for equity in (1000, 1100, 990, 1050, 1200, 1140):
+        dd.update(equity)
+    assert dd.peak == 1200
+    assert dd.drawdown == pytest.approx(0.05)
+    assert dd.max_drawdown == pytest.approx(0.1)
+
+
+def test_csv_bootstrap_then_reload_from_saved_state(tmp_path):
+    now = datetime.now().timestamp()
+    log = tmp_path / "trade_logs.csv"
+    with open(log, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["timestamp", "symbol", "profit"])
+        writer.writeheader()
+        for age, profit in ((600, "12.5"), (2 * 86400, "-3"), (30 * 86400, "99"), (60, "not a number")):
+            stamp = datetime.fromtimestamp(now - age).strftime("%Y-%m-%d %H:%M:%S")
+            writer.writerow({"timestamp": stamp, "symbol": "EURUSD", "profit": profit})
+
+    perf = stats(tmp_path).load(csv_path=str(log))
+    summary = perf.summary()
+    assert summary["1h"]["trades"] == 1
+    assert summary["7d"] == {"trades": 2, "win_rate": 50.0, "avg_profit": 4.75, "total_pnl": 9.5}
+
+    perf.update_equity(1000)
+    perf.update_equity(900)
+    perf.save()
+    state = json.loads((tmp_path / "performance_stats.json").read_text())
+    assert len(state["trades"]) == 2 and state["max_drawdown"] == pytest.approx(0.1)
+
+    log.unlink()                                    # il CSV non serve più: si riparte dal JSON
+    reloaded = stats(tmp_path).load()
+    assert reloaded.summary()["7d"] == summary["7d"]
+    assert reloaded.drawdown()["peak_equity"] == 1000
+    assert reloaded.drawdown()["max_drawdown"] == pytest.approx(0.1)
+
+
+def test_saves_are_throttled(tmp_path):
+    perf = stats(tmp_path, save_interval=3600)
+    perf.record_trade(1.0)
+    path = tmp_path / "performance_stats.json"
+    assert len(json.loads(path.read_text())["trades"]) == 1
+
+    perf.record_trade(2.0)                          # entro save_interval: solo in memoria
+    assert len(json.loads(path.read_text())["trades"]) == 1
+    perf.save()
+    assert len(json.loads(path.read_text())["trades"]) == 2
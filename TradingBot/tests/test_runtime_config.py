@@ -0,0 +1,128 @@
+# tests/test_runtime_config.py
+
+"""Validation, snapshots, sidecar persistence and reload of utils.runtime_config."""
+
+import json
+import os
+import types
+
+import pytest
+
+from utils.runtime_config import ConfigSnapshot, RuntimeConfig
+
+
+@pytest.fixture
+def cfg(tmp_path):
+    # modulo settings finto: i percorsi si risolvono rispetto a __file__
+    return types.SimpleNamespace(
+        __file__=str(tmp_path / "settings.py"),
+        RUNTIME_CONFIG_FILE="config/runtime_config.json",
+        RUNTIME_CONFIG_KEYS=["RISK_PERCENT", "ALERTS_ENABLED", "FLIP_COOLDOWN_SECONDS", "TRAILING_CONFIG"],
+        RISK_PERCENT=1.0,
+        ALERTS_ENABLED=True,
+        FLIP_COOLDOWN_SECONDS=300,
+        TRAILING_CONFIG={"trend": {"base_stop_factor": 1.5, "confidence_boost": 0.2}},
+    )
+
+
+def write_sidecar(store, version, values):
+    with open(store.path, "w") as f:
+        json.dump({"version": version, "source": "telegram", "values": values}, f)
+    # mtime diverso anche su filesystem con risoluzione al secondo
+    stat = os.stat(store.path)
+    os.utime(store.path, (stat.st_atime, stat.st_mtime + 1))
+
+
+def test_values_are_coerced_to_the_default_type(cfg):
+    store = RuntimeConfig(cfg)
+    snap = store.update({"RISK_PERCENT": "2.5", "ALERTS_ENABLED": "off", "FLIP_COOLDOWN_SECONDS": "60"})
+    assert snap.RISK_PERCENT == 2.5
+    assert snap.ALERTS_ENABLED is False
+    assert snap.FLIP_COOLDOWN_SECONDS == 60
+    with pytest.raises(ValueError):
+        store.set("ALERTS_ENABLED", "maybe")
+    with pytest.raises(KeyError):
+        store.set("SYMBOLS", ["EURUSD"])
+    assert store.current is snap   # un update rifiutato non cambia nulla
+
+
+def test_snapshots_are_versioned_and_read_only(cfg):
+    store = RuntimeConfig(cfg)
+    before = store.current
+    after = store.set("RISK_PERCENT", 2.0)
+    assert (before.version, after.version) == (0, 1)
+    assert before.RISK_PERCENT == 1.0   # chi ha già preso lo snapshot non vede l'update
+    assert store.set("RISK_PERCENT", 2.0) is after   # nessun cambio, nessuna versione nuova
+    with pytest.raises(AttributeError):
+        after.RISK_PERCENT = 3.0
+    with pytest.raises(TypeError):
+        after.values["RISK_PERCENT"] = 3.0
+    assert isinstance(after, ConfigSnapshot)
+
+
+def test_dict_parameters_merge_unless_asked_not_to(cfg):
+    store = RuntimeConfig(cfg)
+    snap = store.set("TRAILING_CONFIG", {"trend": {"base_stop_factor": 2.0}})
+    assert snap.TRAILING_CONFIG["trend"] == {"base_stop_factor": 2.0, "confidence_boost": 0.2}
+    snap = store.update({"TRAILING_CONFIG": {"range": {"base_stop_factor": 1.0}}}, merge=False)
+    assert snap.TRAILING_CONFIG == {"range": {"base_stop_factor": 1.0}}
+    assert cfg.TRAILING_CONFIG["trend"]["base_stop_factor"] == 1.5   # default intatto
+
+
+def test_sidecar_keeps_only_overrides_and_is_loaded_at_start(cfg):
+    store = RuntimeConfig(cfg)
+    store.set("RISK_PERCENT", 2.0, source="telegram")
+    with open(store.path) as f:
+        state = json.load(f)
+    assert state["values"] == {"RISK_PERCENT": 2.0}
+    assert (state["version"], state["source"]) == (1, "telegram")
+
+    restarted = RuntimeConfig(cfg).load()
+    assert restarted.current.RISK_PERCENT == 2.0
+    assert restarted.current.ALERTS_ENABLED is True
+    assert restarted.current.version == 1
+
+
+def test_reload_picks_up_another_process_and_resets_removed_keys(cfg):
+    bot = RuntimeConfig(cfg).load()
+    other = RuntimeConfig(cfg).load()
+    assert bot.reload_if_changed() is bot.current   # nessun sidecar: niente da fare
+
+    other.update({"RISK_PERCENT": 3.0, "ALERTS_ENABLED": False})
+    snap = bot.reload_if_changed()
+    assert (snap.RISK_PERCENT, snap.ALERTS_ENABLED, snap.version) == (3.0, False, 1)
+    assert bot.reload_if_changed() is snap   # file invariato
+
+    # l'altro processo toglie RISK_PERCENT dal sidecar: torna al default
+    write_sidecar(bot, 5, {"ALERTS_ENABLED": False})
+    snap = bot.reload_if_changed()
+    assert (snap.RISK_PERCENT, snap.ALERTS_ENABLED, snap.version) == (1.0, False, 5)
+
+    # e il prossimo salvataggio non lo riscrive
+    bot.set("FLIP_COOLDOWN_SECONDS", 60)
+    with open(bot.path) as f:
+        assert json.load(f)["values"] == {"ALERTS_ENABLED": False, "FLIP_COOLDOWN_SECONDS": 60}
+
+
+def test_older_sidecar_is_ignored(cfg):
+    store = RuntimeConfig(cfg)
+    store.set("RISK_PERCENT", 2.0)
+    store.set("RISK_PERCENT", 2.5)
+    write_sidecar(store, 1, {"RISK_PERCENT": 9.0})
+    assert store.reload_if_changed().RISK_PERCENT == 2.5
+
+
+def test_subscribers_get_the_changed_keys(cfg):
+    store = RuntimeConfig(cfg)
+    seen, risk_only = [], []
+    store.subscribe(lambda snap, changed: seen.append((snap.version, changed)))
+    unsubscribe = store.subscribe(lambda snap, changed: risk_only.append(snap.RISK_PERCENT),
+                                  keys=["RISK_PERCENT"])
+    store.subscribe(lambda snap, changed: 1 / 0)   # un subscriber che fallisce non blocca gli altri
+
+    store.set("ALERTS_ENABLED", False)
+    store.set("RISK_PERCENT", 2.0)
+    unsubscribe()
+    store.set("RISK_PERCENT", 3.0)
+    assert seen == [(1, {"ALERTS_ENABLED"}), (2, {"RISK_PERCENT"}), (3, {"RISK_PERCENT"})]
+    assert risk_only == [2.0]
@@ -0,0 +1,112 @@
+# tests/test_streaming_indicators.py
+
+"""
+utils.streaming_indicators fed bar by bar against utils.vector_indicators
+over the whole history (itself checked against the pandas_ta formulas in
+test_vector_indicators.py).
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from data_sources.fake_mt5_reader import RATES_DTYPE
+from utils import vector_indicators as vi
+from utils.streaming_indicators import IndicatorState, RollingSum, StreamingIndicatorEngine
+
+COLUMNS = IndicatorState.COLUMNS
+
+
+def rates(n=500, seed=5, start=1_700_000_000):
+    rng = np.random.default_rng(seed)
+    close = 1.1 + np.cumsum(rng.normal(0, 0.0005, n))
+    spread = np.abs(rng.normal(0, 0.0004, n))
+    out = np.zeros(n, dtype=RATES_DTYPE)
+    out["time"] = start + 300 * np.arange(n)
+    out["open"] = close
+    out["high"] = close + spread
+    out["low"] = close - spread
+    out["close"] = close
+    out["tick_volume"] = rng.integers(50, 500, n)
+    return out
+
+
+def assert_matches_vector(state, history):
+    expected = vi.indicator_columns(history)
+    got = state.values()
+    assert got["close"] == history["close"][-1]
+    for col in COLUMNS:
+        want = expected[col][-1]
+        if math.isnan(want):
+            assert math.isnan(got[col]), col
+        else:
+            assert got[col] == pytest.approx(want, rel=1e-9, abs=1e-7), col
+
+
+def test_incremental_updates_match_the_vectorized_indicators():
+    data = rates()
+    state = IndicatorState()
+    end = 0
+    for step in (1, 1, 13, 40, 1, 150, 3, 60, 1, 230):
+        end += step
+        assert state.update(data[:end]) == step       # solo le barre nuove
+        assert_matches_vector(state, data[:end])
+    assert end == len(data)
+
+
+def test_forming_bar_is_skipped_and_nothing_is_ingested_twice():
+    data = rates(300)
+    state = IndicatorState()
+    assert state.update(data, forming_last=True) == 299
+    assert state.last_time == int(data["time"][-2])
+    assert_matches_vector(state, data[:-1])
+
+    assert state.update(data[:-1]) == 0
+    assert state.update(data) == 1
+    assert_matches_vector(state, data)
+
+
+def test_gap_in_history_restarts_the_state():
+    data = rates(900)
+    state = IndicatorState()
+    state.update(data[:300])
+    window = data[600:]                 # nessuna barra in comune con quelle già viste
+    assert state.update(window) == 300
+    assert state.bars == 300
+    assert_matches_vector(state, window)
+
+
+def test_flat_bars_do_not_stall_the_stochastic():
+    data = rates(400)
+    data["high"][150:170] = data["low"][150:170] = data["close"][150:170] = 1.1
+    state = IndicatorState()
+    for end in range(1, len(data) + 1):
+        state.update(data[:end])
+        if end in (165, 175, 200, 400):
+            assert_matches_vector(state, data[:end])
+    assert not math.isnan(state.values()["Stoch"])
+
+
+def test_rolling_sum_skips_windows_with_nan_and_resums_on_wrap():
+    rs = RollingSum(3)
+    out = [rs.update(x) for x in (1.0, 2.0, float("nan"), 4.0, 5.0, 6.0, 0.1, 0.2, 0.3)]
+    assert out[:2] == [1.0, 3.0]
+    assert all(math.isnan(v) for v in out[2:5])
+    assert out[5] == 15.0
+    assert out[-1] == pytest.approx(0.6, abs=1e-15)
+
+
+def test_engine_keeps_one_state_per_symbol_and_timeframe():
+    engine = StreamingIndicatorEngine()
+    data = rates(250)
+    engine.update("EURUSD", 5, data)
+    engine.update("EURUSD", 15, data[:100])
+    engine.update("GBPUSD", 5, data)
+
+    frame = engine.frame("EURUSD", 5)
+    assert len(frame) == 2 and list(frame.columns) == ["close", *COLUMNS]
+    assert frame["close"].tolist() == data["close"][-2:].tolist()
+
+    engine.reset("EURUSD")
+    assert set(engine.states) == {("GBPUSD", 5)}
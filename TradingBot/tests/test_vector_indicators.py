@@ -0,0 +1,139 @@
+# tests/test_vector_indicators.py
+
+"""
+utils.vector_indicators against the pandas formulas of pandas_ta (the
+implementation the strategy used before), written out here so the test
+does not need pandas_ta itself.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import vector_indicators as vi
+
+
+def bars(n=400, seed=3):
+    rng = np.random.default_rng(seed)
+    close = 1.1 + np.cumsum(rng.normal(0, 0.0005, n))
+    spread = np.abs(rng.normal(0, 0.0004, n))
+    return close + spread, close - spread, close, rng.integers(50, 500, n).astype("float64")
+
+
+def ref_sma(x, n):
+    return pd.Series(x).rolling(n, min_periods=n).mean().to_numpy()
+
+
+def ref_ema(x, n):
+    s = pd.Series(x).copy()
+    seed = s.iloc[:n].mean()
+    s.iloc[:n - 1] = np.nan
+    s.iloc[n - 1] = seed
+    return s.ewm(span=n, adjust=False).mean().to_numpy()
+
+
+def ref_rma(x, n):
+    return pd.Series(x).ewm(alpha=1.0 / n, min_periods=n).mean().to_numpy()
+
+
+def ref_true_range(high, low, close):
+    prev = pd.Series(close).shift(1)
+    ranges = pd.concat([pd.Series(high - low), (pd.Series(high) - prev).abs(), (pd.Series(low) - prev).abs()], axis=1)
+    tr = ranges.max(axis=1)
+    tr.iloc[0] = np.nan
+    return tr.to_numpy()
+
+
+def ref_stoch(high, low, close, k=14, smooth_k=3, d=3):
+    ll = pd.Series(low).rolling(k).min()
+    hh = pd.Series(high).rolling(k).max()
+    raw = 100 * (pd.Series(close) - ll) / (hh - ll)
+    stoch_k = raw.rolling(smooth_k).mean()
+    return stoch_k.to_numpy(), stoch_k.rolling(d).mean().to_numpy()
+
+
+def close_to(a, b, tol=1e-9):
+    np.testing.assert_allclose(a, b, rtol=0, atol=tol, equal_nan=True)
+
+
+@pytest.fixture(params=["lfilter", "python"])
+def recursion(request, monkeypatch):
+    """Runs EMA/RMA tests with scipy's lfilter (if installed) and with the pure-Python fallback."""
+    if request.param == "python":
+        monkeypatch.setattr(vi, "_lfilter", False)
+    elif not vi._get_lfilter():
+        pytest.skip("scipy non installato")
+    return request.param
+
+
+def test_sma_and_bbands_match_pandas():
+    _, _, close, _ = bars()
+    close_to(vi.sma(close, 50), ref_sma(close, 50))
+    lower, mid, upper = vi.bbands(close, 20, 2.0)
+    std = pd.Series(close).rolling(20).std(ddof=0).to_numpy()
+    close_to(mid, ref_sma(close, 20))
+    close_to(upper - lower, 4 * std)
+
+
+def test_ema_rma_macd_match_pandas(recursion):
+    _, _, close, _ = bars()
+    close_to(vi.ema(close, 12), ref_ema(close, 12))
+    close_to(vi.rma(close, 14), ref_rma(close, 14))
+    line, signal, hist = vi.macd(close)
+    ref_line = ref_ema(close, 12) - ref_ema(close, 26)
+    # pandas_ta calcola la signal dalla prima MACD valida (barra 25)
+    ref_signal = np.r_[np.full(25, np.nan), ref_ema(ref_line[25:], 9)]
+    close_to(line, ref_line)
+    close_to(signal, ref_signal)
+    close_to(hist, line - signal)
+
+
+def test_atr_and_rsi_match_pandas_ta_formulas(recursion):
+    high, low, close, _ = bars()
+    close_to(vi.atr(high, low, close, 14), ref_rma(ref_true_range(high, low, close), 14))
+
+    diff = pd.Series(close).diff()
+    up, down = ref_rma(diff.clip(lower=0).to_numpy(), 14), ref_rma((-diff).clip(lower=0).to_numpy(), 14)
+    close_to(vi.rsi(close, 14), 100 * up / (up + down), tol=1e-7)
+
+
+def test_stoch_matches_pandas():
+    high, low, close, _ = bars()
+    k, d = vi.stoch(high, low, close)
+    ref_k, ref_d = ref_stoch(high, low, close)
+    close_to(k, ref_k, tol=1e-7)
+    close_to(d, ref_d, tol=1e-7)
+
+
+def test_a_nan_only_invalidates_the_windows_containing_it():
+    _, _, close, _ = bars()
+    gap = close.copy()
+    gap[100] = np.nan
+    out = vi.sma(gap, 10)
+
+    assert np.isnan(out[100:110]).all()
+    assert not np.isnan(out[110:]).any()
+    close_to(out, ref_sma(gap, 10))
+
+
+def test_stoch_recovers_after_flat_bars():
+    high, low, close, _ = bars()
+    high[150:170] = low[150:170] = close[150:170] = 1.1   # hh == ll → 0/0 sulle finestre piatte
+    k, d = vi.stoch(high, low, close)
+    ref_k, ref_d = ref_stoch(high, low, close)
+
+    assert np.isnan(k[169]) and not np.isnan(k[-50:]).any()
+    close_to(k, ref_k, tol=1e-7)
+    close_to(d, ref_d, tol=1e-7)
+
+
+def test_indicator_columns_warm_up():
+    high, low, close, volume = bars()
+    cols = vi.indicator_columns({"high": high, "low": low, "close": close, "tick_volume": volume})
+
+    assert np.isnan(cols["MA_200"][198]) and not np.isnan(cols["MA_200"][199])
+    assert np.isnan(cols["ATR"][13]) and not np.isnan(cols["ATR"][14])
+    assert np.isnan(cols["SpanB"][51 + 26 - 1]) and not np.isnan(cols["SpanB"][51 + 26])
+    # OBV: +volume se la chiusura sale, -volume se scende
+    np.testing.assert_array_equal(np.diff(cols["OBV"]), np.sign(np.diff(close)) * volume[1:])
+    assert all(len(v) == len(close) for v in cols.values())
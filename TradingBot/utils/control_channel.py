@@ -0,0 +1,188 @@
+# utils/control_channel.py
+
+"""
+Local control/telemetry channel of the running bot.
+
+The bot process serves a small request/response protocol, one JSON object
+per line, on a Unix domain socket (settings.CONTROL_SOCKET_PATH, relative
+to the TradingBot folder). Where AF_UNIX is not available (Windows + MT5)
+it uses 127.0.0.1:settings.CONTROL_TCP_PORT instead.
+
+    → {"cmd": "status", "args": {}, "token": "..."}
+    ← {"ok": true, "result": {...}}   or   {"ok": false, "error": "..."}
+
+Every request carries a shared token, read from settings.CONTROL_TOKEN_FILE
+(created by the bot with mode 0600 on first start): only processes of the
+user that can read that file can send commands, including over the TCP
+fallback. The Unix socket lives in a 0700 directory and is chmod-ed to 0600
+right after bind(), so other users can never reach it, not even in between.
+
+Telegram, the watchdog and the AutoManager use ControlClient to read live
+state and push parameter changes into the running process, instead of
+creating their own ForexTradingBot (second MT5 session, models loaded twice)
+or reloading settings.py.
+
+The module only needs the standard library and takes the settings module
+as an argument, so it can be imported as `TradingBot.utils.control_channel`
+too (AutoManager). It logs to "tradingbot.Control", which the bot's queued
+logger (utils.logger) writes out.
+"""
+
+import hmac
+import json
+import logging
+import os
+import secrets
+import socket
+import socketserver
+import threading
+
+MAX_LINE = 1 << 20
+
+log = logging.getLogger("tradingbot.Control")   # niente utils.logger: importa settings
+
+
+class ControlError(Exception):
+    """The bot is not reachable or the command failed."""
+
+
+def control_address(cfg=None):
+    """Socket path (str) or (host, port) for the settings module `cfg`."""
+    if cfg is None:
+        import settings as cfg
+    if hasattr(socket, "AF_UNIX"):
+        base = os.path.dirname(os.path.abspath(cfg.__file__))
+        return os.path.join(base, cfg.CONTROL_SOCKET_PATH)
+    return ("127.0.0.1", cfg.CONTROL_TCP_PORT)
+
+
+def control_token_path(cfg=None):
+    """Path of the shared token file for the settings module `cfg`."""
+    if cfg is None:
+        import settings as cfg
+    base = os.path.dirname(os.path.abspath(cfg.__file__))
+    return os.path.join(base, cfg.CONTROL_TOKEN_FILE)
+
+
+def read_token(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def ensure_token(path):
+    """Token in `path`, created (owner read/write only) if missing."""
+    try:
+        return read_token(path)
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    token = secrets.token_hex(32)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:   # creato nel frattempo da un altro processo
+        return read_token(path)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+    return token
+
+
+def _encode(obj):
+    return (json.dumps(obj, default=str) + "\n").encode("utf-8")
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if len(line) > MAX_LINE:
+                break
+            try:
+                request = json.loads(line)
+                if not hmac.compare_digest(str(request.get("token", "")), self.server.token):
+                    raise PermissionError("token non valido")
+                handler = self.server.handlers.get(request.get("cmd"))
+                if handler is None:
+                    raise KeyError(f"comando sconosciuto: {request.get('cmd')}")
+                reply = {"ok": True, "result": handler(**request.get("args", {}))}
+            except Exception as e:
+                reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write(_encode(reply))
+
+
+class ControlServer:
+    def __init__(self, address=None, token_path=None):
+        self.address = address or control_address()
+        self.token_path = token_path or control_token_path()
+        self.handlers = {"ping": lambda: "pong", "commands": lambda: sorted(self.handlers)}
+        self._server = None
+        self._thread = None
+
+    def register(self, name, func):
+        self.handlers[name] = func
+
+    def start(self):
+        token = ensure_token(self.token_path)
+        if isinstance(self.address, str):
+            # cartella 0700 anche se già esistente: copre l'intervallo tra bind() e chmod()
+            # senza toccare l'umask, che è di tutto il processo (altri thread creano file)
+            directory = os.path.dirname(self.address)
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            os.chmod(directory, 0o700)
+            if os.path.exists(self.address):
+                os.remove(self.address)   # socket rimasto da un'esecuzione precedente
+            self._server = socketserver.ThreadingUnixStreamServer(self.address, _Handler)
+            os.chmod(self.address, 0o600)   # solo l'utente del bot
+        else:
+            server_cls = socketserver.ThreadingTCPServer
+            server_cls.allow_reuse_address = True
+            self._server = server_cls(self.address, _Handler)
+        self._server.daemon_threads = True
+        self._server.handlers = self.handlers
+        self._server.token = token
+        self._thread = threading.Thread(target=self._server.serve_forever, name="control-channel", daemon=True)
+        self._thread.start()
+        log.info(f"in ascolto su {self.address}")
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            if isinstance(self.address, str) and os.path.exists(self.address):
+                os.remove(self.address)
+
+
+class ControlClient:
+    def __init__(self, address=None, timeout=5.0, token_path=None):
+        self.address = address or control_address()
+        self.timeout = timeout
+        # letto a ogni chiamata: il client può nascere prima che il bot crei il token
+        self.token_path = token_path or control_token_path()
+
+    def call(self, cmd, **args):
+        try:
+            token = read_token(self.token_path)
+        except OSError as e:
+            raise ControlError(f"token del canale di controllo non leggibile ({e})") from e
+        family = socket.AF_UNIX if isinstance(self.address, str) else socket.AF_INET
+        try:
+            with socket.socket(family, socket.SOCK_STREAM) as sock:
+                sock.settimeout(self.timeout)
+                sock.connect(self.address)
+                sock.sendall(_encode({"cmd": cmd, "args": args, "token": token}))
+                with sock.makefile("rb") as f:
+                    line = f.readline(MAX_LINE)
+        except OSError as e:
+            raise ControlError(f"bot non raggiungibile ({e})") from e
+        if not line:
+            raise ControlError("connessione chiusa dal bot")
+        reply = json.loads(line)
+        if not reply.get("ok"):
+            raise ControlError(reply.get("error", "errore sconosciuto"))
+        return reply["result"]
+
+    def available(self):
+        try:
+            return self.call("ping") == "pong"
+        except ControlError:
+            return False
@@ -1,9 +1,8 @@
 import pandas as pd
-import pandas_ta as ta
 import os
 from datetime import datetime
 import settings
-import MetaTrader5 as mt5
+from data_sources.broker import mt5
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
 def fetch_ohlcv(symbol, timeframe=settings.EXECUTION_TF_LABEL, bars=settings.OHLCV_BARS):
@@ -18,6 +17,7 @@ def fetch_ohlcv(symbol, timeframe=settings.EXECUTION_TF_LABEL, bars=settings.OHL
     return df
 
 def enrich_with_indicators(df):
+    import pandas_ta  # noqa: F401 — registra l'accessor df.ta; import pesante, solo al primo uso
 
         # ASSICURIAMO CHE LE COLONNE ESISTANO
     if 'volume' not in df:
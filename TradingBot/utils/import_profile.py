@@ -0,0 +1,91 @@
+# utils/import_profile.py
+
+"""
+Import-time report for the entry points (python -X importtime, summarized).
+
+    python -m utils.import_profile                 # bot, telegram, watchdog
+    python -m utils.import_profile bot --top 15
+    python -m utils.import_profile my.module       # any importable module
+
+Each target is imported in a fresh interpreter, so the numbers are the ones
+a (re)start pays. The report lists total import time, the heaviest
+top-level packages (self time summed over their submodules) and the modules
+with the largest cumulative time, which points at the import to defer.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))   # TradingBot/
+
+# nome → (modulo da importare, cartella da cui importarlo)
+ENTRY_POINTS = {
+    "bot": ("bot", HERE),                 # come `python bot.py` lanciato da main.py
+    "telegram": ("telegram.telegram_bot", HERE),
+    "watchdog": ("watchdog", HERE),
+}
+
+
+def profile_import(module, cwd=None):
+    """[(module, self_us, cumulative_us)] in import order, from a fresh interpreter."""
+    cwd = cwd or HERE
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (cwd, HERE, env.get("PYTHONPATH")) if p)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=cwd, env=env, capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            rows.append((name.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    if proc.returncode:
+        error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "errore sconosciuto"
+        raise RuntimeError(f"import {module} fallito: {error}")
+    return rows
+
+
+def summarize(rows, top=20):
+    by_package = defaultdict(int)
+    for name, self_us, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+    return {
+        "total_ms": sum(self_us for _, self_us, _ in rows) / 1000,
+        "modules": len(rows),
+        "packages": sorted(by_package.items(), key=lambda kv: -kv[1])[:top],
+        "cumulative": sorted(rows, key=lambda r: -r[2])[:top],
+    }
+
+
+def print_report(label, summary):
+    print(f"\n⏱️ {label}: {summary['total_ms']:.0f} ms, {summary['modules']} moduli")
+    print("  Pacchetti (self):")
+    for package, us in summary["packages"]:
+        print(f"    {us / 1000:9.1f} ms  {package}")
+    print("  Moduli (cumulativo):")
+    for name, _, cumulative_us in summary["cumulative"]:
+        print(f"    {cumulative_us / 1000:9.1f} ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time breakdown of the bot entry points")
+    parser.add_argument("targets", nargs="*", help=f"{', '.join(ENTRY_POINTS)} o nomi di moduli")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    for target in args.targets or list(ENTRY_POINTS):
+        module, cwd = ENTRY_POINTS.get(target, (target, HERE))
+        try:
+            print_report(target, summarize(profile_import(module, cwd), args.top))
+        except RuntimeError as e:
+            print(f"\n❌ {target}: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,166 @@
-import pandas as pd
-from collections import defaultdict
+# utils/indicator_analysis.py
+
+"""
+Per-symbol statistics of indicator combinations vs. trade profit.
+
+Every closed trade updates the combos (subsets of its used indicators, up to
+settings.COMBO_MAX_SIZE indicators) once; "top combos for X" is then served
+from memory. The store is saved to settings.COMBO_STATS_FILE and, the first
+time only, rebuilt from the trade log.
+
+Combos are encoded as the sorted indicator names joined by "|"
+(e.g. "MACD|RSI"), both on disk and in the CSV `used_indicators` column.
+"""
+
+import ast
+import csv
+import json
+import os
+import threading
 from itertools import combinations
 
-def learn_indicator_combos(symbol, log_path="trade_logs.csv", min_trades=3):
-    df = pd.read_csv(log_path)
+import settings
+
+SEPARATOR = "|"
+
+
+def encode_indicators(indicators):
+    return SEPARATOR.join(sorted(set(indicators)))
+
 
-    # Filter for the right symbol
-    df = df[df["symbol"] == symbol]
+def decode_indicators(value):
+    """Parses "A|B", or the legacy "['A', 'B']" literal, into a sorted tuple."""
+    if value is None:
+        return ()
+    if isinstance(value, (list, tuple, set)):
+        return tuple(sorted(set(value)))
+    value = str(value).strip()
+    if not value:
+        return ()
+    if value.startswith(("[", "(")):
+        try:
+            return tuple(sorted(set(ast.literal_eval(value))))
+        except (ValueError, SyntaxError):
+            return ()
+    return tuple(sorted(set(value.split(SEPARATOR))))
 
-    # Make sure 'used_indicators' is valid
-    df = df[df["used_indicators"].notnull()]
-    df["used_indicators"] = df["used_indicators"].apply(eval)
 
-    combo_stats = defaultdict(lambda: {"count": 0, "profit": 0.0})
+class ComboStatsStore:
+    def __init__(self, path=None, max_size=None):
+        self.path = path or settings.COMBO_STATS_FILE
+        self.max_size = max_size or settings.COMBO_MAX_SIZE
+        self.stats = {}     # simbolo -> {combo (tuple): [count, profit]}
+        self._top = {}      # (simbolo, min_trades) -> classifica già ordinata
+        self._lock = threading.Lock()
 
-    for _, row in df.iterrows():
-        indicators = row["used_indicators"]
-        profit = row["profit"]
+    def _update(self, symbol, indicators, profit):
+        by_combo = self.stats.setdefault(symbol, {})
+        indicators = decode_indicators(indicators)
+        for r in range(1, min(len(indicators), self.max_size) + 1):
+            for combo in combinations(indicators, r):
+                entry = by_combo.setdefault(combo, [0, 0.0])
+                entry[0] += 1
+                entry[1] += profit
 
-        # Learn from all combos (size 1 to N)
-        for r in range(1, len(indicators) + 1):
-            for combo in combinations(sorted(indicators), r):
-                combo_stats[combo]["count"] += 1
-                combo_stats[combo]["profit"] += profit
+    def record(self, symbol, indicators, profit, save=True):
+        """Adds one closed trade."""
+        with self._lock:
+            self._update(symbol, indicators, float(profit))
+            for key in [k for k in self._top if k[0] == symbol]:
+                del self._top[key]
+        if save:
+            self.save()
 
-    # Compute average profit per combo
-    combo_perf = {
-        combo: round(stats["profit"] / stats["count"], 4)
-        for combo, stats in combo_stats.items()
-        if stats["count"] >= min_trades
-    }
+    def top(self, symbol, min_trades=3):
+        """{combo: avg profit} with at least `min_trades` trades, largest |avg| first."""
+        key = (symbol, min_trades)
+        with self._lock:
+            ranking = self._top.get(key)
+            if ranking is None:
+                perf = {
+                    combo: round(profit / count, 4)
+                    for combo, (count, profit) in self.stats.get(symbol, {}).items()
+                    if count >= min_trades
+                }
+                ranking = self._top[key] = dict(sorted(perf.items(), key=lambda item: -abs(item[1])))
+            return ranking
 
-    # Sort combos by profitability
-    sorted_perf = dict(sorted(combo_perf.items(), key=lambda item: -abs(item[1])))
+    def best_match(self, symbol, indicators, min_trades=3):
+        """
+        (combo, avg profit) of the most specific stored subset of `indicators`
+        (largest, then best avg), or None. A trade usually has more indicators
+        than COMBO_MAX_SIZE (the fusion always adds LSTM/CNN/SENTIMENT), so
+        the full combo itself is rarely stored.
+        """
+        ranking = self.top(symbol, min_trades)
+        indicators = decode_indicators(indicators)
+        for r in range(min(len(indicators), self.max_size), 0, -1):
+            found = [(combo, ranking[combo]) for combo in combinations(indicators, r) if combo in ranking]
+            if found:
+                return max(found, key=lambda item: item[1])
+        return None
 
-    return sorted_perf
+    # ------------------------------------------------------------------
+    # Persistenza
+    # ------------------------------------------------------------------
+    def save(self):
+        with self._lock:
+            state = {
+                "max_size": self.max_size,
+                "stats": {
+                    symbol: {encode_indicators(combo): v for combo, v in by_combo.items()}
+                    for symbol, by_combo in self.stats.items()
+                },
+            }
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+    def load(self, log_path=None):
+        """Loads the saved store; if missing (or built with another max_size) rebuilds it from the trade log."""
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                state = json.load(f)
+            if state.get("max_size") == self.max_size:
+                with self._lock:
+                    self.stats = {
+                        symbol: {decode_indicators(combo): list(v) for combo, v in by_combo.items()}
+                        for symbol, by_combo in state.get("stats", {}).items()
+                    }
+                    self._top.clear()
+                return self
+        self.rebuild(log_path or settings.TRADE_LOG_CSV)
+        return self
+
+    def rebuild(self, log_path):
+        with self._lock:
+            self.stats = {}
+            self._top.clear()
+            if os.path.exists(log_path):
+                with open(log_path, newline="") as f:
+                    for row in csv.DictReader(f):
+                        try:
+                            if row.get("used_indicators"):
+                                self._update(row["symbol"], row["used_indicators"], float(row["profit"]))
+                        except (KeyError, TypeError, ValueError):
+                            continue
+        self.save()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_combo_store(log_path=None):
+    """Process-wide ComboStatsStore, loaded on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ComboStatsStore().load(log_path)
+    return _store
+
+
+def learn_indicator_combos(symbol, log_path="trade_logs.csv", min_trades=3):
+    return get_combo_store(log_path).top(symbol, min_trades=min_trades)
@@ -0,0 +1,199 @@
+# utils/latency_metrics.py
+
+"""
+Latency histograms per call type and symbol.
+
+Every broker call (timed in data_sources/broker.py), every pipeline stage,
+model inference and order gateway round-trip is recorded in an HDR-style
+histogram: log-linear buckets with 64 sub-buckets per power of two
+(relative error under 1.6%), so p50/p95/p99/max cost a few KB per series
+whatever the number of samples. Fill slippage (points, adverse > 0) is
+kept in the same structure next to the order latencies.
+
+The bot exposes summary() on the control channel ("metrics") and logs a
+compact summary every settings.METRICS_SUMMARY_SECONDS:
+
+    python -m utils.latency_metrics            # tabella dal bot in esecuzione
+    python -m utils.latency_metrics --symbols  # anche per simbolo
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+SUB_BITS = 7
+SUB_COUNT = 1 << SUB_BITS        # valori < 128 unità: bucket esatti
+HALF = SUB_COUNT >> 1            # 64 sub-bucket per potenza di due oltre
+
+
+def _index(units):
+    if units < SUB_COUNT:
+        return units
+    shift = units.bit_length() - SUB_BITS
+    return shift * HALF + (units >> shift)
+
+
+def _value(index):
+    """Upper bound (units) of a bucket."""
+    if index < SUB_COUNT:
+        return index
+    shift = index // HALF - 1
+    return ((index - shift * HALF + 1) << shift) - 1
+
+
+class Histogram:
+    """Counts of non-negative values at `resolution` (e.g. 1e-6 s, 0.1 points)."""
+
+    def __init__(self, resolution=1e-6):
+        self.resolution = resolution
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, value):
+        idx = _index(max(0, int(round(value / self.resolution))))
+        with self._lock:
+            self.counts[idx] = self.counts.get(idx, 0) + 1
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def merge(self, other):
+        with other._lock:
+            counts, count, total, peak = dict(other.counts), other.count, other.total, other.max
+        with self._lock:
+            for idx, n in counts.items():
+                self.counts[idx] = self.counts.get(idx, 0) + n
+            self.count += count
+            self.total += total
+            self.max = max(self.max, peak)
+        return self
+
+    def percentile(self, q):
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = max(1, int(round(q / 100 * self.count)))
+            seen = 0
+            for idx in sorted(self.counts):
+                seen += self.counts[idx]
+                if seen >= rank:
+                    return min(_value(idx) * self.resolution, self.max)
+        return self.max
+
+    def summary(self, factor=1.0, digits=3):
+        """count, mean, p50/p95/p99, max; values multiplied by `factor` (e.g. 1000 → ms)."""
+        r = lambda v: round(v * factor, digits)
+        return {
+            "count": self.count,
+            "mean": r(self.total / self.count) if self.count else 0.0,
+            "p50": r(self.percentile(50)),
+            "p95": r(self.percentile(95)),
+            "p99": r(self.percentile(99)),
+            "max": r(self.max),
+        }
+
+
+class LatencyMetrics:
+    def __init__(self):
+        self.started_at = time.time()
+        self._latency = {}    # (nome, simbolo) -> Histogram in secondi
+        self._slippage = {}   # simbolo -> Histogram in punti (solo lato sfavorevole)
+        self._lock = threading.Lock()
+
+    def _series(self, table, key, resolution):
+        series = table.get(key)
+        if series is None:
+            with self._lock:
+                series = table.setdefault(key, Histogram(resolution))
+        return series
+
+    def record(self, name, seconds, symbol=None):
+        self._series(self._latency, (name, symbol), 1e-6).record(seconds)
+
+    def record_slippage(self, symbol, points):
+        """Fill slippage in points, positive when the fill was worse than requested."""
+        self._series(self._slippage, symbol, 0.1).record(max(0.0, points))
+
+    @contextmanager
+    def timer(self, name, symbol=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, symbol)
+
+    # ------------------------------------------------------------------
+    def summary(self, by_symbol=False):
+        """{"latency_ms": {call: stats}, "slippage_points": {...}}; per-symbol rows as "call|SYMBOL"."""
+        with self._lock:
+            latency = dict(self._latency)
+            slippage = dict(self._slippage)
+        per_call = {}
+        for (name, symbol), series in latency.items():
+            per_call.setdefault(name, Histogram(series.resolution)).merge(series)
+        out = {"since": self.started_at,
+               "latency_ms": {name: h.summary(1000) for name, h in sorted(per_call.items())}}
+        if by_symbol:
+            out["latency_ms"].update({f"{name}|{symbol}": h.summary(1000)
+                                      for (name, symbol), h in sorted(latency.items(), key=str) if symbol})
+        total = Histogram(0.1)
+        for series in slippage.values():
+            total.merge(series)
+        out["slippage_points"] = {"all": total.summary(1, 1)}
+        if by_symbol:
+            out["slippage_points"].update({s: h.summary(1, 1) for s, h in sorted(slippage.items(), key=str)})
+        return out
+
+    def reset(self):
+        with self._lock:
+            self._latency.clear()
+            self._slippage.clear()
+            self.started_at = time.time()
+
+
+def format_summary(summary, top=None):
+    """Table lines sorted by total time (count × mean)."""
+    rows = sorted(summary["latency_ms"].items(), key=lambda kv: -kv[1]["count"] * kv[1]["mean"])
+    lines = [f"{'call':<34}{'count':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)"]
+    for name, st in rows[:top]:
+        lines.append(f"{name:<34}{st['count']:>8}{st['p50']:>9.2f}{st['p95']:>9.2f}{st['p99']:>9.2f}{st['max']:>9.2f}")
+    for symbol, st in summary["slippage_points"].items():
+        if st["count"]:
+            lines.append(f"{'slippage ' + symbol:<34}{st['count']:>8}{st['p50']:>9.1f}{st['p95']:>9.1f}"
+                         f"{st['p99']:>9.1f}{st['max']:>9.1f}  (pt)")
+    return lines
+
+
+_metrics = LatencyMetrics()
+
+
+def get_metrics():
+    """Process-wide LatencyMetrics."""
+    return _metrics
+
+
+def main():
+    import argparse
+    import settings
+    from utils.control_channel import ControlClient, ControlError, control_address, control_token_path
+
+    parser = argparse.ArgumentParser(description="Latency histograms of the running bot")
+    parser.add_argument("--symbols", action="store_true", help="anche le serie per simbolo")
+    parser.add_argument("--top", type=int, default=None)
+    args = parser.parse_args()
+    try:
+        summary = ControlClient(control_address(settings), timeout=settings.CONTROL_TIMEOUT,
+                                token_path=control_token_path(settings)).call(
+            "metrics", by_symbol=args.symbols)
+    except ControlError as e:
+        print(f"❌ {e}")
+        return
+    print("\n".join(format_summary(summary, args.top)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,233 @@
 # utils/logger.py
+
+"""
+Asynchronous structured logging for the bot process.
+
+Components log through standard `logging` loggers named
+"tradingbot.<Component>" (get_logger("Inference")). A handler on the
+"tradingbot" logger only puts the record on a bounded queue, so callers
+(pipeline threads, the order gateway) never touch the disk. When the queue
+is full the record is dropped and counted instead of blocking.
+
+One writer thread drains the queue in batches of settings.LOG_BATCH_SIZE,
+or every settings.LOG_FLUSH_SECONDS, and appends JSON lines to
+settings.LOG_FILE:
+
+    {"ts": "...", "level": "INFO", "component": "Bot", "msg": "...", "thread": "...", ...fields}
+
+The file rotates on size (LOG_MAX_BYTES) or age (LOG_ROTATE_SECONDS),
+keeping LOG_BACKUP_COUNT old files. With LOG_CONSOLE the same records are
+echoed to stdout as "[time] [Component] msg". Levels are set per component
+in settings.LOG_LEVELS (default settings.LOG_LEVEL).
+
+Structured fields go in `extra={"fields": {...}}`, or use log_event().
+"""
+
+import atexit
+import json
 import logging
-import settings
 import os
+import queue
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+
+import settings
+
+ROOT = "tradingbot"
+_STOP = object()
+
+
+def _json_default(value):
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+def _record_json(record):
+    entry = {
+        "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+        "level": record.levelname,
+        "component": record.name[len(ROOT) + 1:] or ROOT,
+        "msg": record.getMessage(),
+        "thread": record.threadName,
+    }
+    entry.update(getattr(record, "fields", None) or {})
+    if record.exc_info:
+        entry["exc"] = "".join(traceback.format_exception(*record.exc_info))
+    return json.dumps(entry, ensure_ascii=False, default=_json_default)
+
+
+def _record_console(record):
+    when = datetime.fromtimestamp(record.created).strftime("%Y-%m-%d %H:%M:%S")
+    component = record.name[len(ROOT) + 1:]
+    prefix = f"[{component}] " if component and not record.getMessage().startswith("[") else ""
+    return f"[{when}] {prefix}{record.getMessage()}"
+
+
+class _QueueHandler(logging.Handler):
+    """Enqueues the record and returns; drops it when the queue is full."""
+
+    def __init__(self, records, writer):
+        super().__init__()
+        self.records = records
+        self.writer = writer
+        self.dropped = 0
+
+    def emit(self, record):
+        if not self.writer.started:
+            self.writer.start_once()   # thread avviato al primo record, non all'import
+        try:
+            self.records.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogWriter(threading.Thread):
+    """Drains the queue in batches into a rotating JSON-lines file (+ console)."""
+
+    def __init__(self, records, path, console=True, batch_size=256, flush_seconds=1.0,
+                 max_bytes=0, rotate_seconds=0, backups=5):
+        super().__init__(name="log-writer", daemon=True)
+        self.records = records
+        self.path = path
+        self.console = console
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backups = backups
+        self._file = None
+        self._opened_at = 0.0
+        self.started = False
+        self._start_lock = threading.Lock()
+
+    def start_once(self):
+        with self._start_lock:
+            if not self.started:
+                self.started = True
+                self.start()
+
+    def run(self):
+        running = True
+        while running:
+            try:
+                batch = [self.records.get(timeout=self.flush_seconds)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.records.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                running = False
+                batch = [r for r in batch if r is not _STOP]
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception:
+                    traceback.print_exc()
+        if self._file:
+            self._file.close()
+
+    def _write(self, batch):
+        self._rotate_if_needed()
+        self._file.write("".join(_record_json(r) + "\n" for r in batch))
+        self._file.flush()
+        if self.console:
+            sys.stdout.write("".join(_record_console(r) + "\n" for r in batch))
+            sys.stdout.flush()
+
+    def _rotate_if_needed(self):
+        if self._file is not None:
+            too_big = self.max_bytes and self._file.tell() >= self.max_bytes
+            too_old = self.rotate_seconds and time.time() - self._opened_at >= self.rotate_seconds
+            if not (too_big or too_old):
+                return
+            self._file.close()
+            self._file = None   # se anche la riapertura fallisce, il prossimo batch riprova
+            try:
+                for i in range(self.backups - 1, 0, -1):
+                    if os.path.exists(f"{self.path}.{i}"):
+                        os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+                if self.backups:
+                    os.replace(self.path, f"{self.path}.1")
+                self._open()
+            except OSError as e:
+                # file bloccato (antivirus/Windows) o disco: si continua in coda al file attuale
+                sys.stderr.write(f"[Logger] rotazione di {self.path} fallita: {e}\n")
+                self._open()
+            return
+        self._open()
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._opened_at = time.time()
+
+
+_writer = None
+_handler = None
+_setup_lock = threading.Lock()
+
+
+def setup_logging(cfg=None):
+    """Installs the queue handler once per process; the writer starts with the first record."""
+    global _writer, _handler
+    if _writer is not None:
+        return _writer
+    with _setup_lock:
+        if _writer is not None:
+            return _writer
+        cfg = cfg or settings
+        records = queue.Queue(maxsize=cfg.LOG_QUEUE_SIZE)
+        _writer = LogWriter(records, cfg.LOG_FILE, console=cfg.LOG_CONSOLE,
+                            batch_size=cfg.LOG_BATCH_SIZE, flush_seconds=cfg.LOG_FLUSH_SECONDS,
+                            max_bytes=cfg.LOG_MAX_BYTES, rotate_seconds=cfg.LOG_ROTATE_SECONDS,
+                            backups=cfg.LOG_BACKUP_COUNT)
+        _handler = _QueueHandler(records, _writer)
+        root = logging.getLogger(ROOT)
+        root.handlers[:] = [_handler]
+        root.propagate = False
+        root.setLevel(cfg.LOG_LEVEL)
+        for component, level in cfg.LOG_LEVELS.items():
+            logging.getLogger(f"{ROOT}.{component}").setLevel(level)
+        atexit.register(shutdown_logging)
+    return _writer
+
+
+def shutdown_logging(timeout=5.0):
+    """Writes what is still queued and stops the writer."""
+    writer = _writer
+    if writer is None or not writer.started:
+        return
+    writer.records.put(_STOP)
+    writer.join(timeout)
+
+
+def dropped_records():
+    return _handler.dropped if _handler else 0
+
+
+def get_logger(component):
+    setup_logging()
+    return logging.getLogger(f"{ROOT}.{component}")
+
+
+def log_event(msg, component="App", level=logging.INFO, **fields):
+    get_logger(component).log(level, msg, extra={"fields": fields} if fields else None)
 
-LOG_PATH = os.path.join(os.getcwd(), settings.LOG_FILE)  # e.g. "log.txt"
 
-logging.basicConfig(
-    filename=LOG_PATH,
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s"
-)
+def log_info(msg, **fields):
+    log_event(msg, level=logging.INFO, **fields)
 
-def log_info(msg):
-    logging.info(msg)
-    print(msg)
 
-def log_warning(msg):
-    logging.warning(msg)
-    print(f"WARNING: {msg}")
+def log_warning(msg, **fields):
+    log_event(msg, level=logging.WARNING, **fields)
 
-def log_error(msg):
-    logging.error(msg)
-    print(f"ERROR: {msg}")
 
-def log_event(msg):  # Fallback alias
-    log_info(msg)
\ No newline at end of file
+def log_error(msg, **fields):
+    log_event(msg, level=logging.ERROR, **fields)
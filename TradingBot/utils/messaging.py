@@ -1,6 +1,26 @@
-# Send Telegram message
-def send_message(text):
-    try:
-        bot.send_message(settings.TELEGRAM_CHAT_ID, text)
-    except Exception as e:
-        print(f"Telegram error: {e}")
\ No newline at end of file
+# utils/messaging.py
+
+"""Telegram notifications of the bot process, through one shared TelegramNotifier."""
+
+import threading
+
+import settings
+from utils.notifier import TelegramNotifier
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+
+def get_notifier():
+    """Process-wide TelegramNotifier, created on first use."""
+    global _notifier
+    if _notifier is None:
+        with _notifier_lock:
+            if _notifier is None:
+                _notifier = TelegramNotifier.from_settings(settings, parse_mode="Markdown")
+    return _notifier
+
+
+# Send Telegram message (in coda: ritorna subito)
+def send_message(text, key=None, signature=None):
+    return get_notifier().send(text, key=key, signature=signature)
@@ -0,0 +1,324 @@
+# utils/news_service.py
+
+"""
+Background RSS/Atom ingestion with a per-symbol, time-decayed sentiment index.
+
+A daemon thread runs its own asyncio loop: every NEWS_POLL_SECONDS all feeds
+are fetched concurrently with conditional GETs (ETag / Last-Modified, a 304
+costs no parsing), entries already seen are dropped, and the new headlines
+are matched to symbols through an inverted index of SYMBOL_KEYWORDS and
+scored in a single sentiment batch. A feed that fails is skipped for an
+exponentially growing number of seconds (poll interval × 2^(failures-1), at
+most NEWS_MAX_BACKOFF_SECONDS, or the server's Retry-After if longer).
+
+Per symbol only a decayed weighted sum is kept, so score(symbol) is an O(1)
+read for the trading loop: a headline weighs 1 when published and half as
+much every NEWS_SENTIMENT_HALF_LIFE_SECONDS; with little fresh news the
+score fades back to neutral (0).
+"""
+
+import asyncio
+import calendar
+import hashlib
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from datetime import datetime
+
+import settings
+from utils.logger import get_logger
+
+log = get_logger("News")
+
+try:
+    import feedparser
+except ImportError:  # parser minimale sotto
+    feedparser = None
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+USER_AGENT = "TradingSystem-news/1.0"
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def build_keyword_index(symbol_keywords):
+    """token -> [(symbol, phrase tokens)]; phrases are indexed by their first word."""
+    index = {}
+    for symbol, keywords in symbol_keywords.items():
+        for keyword in keywords:
+            phrase = tuple(tokenize(keyword))
+            if phrase:
+                index.setdefault(phrase[0], []).append((symbol, phrase))
+    return index
+
+
+def match_symbols(index, text):
+    """Symbols whose keywords appear in `text` as whole words."""
+    tokens = tokenize(text)
+    found = set()
+    for i, token in enumerate(tokens):
+        for symbol, phrase in index.get(token, ()):
+            if symbol not in found and tuple(tokens[i:i + len(phrase)]) == phrase:
+                found.add(symbol)
+    return found
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()      # RSS (RFC 822)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()  # Atom
+    except ValueError:
+        return None
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_feed(body):
+    """[{"id", "title", "published"}] from RSS 2.0 / Atom bytes."""
+    if feedparser is not None:
+        entries = []
+        for e in feedparser.parse(body).entries:
+            published = e.get("published_parsed") or e.get("updated_parsed")
+            entries.append({
+                "id": e.get("id") or e.get("link") or e.get("title", ""),
+                "title": e.get("title", ""),
+                "published": calendar.timegm(published) if published else None,
+            })
+        return entries
+
+    root = ET.fromstring(body)
+    entries = []
+    for item in root.iter():
+        if _local(item.tag) not in ("item", "entry"):
+            continue
+        fields = {}
+        for child in item:
+            name = _local(child.tag)
+            if name == "link" and child.get("href"):
+                fields.setdefault("link", child.get("href"))
+            elif child.text:
+                fields.setdefault(name, child.text.strip())
+        entries.append({
+            "id": fields.get("guid") or fields.get("id") or fields.get("link") or fields.get("title", ""),
+            "title": fields.get("title", ""),
+            "published": _parse_time(fields.get("pubDate") or fields.get("published") or fields.get("updated")),
+        })
+    return entries
+
+
+def _default_scorer(texts):
+    # import pesante (torch/transformers): solo al primo batch di notizie
+    from models.modello_sett import get_sentiment_model
+    return get_sentiment_model().analyze_batch(texts)
+
+
+class _SymbolSentiment:
+    __slots__ = ("total", "weight", "t", "last_title")
+
+    def __init__(self):
+        self.total = 0.0
+        self.weight = 0.0
+        self.t = 0.0
+        self.last_title = ""
+
+
+class NewsSentimentService:
+    def __init__(self, feeds=None, symbol_keywords=None, poll_interval=None,
+                 half_life=None, scorer=None, timeout=None, seen_max=None, max_backoff=None):
+        self.feeds = list(feeds if feeds is not None else settings.RSS_FEEDS)
+        self.index = build_keyword_index(symbol_keywords if symbol_keywords is not None
+                                         else settings.SYMBOL_KEYWORDS)
+        self.poll_interval = poll_interval or settings.NEWS_POLL_SECONDS
+        self.half_life = half_life or settings.NEWS_SENTIMENT_HALF_LIFE_SECONDS
+        self.timeout = timeout or settings.NEWS_HTTP_TIMEOUT
+        self.seen_max = seen_max or settings.NEWS_SEEN_MAX
+        self.max_backoff = max_backoff or settings.NEWS_MAX_BACKOFF_SECONDS
+        self.scorer = scorer or _default_scorer
+
+        self._validators = {}       # url -> (etag, last_modified)
+        self._backoff = {}          # url -> (errori consecutivi, riprova dopo questo istante)
+        self._seen = OrderedDict()  # id notizia -> None, dal più vecchio
+        self._state = {}            # simbolo -> _SymbolSentiment
+        self._lock = threading.Lock()
+        self.stats = {"polls": 0, "fetched": 0, "not_modified": 0, "errors": 0, "backed_off": 0,
+                      "new_entries": 0}
+
+        self._thread = None
+        self._loop = None
+        self._stop = None
+
+    # ------------------------------------------------------------------
+    # Lettura (trading loop)
+    # ------------------------------------------------------------------
+    def _decay(self, dt):
+        return 0.5 ** (dt / self.half_life)
+
+    def score(self, symbol, now=None):
+        """Decayed mean sentiment in [-1, 1]; 0.0 without recent news."""
+        with self._lock:
+            st = self._state.get(symbol)
+            if st is None or not st.weight:
+                return 0.0
+            d = self._decay(max(0.0, (now or time.time()) - st.t))
+            return st.total * d / max(st.weight * d, 1.0)
+
+    def latest_text(self, symbol):
+        with self._lock:
+            st = self._state.get(symbol)
+            return st.last_title if st else ""
+
+    # ------------------------------------------------------------------
+    # Ingestione
+    # ------------------------------------------------------------------
+    def _fetch(self, url):
+        """Conditional GET. Returns the body, or None on 304 Not Modified."""
+        etag, modified = self._validators.get(url, (None, None))
+        headers = {"User-Agent": USER_AGENT}
+        if etag:
+            headers["If-None-Match"] = etag
+        if modified:
+            headers["If-Modified-Since"] = modified
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, headers=headers),
+                                        timeout=self.timeout) as resp:
+                body = resp.read()
+                self._validators[url] = (resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+                return body
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return None
+            raise
+
+    def _failed(self, url, error, now):
+        failures = self._backoff.get(url, (0, 0.0))[0] + 1
+        delay = min(self.poll_interval * 2 ** (failures - 1), self.max_backoff)
+        retry_after = getattr(error, "headers", None) and error.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        self._backoff[url] = (failures, now + delay)
+        self.stats["errors"] += 1
+        log.warning(f"{url}: {error} (nuovo tentativo tra {delay:.0f}s)")
+
+    def _is_new(self, entry_id):
+        if entry_id in self._seen:
+            return False
+        self._seen[entry_id] = None
+        while len(self._seen) > self.seen_max:
+            self._seen.popitem(last=False)
+        return True
+
+    def _add(self, symbol, score, published, title):
+        st = self._state.setdefault(symbol, _SymbolSentiment())
+        if published >= st.t:
+            # porta lo stato al tempo della notizia
+            d = self._decay(published - st.t)
+            st.total *= d
+            st.weight *= d
+            st.t = published
+            st.last_title = title
+            w = 1.0
+        else:
+            w = self._decay(st.t - published)
+        st.total += w * score
+        st.weight += w
+
+    async def _poll(self):
+        started = time.time()
+        due = [url for url in self.feeds if self._backoff.get(url, (0, 0.0))[1] <= started]
+        self.stats["backed_off"] += len(self.feeds) - len(due)
+        results = await asyncio.gather(*(asyncio.to_thread(self._fetch, url) for url in due),
+                                       return_exceptions=True)
+        now = time.time()
+        fresh = []
+        for url, body in zip(due, results):
+            if isinstance(body, Exception):
+                self._failed(url, body, now)
+                continue
+            self._backoff.pop(url, None)
+            if body is None:
+                self.stats["not_modified"] += 1
+                continue
+            self.stats["fetched"] += 1
+            try:
+                entries = parse_feed(body)
+            except Exception as e:
+                self.stats["errors"] += 1
+                log.warning(f"{url}: feed non valido: {e}")
+                continue
+            for entry in entries:
+                title = entry["title"]
+                key = entry["id"] or hashlib.sha1(title.encode("utf-8")).hexdigest()
+                if not title or not self._is_new(key):
+                    continue
+                symbols = match_symbols(self.index, title)
+                if symbols:
+                    published = min(entry["published"] or now, now)
+                    fresh.append((title, published, symbols))
+
+        self.stats["polls"] += 1
+        self.stats["new_entries"] += len(fresh)
+        if not fresh:
+            return 0
+
+        try:
+            scores = await asyncio.to_thread(self.scorer, [title for title, _, _ in fresh])
+        except Exception as e:
+            self.stats["errors"] += 1
+            log.warning(f"sentiment batch failed: {e}")
+            return 0
+
+        with self._lock:
+            for (title, published, symbols), score in sorted(zip(fresh, scores), key=lambda x: x[0][1]):
+                for symbol in symbols:
+                    self._add(symbol, float(score), published, title)
+        return len(fresh)
+
+    def poll_once(self):
+        """One synchronous round over every feed. Returns the number of new matched headlines."""
+        return asyncio.run(self._poll())
+
+    # ------------------------------------------------------------------
+    # Thread in background
+    # ------------------------------------------------------------------
+    async def _run(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        while not self._stop.is_set():
+            try:
+                added = await self._poll()
+                if added:
+                    log.info(f"{added} nuove notizie indicizzate")
+            except Exception as e:
+                log.warning(f"poll failed: {e}")
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._thread = threading.Thread(target=asyncio.run, args=(self._run(),),
+                                        name="news-service", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+        if self._thread:
+            self._thread.join(timeout)
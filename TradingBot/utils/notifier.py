@@ -0,0 +1,232 @@
+# utils/notifier.py
+
+"""
+Asynchronous Telegram notifications.
+
+send() only puts the text on a bounded queue and returns: the HTTP calls are
+made by one background thread, so a slow or unreachable chat API never
+delays the caller (trading loop, pipeline threads, watchdog checks). When
+the queue is full the message is dropped and counted.
+
+The sender thread:
+- keeps one pooled requests.Session (keep-alive) with connect/read timeouts;
+- sends at most one message every `min_interval` seconds (Telegram allows
+  about one per second per chat) and on HTTP 429 waits `retry_after`;
+- joins messages waiting in the queue into one, up to Telegram's 4096
+  characters, instead of sending them one by one;
+- retries network errors and 5xx with backoff, and resends as plain text
+  when Markdown cannot be parsed (symbols with "_").
+
+Messages sent with a `key` (e.g. the symbol) and a `signature` are not
+repeated while the signature for that key stays the same, for up to
+`dedup_seconds`. Per-cycle signals go through add_to_digest() and are sent
+as a single summary message by flush_digest().
+
+Only the standard library and requests are needed and the settings come in
+as arguments, so the AutoManager imports it as `TradingBot.utils.notifier`.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+
+MAX_TEXT = 4096
+API_URL = "https://api.telegram.org/bot{token}/sendMessage"
+_STOP = object()
+
+
+def split_text(text, limit=MAX_TEXT):
+    """Chunks of at most `limit` characters, cut at line ends where possible."""
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        chunks.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    if text:
+        chunks.append(text)
+    return chunks
+
+
+class TelegramNotifier:
+    def __init__(self, token, chat_id, parse_mode=None, queue_size=200, min_interval=1.0,
+                 dedup_seconds=900, timeout=(3.05, 10), max_attempts=3, logger=None):
+        self.url = API_URL.format(token=token)
+        self.chat_id = chat_id
+        self.parse_mode = parse_mode
+        self.min_interval = min_interval
+        self.dedup_seconds = dedup_seconds
+        self.timeout = tuple(timeout)
+        self.max_attempts = max_attempts
+        self.log = logger or logging.getLogger("tradingbot.Telegram")
+        self.stats = {"queued": 0, "sent": 0, "dropped": 0, "deduplicated": 0, "failed": 0}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._seen = {}      # key -> (signature, time dell'ultimo invio)
+        self._digest = {}    # key -> riga, l'ultima per chiave nel ciclo corrente
+        self._lock = threading.Lock()
+        self._thread = None
+        self._session = None
+        self._last_sent = 0.0
+        self._carry = None   # messaggio letto dalla coda ma rimandato al prossimo invio
+
+    @classmethod
+    def from_settings(cls, cfg, **kwargs):
+        params = dict(
+            queue_size=cfg.NOTIFY_QUEUE_SIZE,
+            min_interval=cfg.NOTIFY_MIN_INTERVAL_SECONDS,
+            dedup_seconds=cfg.NOTIFY_DEDUP_SECONDS,
+            timeout=cfg.NOTIFY_TIMEOUT,
+            max_attempts=cfg.NOTIFY_MAX_ATTEMPTS,
+        )
+        params.update(kwargs)
+        return cls(cfg.TELEGRAM_TOKEN, cfg.TELEGRAM_CHAT_ID, **params)
+
+    # ------------------------------------------------------------------
+    def send(self, text, key=None, signature=None):
+        """Queues `text`; False if it repeats `key`'s last signature or the queue is full."""
+        if key is not None and self._duplicate(key, text if signature is None else signature):
+            return False
+        return self._enqueue(text)
+
+    def add_to_digest(self, key, line, signature=None):
+        """Adds `line` to this cycle's summary, unless `key` already reported `signature`."""
+        if self._duplicate(key, line if signature is None else signature):
+            return False
+        with self._lock:
+            self._digest[key] = line
+        return True
+
+    def flush_digest(self, title=None):
+        """Queues the lines collected since the last flush as one message."""
+        with self._lock:
+            lines, self._digest = list(self._digest.values()), {}
+        if not lines:
+            return False
+        return self._enqueue("\n".join([title] + lines if title else lines))
+
+    def stop(self, timeout=5.0):
+        """Sends what is still queued (within `timeout`) and stops the thread."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def _duplicate(self, key, signature):
+        now = time.time()
+        with self._lock:
+            last = self._seen.get(key)
+            if last and last[0] == signature and now - last[1] < self.dedup_seconds:
+                self.stats["deduplicated"] += 1
+                return True
+            self._seen[key] = (signature, now)
+        return False
+
+    def _enqueue(self, text):
+        self._start_once()
+        try:
+            self._queue.put_nowait(text)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return False
+        self.stats["queued"] += 1
+        return True
+
+    def _start_once(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="telegram-notifier", daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    # ------------------------------------------------------------------
+    def _run(self):
+        running = True
+        while running:
+            text = self._carry if self._carry is not None else self._queue.get()
+            self._carry = None
+            if text is _STOP:
+                break
+            parts = [text]
+            running = self._coalesce_into(parts)
+            for chunk in split_text("\n\n".join(parts)):
+                try:
+                    self._deliver(chunk)
+                except Exception as e:
+                    self.stats["failed"] += 1
+                    self.log.warning(f"Telegram send failed: {e}")
+        if self._session is not None:
+            self._session.close()
+
+    def _coalesce_into(self, parts):
+        """Appends queued messages to `parts` while they fit in one message; False on stop."""
+        size = len(parts[0])
+        while True:
+            try:
+                text = self._queue.get_nowait()
+            except queue.Empty:
+                return True
+            if text is _STOP:
+                return False
+            if size + 2 + len(text) > MAX_TEXT:
+                self._carry = text
+                return True
+            parts.append(text)
+            size += 2 + len(text)
+
+    def _deliver(self, text):
+        parse_mode = self.parse_mode
+        for attempt in range(1, self.max_attempts + 1):
+            wait = self._last_sent + self.min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            payload = {"chat_id": self.chat_id, "text": text}
+            if parse_mode:
+                payload["parse_mode"] = parse_mode
+            try:
+                resp = self._http().post(self.url, data=payload, timeout=self.timeout)
+            except Exception as e:   # timeout / connessione: si riprova
+                self._last_sent = time.monotonic()
+                if attempt == self.max_attempts:
+                    raise
+                self.log.info(f"Telegram unreachable ({e}), attempt {attempt}/{self.max_attempts}")
+                time.sleep(2 ** (attempt - 1))
+                continue
+            self._last_sent = time.monotonic()
+            if resp.ok:
+                self.stats["sent"] += 1
+                return
+            if resp.status_code == 429:
+                retry_after = self._retry_after(resp)
+                self.log.info(f"Telegram rate limit, waiting {retry_after}s")
+                time.sleep(retry_after)
+            elif resp.status_code == 400 and parse_mode and "parse" in resp.text.lower():
+                parse_mode = None    # Markdown non valido: stesso testo in chiaro
+            elif resp.status_code < 500:
+                raise RuntimeError(f"HTTP {resp.status_code} {resp.text[:200]}")
+            else:
+                time.sleep(2 ** (attempt - 1))
+        raise RuntimeError(f"gave up after {self.max_attempts} attempts")
+
+    @staticmethod
+    def _retry_after(resp):
+        try:
+            return float(resp.json().get("parameters", {}).get("retry_after", 1))
+        except ValueError:
+            return 1.0
+
+    def _http(self):
+        if self._session is None:
+            import requests  # solo nel thread di invio, al primo messaggio
+            from requests.adapters import HTTPAdapter
+
+            self._session = requests.Session()
+            self._session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        return self._session
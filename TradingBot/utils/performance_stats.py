@@ -0,0 +1,181 @@
+# utils/performance_stats.py
+
+"""
+Streaming performance statistics for the live bot.
+
+Every closed trade is pushed once into a set of sliding time windows
+(settings.PERFORMANCE_WINDOWS, e.g. 24h/7d/30d) that keep running counts
+and sums, so win rate / average / total PnL are O(1) to update and to read;
+trades leaving a window are popped from its front (amortized O(1)). Equity
+ticks update a running peak and max drawdown the same way.
+
+The state (trades of the longest window + peak/drawdown) is saved to
+settings.PERFORMANCE_STATS_FILE, so a restart reloads it instead of
+rescanning trade_logs.csv, which is read only once to bootstrap the file.
+"""
+
+import csv
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import settings
+
+
+class SlidingWindow:
+    """Trades closed in the last `seconds`, with running count / wins / sum."""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.trades = deque()   # (ts, profit), dal più vecchio
+        self.wins = 0
+        self.total = 0.0
+
+    def add(self, ts, profit):
+        self.trades.append((ts, profit))
+        self.total += profit
+        if profit > 0:
+            self.wins += 1
+
+    def expire(self, now):
+        cutoff = now - self.seconds
+        trades = self.trades
+        while trades and trades[0][0] <= cutoff:
+            _, profit = trades.popleft()
+            self.total -= profit
+            if profit > 0:
+                self.wins -= 1
+        if not trades:
+            self.total = 0.0   # azzera l'errore di arrotondamento accumulato
+
+    def summary(self):
+        n = len(self.trades)
+        return {
+            "trades": n,
+            "win_rate": round(self.wins / n * 100, 2) if n else 0,
+            "avg_profit": round(self.total / n, 2) if n else 0,
+            "total_pnl": round(self.total, 2),
+        }
+
+
+class DrawdownTracker:
+    def __init__(self, peak=None, max_drawdown=0.0):
+        self.peak = peak
+        self.max_drawdown = max_drawdown
+        self.drawdown = 0.0
+
+    def update(self, equity):
+        if self.peak is None or equity > self.peak:
+            self.peak = equity
+        self.drawdown = (self.peak - equity) / self.peak if self.peak else 0.0
+        if self.drawdown > self.max_drawdown:
+            self.max_drawdown = self.drawdown
+        return self.drawdown
+
+
+class PerformanceStats:
+    def __init__(self, path=None, windows=None, save_interval=None):
+        self.path = path or settings.PERFORMANCE_STATS_FILE
+        self.save_interval = (settings.PERFORMANCE_STATS_SAVE_SECONDS
+                              if save_interval is None else save_interval)
+        self.windows = {name: SlidingWindow(seconds) for name, seconds in
+                        (windows or settings.PERFORMANCE_WINDOWS).items()}
+        self.longest = max(self.windows.values(), key=lambda w: w.seconds)
+        self.equity = DrawdownTracker()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = 0.0
+
+    # ------------------------------------------------------------------
+    def record_trade(self, profit, ts=None):
+        now = time.time()
+        ts = now if ts is None else ts
+        with self._lock:
+            for window in self.windows.values():
+                window.expire(now)
+                if ts > now - window.seconds:
+                    window.add(ts, float(profit))
+            self._dirty = True
+        self._maybe_save()
+
+    def update_equity(self, equity):
+        with self._lock:
+            before = self.equity.max_drawdown
+            self.equity.update(float(equity))
+            self._dirty = self._dirty or self.equity.max_drawdown != before
+        self._maybe_save()
+
+    def summary(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            result = {}
+            for name, window in self.windows.items():
+                window.expire(now)
+                result[name] = window.summary()
+            return result
+
+    def drawdown(self):
+        with self._lock:
+            return {
+                "peak_equity": self.equity.peak,
+                "drawdown": self.equity.drawdown,
+                "max_drawdown": self.equity.max_drawdown,
+            }
+
+    # ------------------------------------------------------------------
+    # Persistenza
+    # ------------------------------------------------------------------
+    def _maybe_save(self):
+        if self._dirty and time.time() - self._saved_at >= self.save_interval:
+            self.save()
+
+    def save(self):
+        with self._lock:
+            self.longest.expire(time.time())
+            state = {
+                "trades": list(self.longest.trades),
+                "peak_equity": self.equity.peak,
+                "max_drawdown": self.equity.max_drawdown,
+            }
+            self._dirty = False
+            self._saved_at = time.time()
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+    def load(self, csv_path=None):
+        """Restores the saved state; without one, bootstraps once from trade_logs.csv."""
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                state = json.load(f)
+            trades = state.get("trades", [])
+            self.equity = DrawdownTracker(state.get("peak_equity"), state.get("max_drawdown", 0.0))
+        else:
+            trades = self._read_csv(csv_path or settings.TRADE_LOG_CSV)
+            self._dirty = bool(trades)
+
+        now = time.time()
+        with self._lock:
+            for ts, profit in sorted(trades):
+                if ts > now - self.longest.seconds:
+                    for window in self.windows.values():
+                        window.add(ts, profit)
+        return self
+
+    @staticmethod
+    def _read_csv(path):
+        if not os.path.exists(path):
+            return []
+        trades = []
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                try:
+                    ts = datetime.strptime(row["timestamp"], "%Y-%m-%d %H:%M:%S").timestamp()
+                    trades.append((ts, float(row["profit"])))
+                except (KeyError, TypeError, ValueError):
+                    continue
+        return trades
@@ -0,0 +1,221 @@
+# utils/runtime_config.py
+
+"""
+Runtime-tunable parameters, changed without rewriting settings.py.
+
+settings.py keeps the defaults; the keys listed in
+settings.RUNTIME_CONFIG_KEYS can be changed while the bot runs. Their
+current values live in an immutable ConfigSnapshot: hot-path code grabs
+`config.current` once (a plain attribute read) and uses it for the whole
+cycle, so it never sees half of a multi-key update. Each update is
+validated against the type of the default, produces a new snapshot with
+version + 1, is saved to the sidecar settings.RUNTIME_CONFIG_FILE and is
+passed to the subscribers.
+
+The sidecar holds only the overridden keys and is applied on top of the
+defaults at start-up; `reload_if_changed` picks up changes written by
+another process (e.g. Telegram or the AutoManager while the bot is down).
+
+Standard library only; the settings module is passed in, so the store can
+also be used as `TradingBot.utils.runtime_config`. Changes are logged to
+"tradingbot.Config", written out by the bot's queued logger.
+"""
+
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+
+TRUE_WORDS = {"1", "true", "on", "yes", "si"}
+FALSE_WORDS = {"0", "false", "off", "no"}
+
+log = logging.getLogger("tradingbot.Config")   # niente utils.logger: importa settings
+
+
+class ConfigSnapshot:
+    """Read-only view of the runtime parameters at one version."""
+
+    __slots__ = ("version", "values")
+
+    def __init__(self, version, values):
+        object.__setattr__(self, "version", version)
+        object.__setattr__(self, "values", MappingProxyType(values))
+
+    def __getattr__(self, key):
+        try:
+            return self.values[key]
+        except KeyError:
+            raise AttributeError(key) from None
+
+    def __setattr__(self, key, value):
+        raise AttributeError("ConfigSnapshot è in sola lettura: usare RuntimeConfig.update")
+
+    def get(self, key, default=None):
+        return self.values.get(key, default)
+
+    def as_dict(self):
+        return copy.deepcopy(dict(self.values))
+
+
+def coerce(key, value, default):
+    """`value` converted to the type of `default` (strings from Telegram/JSON included)."""
+    if isinstance(default, bool):
+        if isinstance(value, str):
+            word = value.strip().lower()
+            if word in TRUE_WORDS:
+                return True
+            if word in FALSE_WORDS:
+                return False
+            raise ValueError(f"{key}: valore booleano non valido: {value!r}")
+        return bool(value)
+    if isinstance(default, int):
+        return int(float(value)) if isinstance(value, str) else int(value)
+    if isinstance(default, float):
+        return float(value)
+    if isinstance(default, str):
+        return str(value)
+    if isinstance(default, dict):
+        if isinstance(value, str):
+            value = json.loads(value)
+        if not isinstance(value, dict):
+            raise ValueError(f"{key}: atteso un dizionario")
+        return value
+    return value
+
+
+def _merge(base, patch):
+    merged = copy.deepcopy(base)
+    for k, v in patch.items():
+        merged[k] = _merge(merged[k], v) if isinstance(v, dict) and isinstance(merged.get(k), dict) else v
+    return merged
+
+
+class RuntimeConfig:
+    def __init__(self, cfg, keys=None, path=None):
+        self.defaults = {key: copy.deepcopy(getattr(cfg, key)) for key in (keys or cfg.RUNTIME_CONFIG_KEYS)}
+        base = os.path.dirname(os.path.abspath(cfg.__file__))
+        self.path = os.path.join(base, path or cfg.RUNTIME_CONFIG_FILE)
+        self.current = ConfigSnapshot(0, copy.deepcopy(self.defaults))
+        self._overrides = {}
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._mtime = None
+
+    # ------------------------------------------------------------------
+    def get(self, key):
+        return self.current.values[key]
+
+    def subscribe(self, callback, keys=None):
+        """callback(snapshot, changed_keys) after every update touching `keys` (all if None)."""
+        entry = (callback, set(keys) if keys else None)
+        self._subscribers.append(entry)
+        return lambda: self._subscribers.remove(entry)
+
+    def set(self, key, value, source=None):
+        return self.update({key: value}, source=source)
+
+    def update(self, changes, source=None, merge=True, persist=True):
+        """
+        Validates and applies all `changes` at once; returns the new snapshot.
+        Dict parameters are merged key by key unless merge=False.
+        """
+        with self._lock:
+            values = self.current.as_dict()
+            changed = {}
+            for key, value in changes.items():
+                if key not in self.defaults:
+                    raise KeyError(f"{key} non modificabile a caldo")
+                value = coerce(key, value, self.defaults[key])
+                if isinstance(value, dict) and merge:
+                    value = _merge(values[key], value)
+                if value != values[key]:
+                    values[key] = changed[key] = value
+            if not changed:
+                return self.current
+            snapshot = ConfigSnapshot(self.current.version + 1, values)
+            self.current = snapshot   # scambio atomico del riferimento
+            self._overrides.update(copy.deepcopy(changed))
+            if persist:
+                self._save(snapshot.version, source)
+        log.info(f"v{snapshot.version} {', '.join(f'{k}={v!r}' for k, v in changed.items())}"
+                 + (f" ({source})" if source else ""))
+        self._notify(snapshot, set(changed))
+        return snapshot
+
+    def _notify(self, snapshot, changed):
+        for callback, keys in list(self._subscribers):
+            if keys is None or keys & changed:
+                try:
+                    callback(snapshot, changed)
+                except Exception as e:
+                    log.warning(f"subscriber fallito: {e}")
+
+    # ------------------------------------------------------------------
+    # Persistenza (sidecar JSON)
+    # ------------------------------------------------------------------
+    def _save(self, version, source):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        state = {"version": version, "updated_at": time.time(), "source": source,
+                 "values": self._overrides}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+    def _read(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+    def _apply_sidecar(self, state):
+        overrides = {k: v for k, v in state.get("values", {}).items() if k in self.defaults}
+        # il sidecar è lo stato completo: le chiavi tolte da un altro processo tornano ai default
+        values = {key: overrides.get(key, default) for key, default in self.defaults.items()}
+        snapshot = self.update(values, source="sidecar", merge=False, persist=False)
+        with self._lock:
+            self._overrides = copy.deepcopy(overrides)
+        if snapshot.version < state.get("version", 0):
+            # stessa numerazione di chi ha scritto il file
+            with self._lock:
+                self.current = snapshot = ConfigSnapshot(state["version"], dict(snapshot.values))
+        return snapshot
+
+    def load(self):
+        """Applies the saved overrides on top of the settings.py defaults."""
+        if os.path.exists(self.path):
+            self._mtime = os.path.getmtime(self.path)
+            self._apply_sidecar(self._read())
+        return self
+
+    def reload_if_changed(self):
+        """Re-reads the sidecar if another process rewrote it (one os.stat when unchanged)."""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return self.current
+        if mtime == self._mtime:
+            return self.current
+        self._mtime = mtime
+        state = self._read()
+        if state.get("version", 0) <= self.current.version:
+            return self.current
+        return self._apply_sidecar(state)
+
+
+_config = None
+_config_lock = threading.Lock()
+
+
+def get_runtime_config(cfg=None):
+    """Process-wide RuntimeConfig for the settings module `cfg`, loaded on first use."""
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                if cfg is None:
+                    import settings as cfg
+                _config = RuntimeConfig(cfg).load()
+    return _config
@@ -1,4 +1,4 @@
-import MetaTrader5 as mt5
+from data_sources.broker import mt5
 import pandas as pd
 import os
 import json
@@ -0,0 +1,332 @@
+# utils/streaming_indicators.py
+
+"""
+Incremental (O(1) per closed bar) indicator state per (symbol, timeframe).
+
+The live loop used to recompute SMA/ATR/... over settings.BAR_COUNT bars on
+every cycle just to read the last value. Here each indicator keeps a small
+running state and is fed only the bars closed since the previous update.
+Formulas and warm-up match utils/vector_indicators.py (pandas_ta defaults),
+and the exposed names are the columns StrategyManager.calculate_signals reads.
+"""
+
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+NAN = float("nan")
+
+
+class RollingSum:
+    """
+    Fixed-window sum; re-summed exactly each time the ring wraps to limit
+    drift. NaNs are counted, not added: the sum is NaN while the window
+    holds one, as with pandas rolling().
+    """
+
+    def __init__(self, length):
+        self.length = length
+        self.buf = [0.0] * length
+        self.idx = 0
+        self.count = 0
+        self.nans = 0
+        self.total = 0.0
+
+    def update(self, x):
+        old = self.buf[self.idx]
+        self.buf[self.idx] = x
+        self.idx = (self.idx + 1) % self.length
+        if self.count < self.length:
+            self.count += 1
+        elif math.isnan(old):
+            self.nans -= 1
+        else:
+            self.total -= old
+        if math.isnan(x):
+            self.nans += 1
+        else:
+            self.total += x
+        if self.idx == 0:
+            self.total = math.fsum(v for v in self.buf if not math.isnan(v))
+        return self.total if not self.nans else NAN
+
+    @property
+    def ready(self):
+        return self.count >= self.length
+
+
+class SMA:
+    def __init__(self, length):
+        self.sum = RollingSum(length)
+        self.value = NAN
+
+    def update(self, x):
+        total = self.sum.update(x)
+        self.value = total / self.sum.length if self.sum.ready else NAN
+        return self.value
+
+
+class RollingStd:
+    """Population std (ddof=0) over a fixed window, sliding Welford update."""
+
+    def __init__(self, length):
+        self.length = length
+        self.window = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.updates = 0
+        self.value = NAN
+
+    def update(self, x):
+        n = self.length
+        if len(self.window) < n:
+            self.window.append(x)
+            k = len(self.window)
+            delta = x - self.mean
+            self.mean += delta / k
+            self.m2 += delta * (x - self.mean)
+        else:
+            old = self.window.popleft()
+            self.window.append(x)
+            new_mean = self.mean + (x - old) / n
+            self.m2 += (x - old) * (x - new_mean + old - self.mean)
+            self.mean = new_mean
+        self.updates += 1
+        if self.updates % n == 0:
+            # ricalcolo esatto ogni `n` barre: costo ammortizzato O(1)
+            k = len(self.window)
+            self.mean = math.fsum(self.window) / k
+            self.m2 = math.fsum((v - self.mean) ** 2 for v in self.window)
+        self.value = math.sqrt(max(self.m2, 0.0) / n) if len(self.window) == n else NAN
+        return self.value
+
+
+class RollingExtreme:
+    """Rolling max (or min) with a monotonic deque, amortized O(1)."""
+
+    def __init__(self, length, mode="max"):
+        self.length = length
+        self.is_max = mode == "max"
+        self.dq = deque()
+        self.i = 0
+        self.value = NAN
+
+    def update(self, x):
+        dq = self.dq
+        if self.is_max:
+            while dq and dq[-1][1] <= x:
+                dq.pop()
+        else:
+            while dq and dq[-1][1] >= x:
+                dq.pop()
+        dq.append((self.i, x))
+        if dq[0][0] <= self.i - self.length:
+            dq.popleft()
+        self.i += 1
+        self.value = dq[0][1] if self.i >= self.length else NAN
+        return self.value
+
+
+class EMA:
+    """alpha=2/(length+1), seeded with the SMA of the first `length` values (NaN skipped)."""
+
+    def __init__(self, length):
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+        self.seed = []
+        self.value = NAN
+
+    def update(self, x):
+        if math.isnan(x):
+            return self.value
+        if self.seed is not None:
+            self.seed.append(x)
+            if len(self.seed) == self.length:
+                self.value = sum(self.seed) / self.length
+                self.seed = None
+            return self.value
+        self.value = self.alpha * x + (1 - self.alpha) * self.value
+        return self.value
+
+
+class RMA:
+    """
+    Wilder smoothing as pandas_ta.rma (ewm alpha=1/length, adjust=True): the
+    weighted mean of all values so far, NaN until `length` values are seen.
+    """
+
+    def __init__(self, length):
+        self.length = length
+        self.decay = 1.0 - 1.0 / length
+        self.count = 0
+        self.num = 0.0      # somma pesata dei valori
+        self.den = 0.0      # somma dei pesi
+        self.value = NAN
+
+    def update(self, x):
+        if math.isnan(x) and self.count == 0:
+            return self.value
+        self.num = x + self.decay * self.num
+        self.den = 1.0 + self.decay * self.den
+        self.count += 1
+        self.value = self.num / self.den if self.count >= self.length else NAN
+        return self.value
+
+
+class IndicatorState:
+    """
+    Running indicator set for one (symbol, timeframe). update_bar() is O(1);
+    values() returns close plus the columns read by
+    StrategyManager.calculate_signals and ATR, as of the last closed bar.
+    """
+
+    COLUMNS = ("MA_50", "MA_200", "RSI", "MACD", "MACD_signal", "Stoch",
+               "BBL", "BBU", "OBV", "ATR", "SpanA", "SpanB")
+
+    def __init__(self):
+        self.last_time = None
+        self.bars = 0
+        self.prev_close = NAN
+
+        self.ma50 = SMA(50)
+        self.ma200 = SMA(200)
+        self.bb_mid = SMA(20)
+        self.bb_std = RollingStd(20)
+        self.rsi_up = RMA(14)
+        self.rsi_down = RMA(14)
+        self.atr = RMA(14)
+        self.ema_fast = EMA(12)
+        self.ema_slow = EMA(26)
+        self.macd_signal = EMA(9)
+        self.stoch_hh = RollingExtreme(14, "max")
+        self.stoch_ll = RollingExtreme(14, "min")
+        self.stoch_k = SMA(3)
+        self.obv = 0.0
+        self.tenkan_hh = RollingExtreme(9, "max")
+        self.tenkan_ll = RollingExtreme(9, "min")
+        self.kijun_hh = RollingExtreme(26, "max")
+        self.kijun_ll = RollingExtreme(26, "min")
+        self.senkou_hh = RollingExtreme(52, "max")
+        self.senkou_ll = RollingExtreme(52, "min")
+        self.spans = deque(maxlen=27)  # (span_a, span_b) proiettate 26 barre avanti
+
+        self._values = dict.fromkeys(("close",) + self.COLUMNS, NAN)
+        self._prev_values = dict(self._values)
+
+    def update_bar(self, t, high, low, close, volume):
+        prev = self.prev_close
+        diff = close - prev if not math.isnan(prev) else NAN
+
+        ma50 = self.ma50.update(close)
+        ma200 = self.ma200.update(close)
+
+        up = self.rsi_up.update(max(diff, 0.0) if not math.isnan(diff) else NAN)
+        down = self.rsi_down.update(max(-diff, 0.0) if not math.isnan(diff) else NAN)
+        rsi = 100.0 * up / (up + down) if (up + down) else NAN
+
+        fast = self.ema_fast.update(close)
+        slow = self.ema_slow.update(close)
+        macd = fast - slow
+        macd_signal = self.macd_signal.update(macd)
+
+        hh = self.stoch_hh.update(high)
+        ll = self.stoch_ll.update(low)
+        raw = 100.0 * (close - ll) / (hh - ll) if (hh - ll) else NAN
+        stoch = self.stoch_k.update(raw)
+
+        mid = self.bb_mid.update(close)
+        std = self.bb_std.update(close)
+
+        if not math.isnan(prev):
+            tr = max(high - low, abs(high - prev), abs(low - prev))
+        else:
+            tr = NAN
+        atr = self.atr.update(tr)
+
+        if diff > 0:
+            self.obv += volume
+        elif diff < 0:
+            self.obv -= volume
+
+        tenkan = (self.tenkan_hh.update(high) + self.tenkan_ll.update(low)) / 2
+        kijun = (self.kijun_hh.update(high) + self.kijun_ll.update(low)) / 2
+        senkou = (self.senkou_hh.update(high) + self.senkou_ll.update(low)) / 2
+        self.spans.append(((tenkan + kijun) / 2, senkou))
+        span_a, span_b = self.spans[0] if len(self.spans) == self.spans.maxlen else (NAN, NAN)
+
+        self._prev_values = self._values
+        self._values = {
+            "close": close, "MA_50": ma50, "MA_200": ma200, "RSI": rsi,
+            "MACD": macd, "MACD_signal": macd_signal, "Stoch": stoch,
+            "BBL": mid - 2.0 * std, "BBU": mid + 2.0 * std,
+            "OBV": self.obv, "ATR": atr, "SpanA": span_a, "SpanB": span_b,
+        }
+        self.prev_close = close
+        self.last_time = int(t)
+        self.bars += 1
+
+    def update(self, rates, forming_last=False):
+        """
+        Feeds the bars of `rates` newer than the last one seen. With
+        forming_last=True the last row is the still-open bar and is skipped.
+        Accepts a rates array or a DataFrame (epoch or datetime `time`).
+        Returns the number of bars ingested.
+        """
+        times = np.asarray(rates["time"])
+        if times.dtype.kind == "M":
+            times = times.astype("datetime64[s]").astype("int64")
+        end = len(times) - 1 if forming_last else len(times)
+        start = 0
+        if self.last_time is not None:
+            # le barre sono ordinate: parto dalla prima più recente di last_time
+            start = end
+            while start > 0 and int(times[start - 1]) > self.last_time:
+                start -= 1
+            if start == 0 and end > 0:
+                # buco nello storico (bot fermo più di una finestra): si riparte da zero
+                self.__init__()
+        cols = [np.asarray(rates[c], dtype="float64")[start:end].tolist()
+                for c in ("high", "low", "close", "tick_volume")]
+        for t, high, low, close, volume in zip(times[start:end].tolist(), *cols):
+            self.update_bar(t, high, low, close, volume)
+        return max(0, end - start)
+
+    def values(self):
+        return dict(self._values)
+
+    def to_frame(self):
+        """
+        Last two snapshots (close + indicators) as a DataFrame: enough for
+        calculate_signals (OBV.diff()) and detect_phase_for_symbol (close[-2:]).
+        """
+        return pd.DataFrame([self._prev_values, self._values])
+
+
+class StreamingIndicatorEngine:
+    """Registry of IndicatorState keyed by (symbol, timeframe)."""
+
+    def __init__(self):
+        self.states = {}
+
+    def state(self, symbol, timeframe):
+        key = (symbol, timeframe)
+        if key not in self.states:
+            self.states[key] = IndicatorState()
+        return self.states[key]
+
+    def update(self, symbol, timeframe, rates, forming_last=False):
+        state = self.state(symbol, timeframe)
+        state.update(rates, forming_last=forming_last)
+        return state.values()
+
+    def frame(self, symbol, timeframe):
+        return self.state(symbol, timeframe).to_frame()
+
+    def reset(self, symbol=None):
+        if symbol is None:
+            self.states.clear()
+        else:
+            for key in [k for k in self.states if k[0] == symbol]:
+                del self.states[key]
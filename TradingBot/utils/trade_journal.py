@@ -0,0 +1,189 @@
+# utils/trade_journal.py
+
+"""
+Append-only trade journal on SQLite (WAL).
+
+One row per event (trade opened / closed) with its epoch timestamp. Inserts
+are O(1) (no file rewrite as with openpyxl) and time-window queries walk the
+`ts` index, O(log n) plus the rows returned. The XLSX with the historical
+column layout is produced only on demand by export_xlsx().
+
+Stdlib only and no settings import: used by TradingBot and AutoManager alike.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+# Colonne di trade_history.xlsx (stesso ordine dell'export)
+XLSX_HEADERS = [
+    "Timestamp", "Ticket", "Symbol", "Direction", "Size", "Entry",
+    "SL", "TP", "Profit(%)", "Phase", "Used Indicators", "Confidence",
+    "Slippage", "Outcome"
+]
+
+COLUMNS = ("ts", "status", "ticket", "symbol", "direction", "size", "entry",
+           "sl", "tp", "profit_pct", "phase", "used_indicators", "confidence",
+           "slippage", "outcome")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    status TEXT NOT NULL,
+    ticket INTEGER,
+    symbol TEXT,
+    direction TEXT,
+    size REAL,
+    entry REAL,
+    sl REAL,
+    tp REAL,
+    profit_pct REAL,
+    phase TEXT,
+    used_indicators TEXT,
+    confidence REAL,
+    slippage REAL,
+    outcome TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_trades_ts ON trades (ts);
+CREATE INDEX IF NOT EXISTS idx_trades_status_ts ON trades (status, ts);
+"""
+INSERT_SQL = f"INSERT INTO trades ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def journal_path(cfg):
+    """TRADE_JOURNAL_DB of the settings module `cfg`, relative to its folder (same file for every process)."""
+    base = os.path.dirname(os.path.abspath(cfg.__file__))
+    return os.path.join(base, cfg.TRADE_JOURNAL_DB)
+
+
+class TradeJournal:
+    def __init__(self, path):
+        self.path = path
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # con WAL resta consistente ai crash
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ------------------------------------------------------------------
+    # Scrittura
+    # ------------------------------------------------------------------
+    def append(self, record, ts=None):
+        """Appends one event. `record` uses COLUMNS keys; missing ones are NULL."""
+        row = dict(record, ts=time.time() if ts is None else ts)
+        values = [row.get(c) for c in COLUMNS]
+        with self._lock:
+            self._conn.execute(INSERT_SQL, values)
+
+    def append_many(self, records):
+        rows = [[dict(r).get(c) for c in COLUMNS] for r in records]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(INSERT_SQL, rows)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    # ------------------------------------------------------------------
+    # Lettura
+    # ------------------------------------------------------------------
+    def range(self, start=None, end=None, status=None, symbol=None):
+        """Events with start <= ts < end (epoch seconds), oldest first."""
+        clauses, params = [], []
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(status)
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(end)
+        if symbol is not None:
+            clauses.append("symbol = ?")
+            params.append(symbol)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(f"SELECT * FROM trades {where} ORDER BY ts", params).fetchall()
+        return [dict(r) for r in rows]
+
+    def recent(self, minutes, status="closed", now=None):
+        now = time.time() if now is None else now
+        return self.range(start=now - minutes * 60, status=status)
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # XLSX (solo su richiesta)
+    # ------------------------------------------------------------------
+    def export_xlsx(self, path, start=None, end=None):
+        """Writes the journal (optionally a time window) in the trade_history.xlsx layout."""
+        import openpyxl
+
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet("Trades")
+        ws.append(XLSX_HEADERS)
+        rows = self.range(start=start, end=end)
+        for r in rows:
+            closed = r["status"] == "closed"
+            ws.append([
+                datetime.fromtimestamp(r["ts"]).strftime(TIME_FORMAT),
+                r["ticket"], r["symbol"], r["direction"], r["size"], r["entry"],
+                r["sl"], r["tp"],
+                f"{r['profit_pct']:.2f}" if closed and r["profit_pct"] is not None else "N/A",
+                r["phase"], r["used_indicators"],
+                f"{r['confidence'] or 0.0:.2f}",
+                r["slippage"] if closed else None,
+                r["outcome"] if closed else None,
+            ])
+        wb.save(path)
+        return len(rows)
+
+    def import_xlsx(self, path):
+        """One-off migration of a legacy trade_history.xlsx. Returns the rows imported."""
+        import openpyxl
+
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        if "Trades" not in wb.sheetnames:
+            return 0
+        records = []
+        for row in wb["Trades"].iter_rows(min_row=2, values_only=True):
+            if not row or not row[0]:
+                continue
+            row = list(row) + [None] * (len(XLSX_HEADERS) - len(row))
+            try:
+                ts = datetime.strptime(str(row[0]), TIME_FORMAT).timestamp()
+            except ValueError:
+                continue
+            try:
+                profit, status = float(row[8]), "closed"
+            except (TypeError, ValueError):
+                profit, status = None, "open"   # "N/A" = riga di apertura
+            records.append({
+                "ts": ts, "status": status, "ticket": row[1], "symbol": row[2],
+                "direction": row[3], "size": row[4], "entry": row[5], "sl": row[6],
+                "tp": row[7], "profit_pct": profit, "phase": row[9],
+                "used_indicators": row[10],
+                "confidence": float(row[11]) if row[11] not in (None, "") else None,
+                "slippage": row[12], "outcome": row[13],
+            })
+        wb.close()
+        if records:
+            self.append_many(records)
+        return len(records)
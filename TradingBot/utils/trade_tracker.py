@@ -1,37 +1,47 @@
 # TradingBot/utils/trade_tracker.py
 
-import openpyxl
-from openpyxl.utils import get_column_letter
 import os
+import threading
 import settings
 from datetime import datetime
+from utils.trade_journal import TradeJournal, journal_path
+from utils.logger import get_logger
+
+log = get_logger("TradeTracker")
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_journal():
+    """Shared TradeJournal; on first creation imports the legacy trade_history.xlsx if present."""
+    global _journal
+    if _journal is None:
+        with _journal_lock:
+            if _journal is None:
+                journal = TradeJournal(journal_path(settings))
+                legacy = settings.TRADE_HISTORY_FILE
+                if journal.count() == 0 and os.path.exists(legacy):
+                    try:
+                        n = journal.import_xlsx(legacy)
+                        log.info(f"Importati {n} trade da {legacy}")
+                    except Exception as e:
+                        log.warning(f"Import di {legacy} fallito: {e}")
+                _journal = journal
+    return _journal
+
 
 def initialize_trade_history():
-    file_path = settings.TRADE_HISTORY_FILE
-    if not os.path.exists(file_path):
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Trades"
-        headers = [
-            "Timestamp", "Ticket", "Symbol", "Direction", "Size", "Entry",
-            "SL", "TP", "Profit(%)", "Phase", "Used Indicators", "Confidence",
-            "Slippage", "Outcome"
-        ]
-        for col_idx, header in enumerate(headers, start=1):
-            ws.cell(row=1, column=col_idx, value=header)
-        wb.save(file_path)
+    get_journal()
 
-def log_closed_trade(trade, pl_pct):
-    file_path = settings.TRADE_HISTORY_FILE
-    if not os.path.exists(file_path):
-        initialize_trade_history()
 
-    wb = openpyxl.load_workbook(file_path)
-    ws = wb["Trades"]
+def export_trade_history(path=None, start=None, end=None):
+    """Writes trade_history.xlsx (or `path`) from the journal, for human review."""
+    path = path or settings.TRADE_HISTORY_FILE
+    return get_journal().export_xlsx(path, start=start, end=end)
 
-    next_row = ws.max_row + 1
-    now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+def log_closed_trade(trade, pl_pct):
     requested_price = trade.get("entry")
     filled_price = trade.get("filled_price", requested_price)
     slippage = round(filled_price - requested_price, 5)
@@ -43,78 +53,47 @@ def log_closed_trade(trade, pl_pct):
     else:
         outcome = "BE"
 
-    row_data = [
-        now_str,
-        trade.get('ticket'),
-        trade.get('symbol'),
-        trade.get('direction'),
-        trade.get('size'),
-        trade.get('entry'),
-        trade.get('sl'),
-        trade.get('tp'),
-        f"{pl_pct:.2f}",
-        trade.get('phase'),
-        ",".join(trade.get('used_indicators', [])),
-        f"{trade.get('confidence', 0.0):.2f}",
-        slippage,
-        outcome
-    ]
-
-    for col_idx, val in enumerate(row_data, start=1):
-        ws.cell(row=next_row, column=col_idx, value=val)
+    get_journal().append({
+        "status": "closed",
+        "ticket": trade.get('ticket'),
+        "symbol": trade.get('symbol'),
+        "direction": trade.get('direction'),
+        "size": trade.get('size'),
+        "entry": trade.get('entry'),
+        "sl": trade.get('sl'),
+        "tp": trade.get('tp'),
+        "profit_pct": round(pl_pct, 2),
+        "phase": trade.get('phase'),
+        "used_indicators": ",".join(trade.get('used_indicators', [])),
+        "confidence": round(trade.get('confidence', 0.0), 2),
+        "slippage": slippage,
+        "outcome": outcome,
+    })
 
-    wb.save(file_path)
 
 def log_open_trade(trade):
-    file_path = settings.TRADE_HISTORY_FILE
-    if not os.path.exists(file_path):
-        initialize_trade_history()
-
-    wb = openpyxl.load_workbook(file_path)
-    ws = wb["Trades"]
-    next_row = ws.max_row + 1
-    now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    row_data = [
-        now_str,
-        trade.get('ticket'),
-        trade.get('symbol'),
-        trade.get('direction'),
-        trade.get('size'),
-        trade.get('entry'),
-        trade.get('sl'),
-        trade.get('tp'),
-        "N/A",
-        trade.get('phase'),
-        ",".join(trade.get('used_indicators', [])),
-        f"{trade.get('confidence',0.0):.2f}"
-    ]
-    for col_idx, val in enumerate(row_data, start=1):
-        ws.cell(row=next_row, column=col_idx, value=val)
+    get_journal().append({
+        "status": "open",
+        "ticket": trade.get('ticket'),
+        "symbol": trade.get('symbol'),
+        "direction": trade.get('direction'),
+        "size": trade.get('size'),
+        "entry": trade.get('entry'),
+        "sl": trade.get('sl'),
+        "tp": trade.get('tp'),
+        "phase": trade.get('phase'),
+        "used_indicators": ",".join(trade.get('used_indicators', [])),
+        "confidence": round(trade.get('confidence', 0.0), 2),
+    })
 
-    wb.save(file_path)
 
 def load_recent_trades(minutes: int = settings.PERFORMANCE_TIME_DECAY):
-    from datetime import datetime, timedelta
-    trades = []
-    file_path = settings.TRADE_HISTORY_FILE
-    if not os.path.exists(file_path):
-        return trades
-
-    wb = openpyxl.load_workbook(file_path, data_only=True)
-    ws = wb["Trades"]
-    now = datetime.utcnow()
-
-    for row in ws.iter_rows(min_row=2, values_only=True):
-        try:
-            timestamp_str = row[0]
-            profit_pct = float(row[8])
-            outcome = row[13]
-            ts = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S")
-            if (now - ts) > timedelta(minutes=minutes):
-                continue
-            correct = outcome == "win"
-            trades.append({"timestamp": ts, "profit": profit_pct, "correct": correct})
-        except:
-            continue
-    return trades
\ No newline at end of file
+    """Closed trades of the last `minutes`: [{"timestamp", "profit", "correct"}], oldest first."""
+    return [
+        {
+            "timestamp": datetime.fromtimestamp(r["ts"]),
+            "profit": r["profit_pct"] or 0.0,
+            "correct": r["outcome"] == "win",
+        }
+        for r in get_journal().recent(minutes)
+    ]
@@ -1,10 +1,15 @@
 # utils/training_data_builder.py
 import os
 import json
-from datetime import datetime
+import atexit
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
 import pandas as pd
 import numpy as np
-import MetaTrader5 as mt5
+from numpy.lib.stride_tricks import sliding_window_view
+from data_sources import bar_store
+from data_sources.broker import mt5, serves_forming_bar
+from data_sources.fake_mt5_reader import TIMEFRAME_LABELS
 import settings
 from logic.fusion_engine import get_market_phase
 from utils.generate_training_csv import enrich_with_indicators
@@ -12,34 +17,48 @@ from utils.generate_training_csv import enrich_with_indicators
 # Quanti bars scaricare
 BARS = settings.OHLCV_BARS
 
-# Mappa label → codice MT5
-TF_MAP = {
-    "M1": mt5.TIMEFRAME_M1,
-    "M5": mt5.TIMEFRAME_M5,
-    "M15": mt5.TIMEFRAME_M15,
-    "M30": mt5.TIMEFRAME_M30,
-    "H1": mt5.TIMEFRAME_H1,
-    "H4": mt5.TIMEFRAME_H4,
-    "D1": mt5.TIMEFRAME_D1,
-    "W1": mt5.TIMEFRAME_W1,
-    "MN1": mt5.TIMEFRAME_MN1,
-}
-
-def fetch_ohlcv_mt5(symbol: str, tf_label: str, bars: int) -> pd.DataFrame:
+# Mappa label → codice MT5. I codici vengono dalle costanti del replay (stessi valori
+# del terminale): leggerli dal proxy all'import creerebbe il backend prima di set_broker()
+TF_MAP = {label: code for code, label in TIMEFRAME_LABELS.items()}
+
+# Sessione broker del processo: aperta una volta (worker del pool o chiamante)
+_session_open = False
+
+
+def open_broker_session():
+    """Initializes the broker once per process; closed at interpreter exit."""
+    global _session_open
+    if not _session_open:
+        if not mt5.initialize():
+            raise RuntimeError("MT5 init failed")
+        atexit.register(mt5.shutdown)
+        _session_open = True
+
+
+def fetch_ohlcv_mt5(symbol: str, tf_label: str, bars: int, since: int | None = None) -> pd.DataFrame:
+    """
+    Closed bars of (symbol, tf_label): the last `bars`, or all bars newer
+    than epoch `since`. Uses the process broker session.
+    """
+    open_broker_session()
     code = TF_MAP[tf_label]
-    if not mt5.initialize():
-        raise RuntimeError("MT5 init failed")
-    rates = mt5.copy_rates_from(symbol, code, datetime.now(), bars)
-    mt5.shutdown()
+    if since is None:
+        rates = mt5.copy_rates_from_pos(symbol, code, 0, bars)
+    else:
+        rates = mt5.copy_rates_range(symbol, code,
+                                     datetime.fromtimestamp(since + 1, tz=timezone.utc),
+                                     datetime.now(tz=timezone.utc))
     df = pd.DataFrame(rates)
     if df.empty:
         return df
+    if serves_forming_bar():
+        df = df.iloc[:-1]   # l'ultima barra è ancora aperta
     df['time'] = pd.to_datetime(df['time'], unit='s')
     return df
 
-def fetch_or_aggregate(symbol: str, tf_label: str, bars: int) -> pd.DataFrame:
-    df = fetch_ohlcv_mt5(symbol, tf_label, bars)
-    if not df.empty:
+def fetch_or_aggregate(symbol: str, tf_label: str, bars: int, since: int | None = None) -> pd.DataFrame:
+    df = fetch_ohlcv_mt5(symbol, tf_label, bars, since)
+    if not df.empty or since is not None:
         return df
 
     if tf_label == "M15":
@@ -47,7 +66,7 @@ def fetch_or_aggregate(symbol: str, tf_label: str, bars: int) -> pd.DataFrame:
         if df5.empty:
             return pd.DataFrame()
         df5.set_index('time', inplace=True)
-        df15 = df5.resample("15T").agg({
+        df15 = df5.resample("15min").agg({
             "open": "first",
             "high": "max",
             "low": "min",
@@ -57,122 +76,205 @@ def fetch_or_aggregate(symbol: str, tf_label: str, bars: int) -> pd.DataFrame:
         # ——— FILL MISSING RAW COLUMNS ———
         df15['spread'] = 0
         df15['real_volume'] = df15['tick_volume']
-        # alias tick_volume → volume
-        df15['volume'] = df15['tick_volume']
         return df15
 
     return pd.DataFrame()
 
-def build_from_symbol(symbol: str):
-    """Costruisci i CSV per un singolo simbolo."""
-    # lista dei timeframe
+def update_dataset(symbol: str, tf_label: str, bars: int = BARS) -> tuple[str, str, int]:
+    """
+    Brings the (symbol, tf_label) dataset up to date: a full download of
+    `bars` the first time, afterwards only the bars closed since the last
+    one in the manifest. Returns (symbol, tf_label, rows added).
+    """
+    manifest = bar_store.read_manifest(symbol, tf_label)
+    since = manifest["last_time"] if manifest else None
+    df = fetch_or_aggregate(symbol, tf_label, bars, since)
+    added = bar_store.append_bars(symbol, tf_label, df) if not df.empty else 0
+    print(f"[DATA] {symbol} @ {tf_label}: +{added} bars")
+    return symbol, tf_label, added
+
+def _update_dataset_safe(symbol, tf_label, bars):
+    try:
+        return update_dataset(symbol, tf_label, bars)
+    except Exception as e:
+        print(f"[DATA] FAILED for {symbol} {tf_label}: {e}")
+        return symbol, tf_label, -1
+
+def enabled_timeframes() -> list[str]:
     if settings.MULTI_TIMEFRAME_ENABLED:
-        tf_list = [label for _, label in settings.MULTI_TIMEFRAME_LIST][: settings.MAX_TIMEFRAMES]
-    else:
-        tf_list = [settings.DEFAULT_TIMEFRAME]
-
-    os.makedirs("data/processed", exist_ok=True)
+        return [label for _, label in settings.MULTI_TIMEFRAME_LIST][: settings.MAX_TIMEFRAMES]
+    return [settings.DEFAULT_TIMEFRAME]
 
-    for tf_label in tf_list:
-        out_csv = f"data/processed/{symbol}_{tf_label}.csv"
-        if os.path.exists(out_csv):
-            print(f"[DATA] Skipping {out_csv} (already exists)")
-            continue
-
-        print(f"[DATA] Building {symbol} @ {tf_label}…")
-        try:
-            df = fetch_or_aggregate(symbol, tf_label, BARS)
-            if df.empty:
-                raise ValueError("no data")
+def build_datasets(pairs, workers: int | None = None, bars: int = BARS) -> dict:
+    """
+    Updates every (symbol, tf_label) pair on a process pool; each worker
+    opens one broker session and reuses it for all its pairs.
+    Returns {(symbol, tf_label): rows added, -1 on failure}.
+    """
+    pairs = list(dict.fromkeys(pairs))
+    workers = min(workers or settings.DATASET_BUILD_WORKERS, len(pairs)) if pairs else 0
+    if workers <= 1:
+        return {(s, tf): n for s, tf, n in (_update_dataset_safe(s, tf, bars) for s, tf in pairs)}
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=open_broker_session) as pool:
+        futures = [pool.submit(_update_dataset_safe, s, tf, bars) for s, tf in pairs]
+        for fut in as_completed(futures):
+            s, tf, n = fut.result()
+            results[(s, tf)] = n
+    return results
+
+def build_from_symbol(symbol: str, timeframes: list[str] | None = None):
+    """Aggiorna i dataset di un singolo simbolo (nel processo corrente)."""
+    return build_datasets([(symbol, tf) for tf in (timeframes or enabled_timeframes())], workers=1)
+
+def build_all_symbols(workers: int | None = None):
+    """Aggiorna i dataset di tutti i simboli attivi, in parallelo su (simbolo, timeframe)."""
+    with open(settings.ACTIVE_SYMBOLS_PATH, "r") as f:
+        symbols = json.load(f)
+    return build_datasets([(s, tf) for s in symbols for tf in enabled_timeframes()], workers=workers)
+
+def load_enriched(symbol: str, tf_label: str) -> pd.DataFrame | None:
+    """Dataset bars + indicators; falls back to a legacy data/processed CSV."""
+    df = bar_store.read_bars(symbol, tf_label)
+    if df is not None and not df.empty:
+        return enrich_with_indicators(df)
+    path = f"data/processed/{symbol}_{tf_label}.csv"
+    if os.path.exists(path):
+        return pd.read_csv(path)
+    return None
+
+def feature_columns(df: pd.DataFrame) -> list[str]:
+    """
+    Model input columns of an enriched frame: close/high/low plus every
+    column whose name contains one of the DEFAULT_INDICATOR_WEIGHTS keys.
+    Shared by training (load_training_data) and live inference.
+    """
+    # Build a list of the base indicator names we care about
+    # e.g. ['RSI', 'MACD', 'MA', ...]
+    base_inds = list(settings.DEFAULT_INDICATOR_WEIGHTS.keys())
+    # sempre tieni close / high / low
+    feature_cols = ['close', 'high', 'low']
+
+    # poi aggiungi dinamicamente gli indicatori
+    for col in df.columns:
+        for ind in base_inds:
+            if ind.upper() in col.upper() and col not in feature_cols:
+                feature_cols.append(col)
+    return feature_cols
+
+def live_feature_window(symbol: str,
+                        lookback: int = settings.LOOKBACK,
+                        timeframes: list[str] | None = None):
+    """
+    Last `lookback` rows of the same stacked features load_training_data
+    builds, computed on the bars in the shared cache. Returns an ndarray of
+    shape (lookback, n_features), or None if some timeframe lacks data.
+    """
+    from data_sources.bar_cache import bar_cache
 
-            df = enrich_with_indicators(df)
-            df.to_csv(out_csv, index=False)
-            print(f"[DATA] Saved {len(df)} rows to {out_csv}")
+    if timeframes is None:
+        timeframes = [label for _, label in settings.MULTI_TIMEFRAME_LIST]
 
-        except Exception as e:
-            print(f"[DATA] FAILED for {symbol} {tf_label}: {e}")
+    dfs = []
+    for tf in timeframes:
+        rates = bar_cache.get(symbol, tf, settings.BAR_COUNT)
+        if rates is None or len(rates) <= lookback:
+            return None
+        df = enrich_with_indicators(pd.DataFrame(rates))
+        cols = feature_columns(df)
+        df = df[cols].dropna().rename(columns={col: f"{col}_{tf}" for col in cols})
+        dfs.append(df.tail(lookback).reset_index(drop=True))
+
+    window = pd.concat(dfs, axis=1).dropna()
+    if len(window) < lookback:
+        return None
+    return window.to_numpy(dtype="float32")
+
+def sliding_windows(values: np.ndarray, lookback: int) -> np.ndarray:
+    """
+    All `lookback`-row windows of a 2D array as a read-only strided view of
+    shape (len - lookback + 1, lookback, n_features): window k is values[k:k+lookback].
+    """
+    return sliding_window_view(values, lookback, axis=0).transpose(0, 2, 1)
 
-def build_all_symbols():
-    """Costruisci i CSV per tutti i simboli attivi secondo le impostazioni in settings.py."""
-    # 1) carica simboli attivi
-    with open(settings.ACTIVE_SYMBOLS_PATH, "r") as f:
-        symbols = json.load(f)
+def atr_labels(close_now, close_next, atr, mult) -> np.ndarray:
+    """0 = hold, 1 = up, 2 = down: next-bar % move beyond ±(ATR / close) · mult."""
+    pct_change = (close_next - close_now) / close_now
+    thr_pct = (atr / close_now) * mult
+    return np.select([pct_change > thr_pct, pct_change < -thr_pct], [1, 2], 0).astype("int64")
 
-    # 2) definisci la lista di timeframe
-    if settings.MULTI_TIMEFRAME_ENABLED:
-        # prendi al massimo MAX_TIMEFRAMES elementi
-        tf_list = settings.MULTI_TIMEFRAME_LIST[: settings.MAX_TIMEFRAMES]
+def training_samples(close, atr, lookback, mult):
+    """
+    Sample end rows i = lookback … len-2 with ATR available, and their
+    labels (close[i-1] → close[i] against atr[i]). The input window of
+    sample i is values[i-lookback:i].
+    """
+    n = len(close) - 1 - lookback
+    if n <= 0:
+        return np.empty(0, dtype="int64"), np.empty(0, dtype="int64")
+    ends = np.arange(lookback, lookback + n)
+    ends = ends[~np.isnan(atr[ends])]
+    return ends, atr_labels(close[ends - 1], close[ends], atr[ends], mult)
+
+def build_training_windows(values, close, atr, lookback, mult):
+    """
+    X (windows of the samples in training_samples) and y. Samples whose ATR
+    is not yet available are dropped from X and y together.
+    """
+    ends, y = training_samples(close, atr, lookback, mult)
+    if not len(ends):
+        return np.empty((0, lookback, values.shape[1]), dtype=values.dtype), y
+
+    starts = ends - lookback
+    X = sliding_windows(values, lookback)
+    if starts[-1] - starts[0] == len(starts) - 1:
+        X = X[starts[0]:starts[-1] + 1]   # ATR manca solo nel warm-up: resta una vista
     else:
-        # se multi‐TF spento, prendi solo quello di default
-        tf_list = [
-            (None, settings.DEFAULT_TIMEFRAME)
-        ]
-
-    # 3) assicurati che la cartella esista
-    os.makedirs("data/processed", exist_ok=True)
-
-    # 4) per ogni simbolo e timeframe
-    for symbol in symbols:
-        for _, tf_label in tf_list:
-            out_csv = f"data/processed/{symbol}_{tf_label}.csv"
-
-            # 4.a) se già esiste, salta
-            if os.path.exists(out_csv):
-                print(f"[DATA] Skipping {out_csv} (already exists)")
-                continue
-
-            print(f"[DATA] Building {symbol} @ {tf_label}…")
-            try:
-                # 4.b) fetch (o aggregate) + enrich + save
-                df = fetch_or_aggregate(symbol, tf_label, settings.OHLCV_BARS)
-                if df.empty:
-                    raise ValueError("no data returned")
-
-                df = enrich_with_indicators(df)
-                df.to_csv(out_csv, index=False)
-                print(f"[DATA] Saved {len(df)} rows to {out_csv}")
-
-            except Exception as e:
-                print(f"[DATA] FAILED for {symbol} {tf_label}: {e}")
+        X = X[starts]
+    return X, y
 
-def load_training_data(symbol: str,
-                       lookback: int = 50,
-                       timeframes: list[str] | None = None,
-                       min_samples: int = 50):
+def materialize_windows(windows, order, memmap_path=None, chunk=4096):
     """
-    Loads X, y for symbol by stacking all enabled timeframes,
-    discovering every indicator column present in the CSVs.
+    windows[order] as a contiguous array, or as a .npy memmap written in
+    chunks when `memmap_path` is given (datasets larger than RAM).
+    """
+    if memmap_path is None:
+        if len(order) == len(windows) and np.array_equal(order, np.arange(len(windows))):
+            return windows       # nessun campione duplicato: resta la vista
+        return windows[order]
+    out = np.lib.format.open_memmap(memmap_path, mode="w+", dtype=windows.dtype,
+                                    shape=(len(order), *windows.shape[1:]))
+    for start in range(0, len(order), chunk):
+        out[start:start + chunk] = windows[order[start:start + chunk]]
+    out.flush()
+    return out
+
+def training_matrix(symbol: str,
+                    timeframes: list[str] | None = None,
+                    memmap_path: str | None = None):
+    """
+    Stacked feature matrix of all timeframes (float32, rows = aligned bars)
+    plus the base-timeframe close, ATR and the phase ATR multiplier used for
+    labelling: (values, close, atr, mult), or None if data is missing.
+    With `memmap_path` the matrix is written there and returned memory-mapped.
     """
     if timeframes is None:
         # pull the labels from settings.MULTI_TIMEFRAME_LIST
         timeframes = [label for _, label in settings.MULTI_TIMEFRAME_LIST]
 
-    # Build a list of the base indicator names we care about
-    # e.g. ['RSI', 'MACD', 'MA', ...]
-    # Colonne di base (chiusura + tutti gli indicatori definiti in settings)
-    base_inds = list(settings.DEFAULT_INDICATOR_WEIGHTS.keys())
-    core_prices  = ['close', 'high', 'low']  
     dfs = []
     for tf in timeframes:
-        path = f"data/processed/{symbol}_{tf}.csv"
-        if not os.path.exists(path):
-            print(f"[TRAIN_DATA] Missing: {path}")
-            return np.array([]), np.array([])
-
-        df = pd.read_csv(path)
+        df = load_enriched(symbol, tf)
+        if df is None:
+            print(f"[TRAIN_DATA] Missing dataset: {symbol} @ {tf}")
+            return None
 
-        # sempre tieni close / high / low
-        feature_cols = core_prices.copy()
-
-        # poi aggiungi dinamicamente gli indicatori
-        for col in df.columns:
-            for ind in base_inds:
-                if ind.upper() in col.upper() and col not in feature_cols:
-                    feature_cols.append(col)
+        feature_cols = feature_columns(df)
         # If for some reason we found none besides 'close', abort:
         if len(feature_cols) <= 1:
-            print(f"[TRAIN_DATA] No indicator columns found in {path}")
-            return np.array([]), np.array([])
+            print(f"[TRAIN_DATA] No indicator columns found for {symbol} @ {tf}")
+            return None
 
         # Drop rows with NaNs in any of the feature columns
         df = df.dropna(subset=feature_cols)
@@ -206,57 +308,37 @@ def load_training_data(symbol: str,
     atr = true_range.rolling(settings.ATR_PERIOD).mean()
     # ------------------------------------------------------------------
 
-    X, y = [], []
-    for i in range(lookback, len(df_combined) - 1):
-        X.append(df_combined.iloc[i - lookback:i].values)
-
-        # ------------------------------------------------------------------
-        if pd.isna(atr.iloc[i]):          # ATR non ancora disponibile
-            continue                      # passa all'indice successivo
-        # ------------------------------------------------------------------
-
-        close_now  = df_combined.iloc[i - 1][f"close_{timeframes[0]}"]
-        close_next = df_combined.iloc[i][f"close_{timeframes[0]}"]
-
-        pct_change = (close_next - close_now) / close_now  # <- percentuale
-
-        thr_pct = (atr.iloc[i] / close_now) * mult
-
-        if pct_change > thr_pct:
-            y.append(1)
-        elif pct_change < -thr_pct:
-            y.append(2)
-        else:
-            y.append(0)
-
-    # ---------------------------------------------------------------
-    X = np.array(X)          # ① converti subito
-    y = np.array(y)
-    # ---------------------------------------------------------------
-
-    from sklearn.utils import resample
-    counts  = np.bincount(y, minlength=3)         # [c0, c1, c2]
-    target = int(counts[0] * 0.7)
-
-    def up(class_id):
-        deficit = target - counts[class_id]
-        if deficit <= 0:
-            return np.empty((0, *X.shape[1:])), np.empty(0, dtype=y.dtype)
-        X_up = resample(X[y == class_id],
-                        replace=True,
-                        n_samples=deficit,
-                        random_state=42)
-        y_up = np.full(deficit, class_id, dtype=y.dtype)
-        return X_up, y_up
-
-    X1_up, y1_up = up(1)
-    X2_up, y2_up = up(2)
-
-    # ---------------------------------------------------------------
-    # ② aggiungi i campioni duplicati
-    X = np.concatenate([X, X1_up, X2_up])
-    y = np.concatenate([y, y1_up, y2_up])
-    # ---------------------------------------------------------------
+    if memmap_path is None:
+        values = df_combined.to_numpy(dtype="float32")
+    else:
+        values = np.lib.format.open_memmap(memmap_path, mode="w+", dtype="float32",
+                                           shape=df_combined.shape)
+        for start in range(0, len(df_combined), 65536):
+            values[start:start + 65536] = df_combined.iloc[start:start + 65536].to_numpy(dtype="float32")
+        values.flush()
+    return values, close.to_numpy(), atr.to_numpy(), mult
+
+def load_training_data(symbol: str,
+                       lookback: int = 50,
+                       timeframes: list[str] | None = None,
+                       min_samples: int = 50,
+                       memmap_path: str | None = None):
+    """
+    Loads X, y for symbol by stacking all enabled timeframes,
+    discovering every indicator column present in the CSVs.
+    Samples stay unbalanced and in time order (the tail is a valid hold-out);
+    training balances classes per epoch by weighted sampling instead
+    (utils.training_sequence), so no window is duplicated here.
+    With `memmap_path`, X is written to that .npy file and returned memory-mapped.
+    For training prefer utils.training_sequence: it never materializes X.
+    """
+    matrix = training_matrix(symbol, timeframes)
+    if matrix is None:
+        return np.array([]), np.array([])
+    values, close, atr, mult = matrix
+    X, y = build_training_windows(values, close, atr, lookback, mult)
+    if memmap_path is not None:
+        X = materialize_windows(X, np.arange(len(y)), memmap_path)
 
     if len(X) < min_samples:
         print(f"[TRAIN_DATA] Not enough training samples for {symbol}")
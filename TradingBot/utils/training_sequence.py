@@ -0,0 +1,122 @@
+# utils/training_sequence.py
+
+"""
+Out-of-core training batches for the LSTM/CNN models.
+
+The stacked feature matrix of a symbol is written once to a memory-mapped
+.npy (settings.TRAIN_CACHE_DIR); samples are just (end row, label) pairs.
+WindowSequence cuts each batch's (lookback, n_features) windows from the
+memmap on demand, so memory holds one batch of windows, never the full
+(n, lookback, n_features) tensor.
+
+Class balancing samples indices with per-class weights each epoch, with the
+same target as the old oversampling (classes 1/2 brought up to 70% of
+class 0) but without duplicating any window.
+"""
+
+import math
+import os
+
+import numpy as np
+
+import settings
+from utils.training_data_builder import sliding_windows, training_matrix, training_samples
+
+try:
+    from tensorflow.keras.utils import Sequence
+except ImportError:  # senza TensorFlow resta un semplice iterabile di batch
+    Sequence = object
+
+# Classi 1/2 portate (in media) al 70% della classe 0, come il vecchio resample
+MINORITY_TARGET = 0.7
+
+
+def balanced_probabilities(y, target=MINORITY_TARGET):
+    """Per-sample draw probabilities and epoch size that rebalance classes 1/2."""
+    counts = np.bincount(y, minlength=3).astype("float64")
+    goal = counts.copy()
+    for class_id in (1, 2):
+        if counts[class_id]:
+            goal[class_id] = max(counts[class_id], int(counts[0] * target))
+    per_sample = np.divide(goal, counts, out=np.zeros_like(goal), where=counts > 0)[y]
+    return per_sample / per_sample.sum(), int(goal.sum())
+
+
+class WindowSequence(Sequence):
+    def __init__(self, values, ends, y, lookback, batch_size=None,
+                 balance=True, shuffle=True, seed=42):
+        if Sequence is not object:
+            super().__init__()
+        self.windows = sliding_windows(values, lookback)   # vista, nessuna copia
+        self.starts = np.asarray(ends, dtype="int64") - lookback
+        self.y = np.asarray(y, dtype="int64")
+        self.batch_size = batch_size or settings.TRAIN_BATCH_SIZE
+        self.balance = balance
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(seed)
+        if balance and len(self.y):
+            self.probabilities, self.epoch_size = balanced_probabilities(self.y)
+        else:
+            self.probabilities, self.epoch_size = None, len(self.y)
+        self.on_epoch_end()
+
+    def on_epoch_end(self):
+        n = len(self.y)
+        if self.probabilities is not None:
+            self.order = self.rng.choice(n, size=self.epoch_size, p=self.probabilities)
+        elif self.shuffle:
+            self.order = self.rng.permutation(n)
+        else:
+            self.order = np.arange(n)
+
+    def __len__(self):
+        return math.ceil(len(self.order) / self.batch_size)
+
+    def __getitem__(self, index):
+        idx = self.order[index * self.batch_size:(index + 1) * self.batch_size]
+        if self.shuffle or self.balance:
+            idx = np.sort(idx)   # letture più sequenziali sul memmap
+        return np.ascontiguousarray(self.windows[self.starts[idx]]), self.y[idx]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def training_sequences(symbol, lookback=None, timeframes=None, batch_size=None,
+                       validation_split=None, cache_dir=None):
+    """
+    (train, validation) WindowSequence for `symbol`, or (None, None) without
+    data. Validation uses the last `validation_split` of the samples in time
+    order, unbalanced and unshuffled.
+    """
+    lookback = lookback or settings.LOOKBACK
+    validation_split = settings.TRAIN_VALIDATION_SPLIT if validation_split is None else validation_split
+    cache_dir = cache_dir or settings.TRAIN_CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+
+    matrix = training_matrix(symbol, timeframes,
+                             memmap_path=os.path.join(cache_dir, f"{symbol}_features.npy"))
+    if matrix is None:
+        return None, None
+    values, close, atr, mult = matrix
+    ends, y = training_samples(close, atr, lookback, mult)
+    if not len(ends):
+        return None, None
+
+    split = len(ends) - int(len(ends) * validation_split)
+    train = WindowSequence(values, ends[:split], y[:split], lookback, batch_size)
+    val = None
+    if split < len(ends):
+        val = WindowSequence(values, ends[split:], y[split:], lookback, batch_size,
+                             balance=False, shuffle=False)
+    return train, val
+
+
+def fit_on_sequences(model, symbol, epochs=None, **kwargs):
+    """model.fit over the streamed batches of `symbol`. Returns the History, or None without data."""
+    train, val = training_sequences(symbol, **kwargs)
+    if train is None:
+        print(f"[TRAIN_DATA] Not enough training samples for {symbol}")
+        return None
+    return model.fit(train, validation_data=val, epochs=epochs or settings.TRAIN_EPOCHS, verbose=0)
@@ -1,7 +1,6 @@
 import pandas as pd
 import os
-from models.lstm_model import LSTMModel
-from models.cnn_model import CNNModel
+from models.retrain_scheduler import retrain_now
 from utils.training_data_builder import enrich_with_indicators
 
 def retrain_from_csv(symbol, csv_path, is_raw=True, lookback=50):
@@ -23,15 +22,19 @@ def retrain_from_csv(symbol, csv_path, is_raw=True, lookback=50):
         df.to_csv(save_path, index=False)
         print(f"✅ Saved processed CSV to: {save_path}")
 
-        # Retrain models
-        lstm = LSTMModel()
-        cnn = CNNModel()
-
-        lstm.retrain(symbol)
-        cnn.retrain(symbol)
-
-        print(f"✅ Retraining complete for {symbol}")
-        return True
+        # Retrain models (stesso job del RetrainScheduler: .h5 corrente → fit_on_sequences)
+        ok = True
+        for kind in ("lstm", "cnn"):
+            result = retrain_now(symbol, kind, source="upload", csv=csv_path)
+            if result["ok"]:
+                print(f"✅ {kind.upper()} v{result['version']} (val_accuracy={result['val_accuracy']:.3f})")
+            else:
+                print(f"❌ {kind.upper()} retraining failed: {result['error']}")
+                ok = False
+
+        if ok:
+            print(f"✅ Retraining complete for {symbol}")
+        return ok
 
     except Exception as e:
         print(f"❌ Retraining failed: {e}")
@@ -4,9 +4,10 @@ import os
 import subprocess
 import sys
 import time
-import requests
 import settings
-import MetaTrader5 as mt5
+from data_sources.broker import mt5
+from utils.control_channel import ControlClient, ControlError, control_address, control_token_path
+from utils.notifier import TelegramNotifier
 import psutil
 from datetime import datetime
 
@@ -16,8 +17,6 @@ CRASH_FLAG_PATH = "TRADING_BOT_CRASHED.flag"
 LOG_DIR = "logs"
 CHECK_INTERVAL = 60  # secondi
 
-TELEGRAM_TOKEN = settings.TELEGRAM_TOKEN
-CHAT_ID = settings.TELEGRAM_CHAT_ID
 MT5_EQUITY_THRESHOLD = settings.EQUITY_ALERT_THRESHOLD
 MAX_FAILURES = getattr(settings, "MAX_FAILURES", 3)
 
@@ -29,13 +28,14 @@ CPU_ALERT = 80
 CPU_KILL = 95
 
 failure_count = 0
+control = ControlClient(control_address(settings), timeout=settings.CONTROL_TIMEOUT,
+                        token_path=control_token_path(settings))
+notifier = TelegramNotifier.from_settings(settings)
 
-def send_telegram(msg: str):
-    try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-        requests.post(url, data={"chat_id": CHAT_ID, "text": msg})
-    except Exception as e:
-        print(f"[Watchdog] Telegram fail: {e}")
+def send_telegram(msg: str, key: str | None = None):
+    # in coda: un Telegram lento non ritarda i controlli (kill/restart).
+    # Con `key` lo stesso tipo di allarme parte una volta ogni NOTIFY_DEDUP_SECONDS
+    notifier.send(msg, key=key, signature=key)
 
 def is_bot_running() -> bool:
     try:
@@ -44,7 +44,17 @@ def is_bot_running() -> bool:
         print(f"[Watchdog] is_bot_running() error: {e}")
         return False
 
-def check_equity() -> float | None:
+def bot_status() -> dict | None:
+    """Live state from the running bot, or None if it does not answer."""
+    try:
+        return control.call("status")
+    except ControlError:
+        return None
+
+def check_equity(status=None) -> float | None:
+    # prima l'equity già nota al bot: niente seconda sessione MT5
+    if status and status.get("equity") is not None:
+        return status["equity"]
     try:
         if not mt5.initialize():
             return None
@@ -63,7 +73,7 @@ def check_resources() -> bool:
         kill_bot()
         return False
     if cpu > CPU_ALERT or mem > RAM_ALERT_MB:
-        send_telegram(f"⚠️ CPU/RAM alta: CPU={cpu}%, RAM={mem:.0f}MB")
+        send_telegram(f"⚠️ CPU/RAM alta: CPU={cpu}%, RAM={mem:.0f}MB", key="resources")
     return True
 
 def kill_bot():
@@ -94,9 +104,14 @@ def main():
 
     while True:
         alive = is_bot_running()
-        eq = check_equity()
+        status = bot_status() if alive else None
+        eq = check_equity(status)
         res = check_resources()
 
+        last_cycle = status.get("last_cycle_at") if status else None
+        if last_cycle and time.time() - last_cycle > settings.WATCHDOG_STALL_SECONDS:
+            send_telegram(f"⚠️ Nessun ciclo completato da {int(time.time() - last_cycle)}s", key="stall")
+
         if not alive:
             failure_count += 1
             send_telegram(f"❌ Bot down ({failure_count}/{MAX_FAILURES})")